@@ -1,36 +1,57 @@
-from playwright.async_api import Playwright, Page
+from playwright.async_api import Playwright, Page, BrowserContext, Route, Request
 from playwright.async_api import async_playwright
 from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+from collections import Counter
+from typing import Dict, Optional
 
 import asyncio
+import time
 import json
 import os
 
 from .asset import get_asset_path
+from .lib import get_logger
 
-def launch_browser(browser_dir: str, channel='chrome', **kwargs):
+logger = get_logger(__name__)
+
+
+def load_browser_config(browser_dir: str, channel='chrome'):
+    """
+    Load the options of browser context from config.json of browser_dir, or the default ones
+    """
     browser_dir = os.path.expanduser(browser_dir)
     config_file = os.path.join(browser_dir, 'config.json')
-
     if os.path.exists(config_file):
         print('loading config from {}'.format(config_file))
         with open(config_file) as f:
-            config = json.load(f)
-    else:
-        config = {
-            'channel': channel,
-            'user_data_dir': os.path.abspath(os.path.join(browser_dir,'user-data')),
-            'headless': False,
-            'ignore_https_errors': True,
-            'slow_mo': 1000,
-            'ignore_default_args': [
-                '--enable-automation',
-                '--no-sandbox',
-                '--disable-extensions',
-                '--disable-background-networking',
-            ],
-        }
-        os.makedirs(browser_dir, exist_ok=True)
+            return json.load(f)
+    return {
+        'channel': channel,
+        'user_data_dir': os.path.abspath(os.path.join(browser_dir,'user-data')),
+        'headless': False,
+        'ignore_https_errors': True,
+        'slow_mo': 1000,
+        'ignore_default_args': [
+            '--enable-automation',
+            '--no-sandbox',
+            '--disable-extensions',
+            '--disable-background-networking',
+        ],
+    }
+
+
+def launch_browser(browser_dir: str, channel='chrome', blocker: Optional['ResourceBlocker'] = None, **kwargs):
+    """
+    Create a launcher of the persistent browser context of browser_dir
+
+    :param blocker: ResourceBlocker, to block requests of all pages of the context
+    :param kwargs: the options of the context to save to config.json
+    """
+    browser_dir = os.path.expanduser(browser_dir)
+    config_file = os.path.join(browser_dir, 'config.json')
+    config = load_browser_config(browser_dir, channel)
+    os.makedirs(browser_dir, exist_ok=True)
 
     config.update(kwargs)
     with open(config_file, 'w') as f:
@@ -43,7 +64,10 @@ def launch_browser(browser_dir: str, channel='chrome', **kwargs):
             os.makedirs(dir_path, exist_ok=True)
 
     async def _launcher(pw: Playwright):
-        return await pw.chromium.launch_persistent_context(**config)
+        context = await pw.chromium.launch_persistent_context(**config)
+        if blocker is not None:
+            await blocker.apply(context)
+        return context
     return _launcher
 
 
@@ -59,9 +83,9 @@ class BrowserCmd:
         asyncio.run(run())
 
     @asynccontextmanager
-    async def _launch_async(self, browser_dir: str, **kwargs):
+    async def _launch_async(self, browser_dir: str, blocker: Optional['ResourceBlocker'] = None, **kwargs):
         async with async_playwright() as pw:
-            yield await launch_browser(browser_dir, **kwargs)(pw)
+            yield await launch_browser(browser_dir, blocker=blocker, **kwargs)(pw)
 
 
 async def page_sleath(page: Page):
@@ -69,3 +93,306 @@ async def page_sleath(page: Page):
     with open(sleath_js, 'r') as f:
         await page.add_init_script(sleath_js)
 
+
+class DomainThrottle:
+    """
+    Politeness limiter for concurrent page loads
+
+    At most `max_concurrency` requests can be in flight for the same domain,
+    and two requests to the same domain will be at least `interval` seconds apart.
+    """
+
+    def __init__(self, max_concurrency=1, interval=1.0):
+        self._max_concurrency = max_concurrency
+        self._interval = interval
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._last_ts: Dict[str, float] = {}
+
+    @asynccontextmanager
+    async def __call__(self, url: str):
+        domain = get_domain(url)
+        if domain not in self._semaphores:
+            # create lazily so that they are bound to the running loop
+            self._semaphores[domain] = asyncio.Semaphore(self._max_concurrency)
+            self._locks[domain] = asyncio.Lock()
+        async with self._semaphores[domain]:
+            async with self._locks[domain]:
+                elapsed = time.monotonic() - self._last_ts.get(domain, 0)
+                if elapsed < self._interval:
+                    await asyncio.sleep(self._interval - elapsed)
+                self._last_ts[domain] = time.monotonic()
+            yield
+
+
+# the resource types, hosts and extensions to block of each profile
+BLOCK_PROFILES = {
+    'none': {},
+    'light': {'types': ('media',), 'hosts': True, 'extensions': True},
+    'default': {'types': ('image', 'media', 'font', 'stylesheet'), 'hosts': True, 'extensions': True},
+}
+
+# analytics and ads that never contribute to the content
+BLOCK_HOSTS = (
+    'google-analytics.com', 'googletagmanager.com', 'googleadservices.com', 'googlesyndication.com',
+    'doubleclick.net', 'adservice.google.com', 'facebook.net', 'hotjar.com', 'clarity.ms',
+    'scorecardresearch.com', 'quantserve.com', 'nr-data.net', 'segment.io', 'mixpanel.com',
+    'addthis.com', 'sharethis.com', 'criteo.com', 'taboola.com', 'outbrain.com', 'cookielaw.org',
+)
+
+# large downloads embedded in pages, the size of response is unknown before it's downloaded
+BLOCK_EXTENSIONS = (
+    '.zip', '.gz', '.tgz', '.tar', '.rar', '.7z', '.iso', '.exe', '.dmg', '.msi',
+    '.mp4', '.avi', '.mov', '.mkv', '.webm', '.mp3', '.wav',
+)
+
+
+class ResourceBlocker:
+    """
+    Block requests of all pages of a browser context by resource type, host and extension
+
+    Navigations are never blocked. The blocked requests are counted by reason,
+    and the requests and bytes of responses are counted by host.
+
+    :param profile: str
+        The name of BLOCK_PROFILES, 'none' to count requests only
+    """
+
+    def __init__(self, profile='default'):
+        assert profile in BLOCK_PROFILES, f'invalid block profile: {profile}'
+        profile = BLOCK_PROFILES[profile]
+        self._types = set(profile.get('types', ()))
+        self._hosts = BLOCK_HOSTS if profile.get('hosts') else ()
+        self._extensions = BLOCK_EXTENSIONS if profile.get('extensions') else ()
+        self.stats = Counter()
+        self._host_stats: Dict[str, Counter] = {}
+
+    @property
+    def blocking(self):
+        return bool(self._types or self._hosts or self._extensions)
+
+    async def apply(self, context: BrowserContext):
+        # a route handler makes every request a round trip to the driver,
+        # only install it if there is something to block
+        if self.blocking:
+            await context.route('**/*', self._handle)
+        context.on('requestfinished', self._on_finished)
+
+    def get_block_reason(self, resource_type: str, url: str, is_navigation=False):
+        """
+        :return: the reason to block the request, empty if it's allowed
+        """
+        if is_navigation:
+            return ''
+        if resource_type in self._types:
+            return resource_type
+        parsed = urlparse(url)
+        host = parsed.netloc.split(':')[0].lower()
+        if any(host == h or host.endswith('.' + h) for h in self._hosts):
+            return 'host'
+        if parsed.path.lower().endswith(self._extensions):
+            return 'extension'
+        return ''
+
+    async def _handle(self, route: Route):
+        request = route.request
+        reason = self.get_block_reason(request.resource_type, request.url, request.is_navigation_request())
+        if reason:
+            self.stats[f'blocked_{reason}'] += 1
+            await route.abort()
+        else:
+            await route.fallback()
+
+    async def _on_finished(self, request: Request):
+        try:
+            sizes = await request.sizes()
+        except Exception:
+            # the page is closed
+            return
+        size = sizes['responseHeadersSize'] + sizes['responseBodySize']
+        host = urlparse(request.url).netloc.split(':')[0].lower()
+        self.record(host, size)
+
+    def record(self, host: str, size: int):
+        self.stats['requests'] += 1
+        self.stats['bytes'] += size
+        host_stats = self._host_stats.setdefault(host, Counter())
+        host_stats['requests'] += 1
+        host_stats['bytes'] += size
+
+    def summary(self, top=20):
+        """
+        :return: dict of the counters and the hosts of most bytes
+        """
+        hosts = sorted(self._host_stats.items(), key=lambda item: item[1]['bytes'], reverse=True)
+        return {**self.stats, 'hosts': {host: dict(counter) for host, counter in hosts[:top]}}
+
+    def save(self, path: str):
+        """
+        Log the counters and save the summary to a json file
+        """
+        logger.info('resource stats: %s', dict(self.stats))
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+def get_domain(url: str):
+    """
+    Get the registrable part of the host, e.g. www.chem.mit.edu -> mit.edu
+    so that all the sites of the same university share the same limit
+    """
+    host = urlparse(url).netloc.split(':')[0].lower()
+    parts = host.split('.')
+    if len(parts) > 2 and parts[-2] in ('edu', 'ac', 'co', 'com', 'org', 'gov', 'net'):
+        return '.'.join(parts[-3:])
+    return '.'.join(parts[-2:])
+
+
+# record the time of the last DOM mutation since the document is created
+_MUTATION_TRACKER_JS = """(() => {
+    window.__autoAssistMutatedAt = performance.now();
+    new MutationObserver(() => { window.__autoAssistMutatedAt = performance.now(); })
+        .observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+})()"""
+
+# resolve with the elapsed ms once the DOM has no mutation for quiet ms, or timeout ms at most,
+# it resolves at once if the tracker shows that the DOM is already stable
+_QUIESCENCE_JS = """([quiet, timeout]) => new Promise(resolve => {
+    const start = performance.now();
+    let last = window.__autoAssistMutatedAt;
+    let observer = null;
+    if (last === undefined) {
+        // the tracker is not installed, watch the mutations from now on
+        last = start;
+        observer = new MutationObserver(() => { last = performance.now(); });
+        observer.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+    }
+    const check = () => {
+        const now = performance.now();
+        if (observer === null) last = window.__autoAssistMutatedAt;
+        if (now - last >= quiet || now - start >= timeout) {
+            if (observer !== null) observer.disconnect();
+            resolve(now - start);
+        } else {
+            setTimeout(check, Math.min(quiet - (now - last), timeout - (now - start)));
+        }
+    };
+    check();
+})"""
+
+
+async def track_dom_mutations(context: BrowserContext):
+    """
+    Track the DOM mutations of all pages of the context from the start,
+    so that wait_page_ready doesn't wait for a quiet period of a page that is already stable
+    """
+    await context.add_init_script(script=_MUTATION_TRACKER_JS)
+
+
+class PageLoadStats:
+    """
+    Timing of page loads of each domain
+
+    The seconds spent in each phase of wait_page_ready are summed by domain,
+    and the signals that the pages are taken as ready by are counted.
+    """
+
+    def __init__(self):
+        self._seconds: Dict[str, Counter] = {}
+        self._counts: Dict[str, Counter] = {}
+
+    def record(self, url: str, timing: Dict[str, float], events=()):
+        """
+        :param timing: dict of phase to seconds
+        :param events: list of events to count, e.g. idle_timeout
+        """
+        domain = get_domain(url)
+        self._seconds.setdefault(domain, Counter()).update(timing)
+        counts = self._counts.setdefault(domain, Counter())
+        counts['pages'] += 1
+        counts.update(events)
+
+    def summary(self):
+        """
+        :return: dict of domain to the average seconds of each phase and the counts of pages and events
+        """
+        summary = {}
+        for domain, counts in self._counts.items():
+            summary[domain] = {phase: round(seconds / counts['pages'], 3)
+                               for phase, seconds in self._seconds[domain].items()}
+            summary[domain].update(counts)
+        return summary
+
+
+async def wait_page_ready(page: Page, quiet=0.5, idle_timeout=3.0, max_wait=5.0, challenge_timeout=20.0,
+                          stats: Optional[PageLoadStats] = None):
+    """
+    Wait until the content of a loaded page is stable, it returns as soon as the page is ready
+    instead of sleeping for a fixed time
+
+    If there is an anti-bot challenge, e.g. "just a moment" of cloudflare, the title is polled until it's resolved.
+    Then the network idle and the DOM quiescence, i.e. no mutation for a quiet period, are waited concurrently,
+    and the page is ready on whichever comes first.
+    A signal that times out doesn't make the page ready, the other one is waited until its own timeout.
+
+    :param quiet: float, the seconds without DOM mutation to take the page as stable
+    :param idle_timeout: float, the max seconds to wait for network idle
+    :param max_wait: float, the max seconds to wait for DOM quiescence
+    :param challenge_timeout: float, the max seconds to wait for the challenge to be resolved
+    :param stats: PageLoadStats, to record the timing of each phase
+    :return: dict of the seconds spent in each phase
+    """
+    url = page.url
+    timing = {}
+    events = []
+
+    start = time.monotonic()
+    while 'just a moment' in await _get_title(page):
+        if time.monotonic() - start > challenge_timeout:
+            logger.warning(f'challenge of {url} is not resolved in {challenge_timeout}s')
+            events.append('challenge_timeout')
+            break
+        await asyncio.sleep(0.5)
+    timing['challenge'] = time.monotonic() - start
+
+    start = time.monotonic()
+    signals = {
+        asyncio.ensure_future(page.wait_for_load_state('networkidle', timeout=idle_timeout * 1e3)): 'idle',
+        asyncio.ensure_future(page.evaluate(_QUIESCENCE_JS, [quiet * 1e3, max_wait * 1e3])): 'quiet',
+    }
+    pending = set(signals)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            stable = [signals[task] for task in done if _is_stable(task, max_wait)]
+            if stable:
+                events.append(f'ready_by_{stable[0]}')
+                break
+            events.extend(f'{signals[task]}_timeout' for task in done)
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    timing['ready'] = time.monotonic() - start
+
+    if stats is not None:
+        stats.record(url, timing, events)
+    return timing
+
+
+def _is_stable(task: asyncio.Future, max_wait: float):
+    # the wait of network idle times out, or the page is navigated away during the evaluation
+    if task.exception() is not None:
+        return False
+    elapsed = task.result()
+    # wait_for_load_state returns None
+    return elapsed is None or elapsed < max_wait * 1e3
+
+
+async def _get_title(page: Page):
+    try:
+        return (await page.title()).lower()
+    except Exception:
+        # the execution context is destroyed by navigation
+        return ''
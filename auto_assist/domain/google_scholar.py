@@ -1,10 +1,13 @@
-from playwright.async_api import BrowserContext, TimeoutError
+from playwright.async_api import BrowserContext, Page, TimeoutError
 from bs4 import BeautifulSoup
 
-from typing import List, TypedDict, Tuple, Dict
+from typing import List, TypedDict, Tuple, Dict, Deque, Set
 from urllib.parse import urlparse, urljoin
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
 from datetime import datetime
 
+import functools
 import asyncio
 import json
 import sys
@@ -12,7 +15,9 @@ import os
 
 
 from auto_assist.lib import get_logger, pending
-from auto_assist.browser import BrowserCmd
+from auto_assist.browser import BrowserCmd, ResourceBlocker, load_browser_config
+from auto_assist.pipeline import StagePipeline
+from auto_assist.store import JsonlStore, iter_jsonl
 
 logger = get_logger(__name__)
 
@@ -53,13 +58,54 @@ class GsSearchItem(TypedDict):
     profiles: List[GsProfileEntry]
 
 
+GS_PROFILE_JS = '''() => {
+    const text = (selector) => document.querySelector(selector)?.innerText ?? '';
+    const all = (selector) => Array.from(document.querySelectorAll(selector));
+    const homepage = all('a.gsc_prf_ila').find(a => a.innerText.includes('Homepage'));
+    return {
+        name: text('div#gsc_prf_in'),
+        brief: text('div#gsc_prf_w'),
+        cited_stats: text('table#gsc_rsb_st'),
+        homepage: homepage ? homepage.getAttribute('href') : '',
+        co_authors: all('ul.gsc_rsb_a li a').map(a => ({name: a.innerText, url: a.getAttribute('href')})),
+        articles: all('a.gsc_a_at').map(a => a.innerText),
+        tags: all('a.gsc_prf_inta.gs_ibl').map(a => a.innerText),
+    };
+}'''
+
+GS_RESULTS_JS = '''() => Array.from(document.querySelectorAll('div.gs_r.gs_or.gs_scl')).map(div => ({
+    cid: div.getAttribute('data-cid'),
+    url: div.querySelector('h3.gs_rt a')?.getAttribute('href') ?? null,
+    profiles: Array.from(div.querySelectorAll('div.gs_a a')).map(a => ({name: a.innerText, url: a.getAttribute('href')})),
+}))'''
+
+# artifacts to keep for each profile
+GS_ARTIFACTS = ('none', 'html', 'html+pdf')
+
+
 async def gs_explore_profiles(browser: BrowserContext,
                               gs_profile_urls: List[str],
                               out_dir: str = './out',
                               depth_limit = 1,
                               google_scholar_url='https://scholar.google.com/',
                               order_by_year=True,
+                              concurrency=1,
+                              artifacts='html+pdf',
+                              pdf_workers=1,
                               ):
+    """
+    explore google scholar profiles and their co-authors in breadth first order
+
+    The frontier is saved to gs_frontier.json so that the exploration can be resumed.
+
+    :param artifacts: str
+        The artifacts to keep for each profile, one of none, html, html+pdf.
+        PDFs are rendered from the saved html on separate pages in background,
+        so that crawling is not blocked by PDF generation, which only works in headless mode.
+    :param pdf_workers: int
+        The number of pages to render PDFs
+    """
+    assert artifacts in GS_ARTIFACTS, f'artifacts should be one of {GS_ARTIFACTS}'
 
     gs_pdf_dir = os.path.join(out_dir, 'gs_pdfs')
     gs_html_dir = os.path.join(out_dir, 'gs_htmls')
@@ -68,82 +114,169 @@ async def gs_explore_profiles(browser: BrowserContext,
     os.makedirs(gs_html_dir, exist_ok=True)
 
     gs_profiles_file = os.path.join(out_dir, 'gs_profiles.jsonl')
+    gs_frontier_file = os.path.join(out_dir, 'gs_frontier.json')
 
-    # load existed data
-    gs_profile_map: Dict[str, GsProfileItem] = {}
-    if os.path.exists(gs_profiles_file):
-        profile_list: List[GsProfileItem] = load_jsonl(gs_profiles_file)
-        gs_profile_map = { gs_get_profile_id(profile['url']): profile for profile in profile_list }
+    # existed profiles are indexed by profile id
+    gs_profile_store = JsonlStore(gs_profiles_file, key=lambda profile: gs_get_profile_id(profile['url']))
 
-    queue: List[Tuple[str, int]] = [ (url, 0) for url in gs_profile_urls ]
+    # the frontier of the crawl, seen is keyed by profile id to avoid duplicate visits
+    frontier: Deque[Tuple[str, int]] = deque()
+    seen: Set[str] = set()
+    in_progress: Dict[str, Tuple[str, int]] = {}
 
-    gs_page = browser.pages[0]
-    while len(queue) > 0:
-        user_url, level = queue.pop(0)
+    def enqueue(url: str, level: int):
         if level > depth_limit:
-            break
-        uid = gs_get_profile_id(user_url)
-        if uid in gs_profile_map:
-            logger.info("profile %s has been processed", user_url)
-            co_authors = gs_profile_map[uid]['co_authors']
-            queue.extend((author['url'], level+1) for author in co_authors)
-            continue
-
-        logger.info("process profile %s, level %d", user_url, level)
-
-        open_url = urljoin(google_scholar_url, user_url)
-        if order_by_year:
-            open_url += '&view_op=list_works&sortby=pubdate'
-        await gs_page.goto(open_url)
-
-        profile = GsProfileItem()  # type: ignore
-        profile['url'] = user_url
-        profile['name'] = await gs_page.locator('div#gsc_prf_in').inner_text()
-        profile['brief'] = await gs_page.locator('div#gsc_prf_w').inner_text()
-        profile['cited_stats'] = await gs_page.locator('table#gsc_rsb_st').inner_text()
+            return
+        uid = gs_get_profile_id(url)
+        if uid in seen:
+            return
+        seen.add(uid)
+        frontier.append((url, level))
+
+    def save_frontier():
+        # profiles must be persisted before they are removed from the frontier
+        gs_profile_store.flush()
+        state = {
+            'depth_limit': depth_limit,
+            'frontier': list(in_progress.values()) + list(frontier),
+            'seen': list(seen),
+        }
+        with open(gs_frontier_file, 'w', encoding='utf-8') as fp:
+            json.dump(state, fp)
+
+    if os.path.exists(gs_frontier_file):
+        with open(gs_frontier_file, 'r', encoding='utf-8') as fp:
+            state = json.load(fp)
+        # the frontier is incomplete if depth limit is changed, rebuild it from seeds
+        if state['depth_limit'] == depth_limit:
+            logger.info("resume %d profiles from %s", len(state['frontier']), gs_frontier_file)
+            frontier.extend((url, level) for url, level in state['frontier'])
+            seen.update(state['seen'])
+
+    for url in gs_profile_urls:
+        enqueue(url, 0)
+
+    pdf_pages: asyncio.Queue = asyncio.Queue()
+
+    async def _render_pdf(html_path: str, pdf_path: str):
+        pdf_page = await pdf_pages.get()
         try:
-            profile['homepage'] = await gs_page.locator('a.gsc_prf_ila').get_by_text("Homepage").get_attribute('href', timeout=1e3)  # type: ignore
-        except TimeoutError:
-            profile['homepage'] = ''
-
-        co_authors = []
-        co_author_links = await gs_page.locator('ul.gsc_rsb_a li a').all()
-        for co_author_link in co_author_links:
-            name = await co_author_link.inner_text()
-            url = await co_author_link.get_attribute('href')
-            co_authors.append(GsProfileEntry(name=name, url=url)) # type: ignore
-            queue.append((url, level+1))  # type: ignore
-
-        articles = []
-        article_links = await gs_page.locator('a.gsc_a_at').all()
-        for article_link in article_links:
-            articles.append(await article_link.inner_text())
-        profile['articles'] = articles
-
-        tags = []
-        tag_links = await gs_page.locator('a.gsc_prf_inta.gs_ibl').all()
-        for tag_link in tag_links:
-            tags.append(await tag_link.inner_text())
-        profile['tags'] = tags
-
-        profile['co_authors'] = co_authors
-        # save pdf
-        pdf_path = os.path.join(gs_pdf_dir, f'profile_{uid}.pdf')
-        await gs_page.pdf(path=pdf_path)
-        profile['pdf_path'] = pdf_path
-        # save html
-        html_path = os.path.join(gs_html_dir, f'profile_{uid}.html')
-        html_text = await gs_page.content()
-        with open(html_path, 'w', encoding='utf-8') as fp:
-            fp.write(html_text)
-        profile['html_path'] = html_path
-        # add to map to avoid duplicate processing
-        gs_profile_map[uid] = profile
-
-        # write result to file
-        with open(gs_profiles_file, 'a', encoding='utf-8') as fp:
-            fp.write(json.dumps(profile, ensure_ascii=False))
-            fp.write('\n')
+            await _gs_render_pdf(pdf_page, html_path, pdf_path, google_scholar_url)
+        finally:
+            pdf_pages.put_nowait(pdf_page)
+
+    async def _worker(gs_page: Page, pipeline: StagePipeline):
+        n_processed = 0
+        while frontier or in_progress:
+            if not frontier:
+                # wait for co-authors from the profiles in progress
+                await asyncio.sleep(0.1)
+                continue
+            user_url, level = frontier.popleft()
+            uid = gs_get_profile_id(user_url)
+            profile = gs_profile_store.get(uid)
+            if profile is not None:
+                logger.info("profile %s has been processed", user_url)
+            else:
+                logger.info("process profile %s, level %d", user_url, level)
+                in_progress[uid] = (user_url, level)
+                try:
+                    profile = await _gs_scrape_profile(gs_page, user_url, uid, gs_pdf_dir, gs_html_dir,
+                                                       google_scholar_url=google_scholar_url,
+                                                       order_by_year=order_by_year,
+                                                       artifacts=artifacts)
+                except BaseException:
+                    # put it back so that it is saved in the frontier and retried by a resumed run
+                    frontier.appendleft((user_url, level))
+                    raise
+                finally:
+                    del in_progress[uid]
+                if profile['pdf_path']:
+                    await pipeline.put('pdf', functools.partial(_render_pdf, profile['html_path'], profile['pdf_path']))
+                gs_profile_store.add(profile)
+                n_processed += 1
+                if n_processed % 10 == 0:
+                    save_frontier()
+            for author in profile['co_authors']:
+                enqueue(author['url'], level + 1)
+
+    gs_pages = list(browser.pages[:concurrency])
+    while len(gs_pages) < concurrency:
+        gs_pages.append(await browser.new_page())
+    if artifacts == 'html+pdf':
+        for _ in range(max(1, pdf_workers)):
+            pdf_pages.put_nowait(await browser.new_page())
+    try:
+        async with StagePipeline({'pdf': pdf_workers}) as pipeline:
+            # render the PDFs that were not done in the last run
+            if artifacts == 'html+pdf':
+                for profile in iter_jsonl(gs_profiles_file):
+                    pdf_path, html_path = profile.get('pdf_path'), profile.get('html_path')
+                    if pdf_path and html_path and not os.path.exists(pdf_path) and os.path.exists(html_path):
+                        await pipeline.put('pdf', functools.partial(_render_pdf, html_path, pdf_path))
+            workers = [asyncio.ensure_future(_worker(gs_page, pipeline)) for gs_page in gs_pages]
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                # stop the other workers so that the frontier is saved after all of them
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+    finally:
+        save_frontier()
+        gs_profile_store.close()
+        while not pdf_pages.empty():
+            await pdf_pages.get_nowait().close()
+
+
+async def _gs_scrape_profile(gs_page: Page, user_url: str, uid: str, gs_pdf_dir: str, gs_html_dir: str,
+                             google_scholar_url='https://scholar.google.com/', order_by_year=True,
+                             artifacts='html+pdf'):
+    open_url = urljoin(google_scholar_url, user_url)
+    if order_by_year:
+        open_url += '&view_op=list_works&sortby=pubdate'
+    await gs_page.goto(open_url)
+    await gs_page.wait_for_selector('div#gsc_prf_in')
+
+    # extract all fields at once to save round trips
+    data = await gs_page.evaluate(GS_PROFILE_JS)
+    profile = GsProfileItem()  # type: ignore
+    profile['url'] = user_url
+    profile['name'] = data['name']
+    profile['brief'] = data['brief']
+    profile['cited_stats'] = data['cited_stats']
+    profile['homepage'] = data['homepage'] or ''
+    profile['articles'] = data['articles']
+    profile['tags'] = data['tags']
+    profile['co_authors'] = [GsProfileEntry(name=a['name'], url=a['url']) for a in data['co_authors']]  # type: ignore
+    profile['html_path'] = ''
+    profile['pdf_path'] = ''
+    if artifacts == 'none':
+        return profile
+    # save html
+    html_path = os.path.join(gs_html_dir, f'profile_{uid}.html')
+    html_text = await gs_page.content()
+    with open(html_path, 'w', encoding='utf-8') as fp:
+        fp.write(html_text)
+    profile['html_path'] = html_path
+    # the pdf will be rendered from the html later
+    if artifacts == 'html+pdf':
+        profile['pdf_path'] = os.path.join(gs_pdf_dir, f'profile_{uid}.pdf')
+    return profile
+
+
+async def _gs_render_pdf(pdf_page: Page, html_path: str, pdf_path: str,
+                         google_scholar_url='https://scholar.google.com/'):
+    with open(html_path, 'r', encoding='utf-8') as fp:
+        html_text = fp.read()
+    # resolve the relative urls of stylesheets against google scholar
+    html_text = html_text.replace('<head>', f'<head><base href="{google_scholar_url}">', 1)
+    await pdf_page.set_content(html_text, wait_until='load')
+    # write to a temp file so that a partial pdf won't be taken as done
+    tmp_path = pdf_path + '.tmp'
+    await pdf_page.pdf(path=tmp_path)
+    os.replace(tmp_path, pdf_path)
+    logger.info("render pdf %s", pdf_path)
 
 
 async def gs_search_by_authors(browser: BrowserContext,
@@ -152,20 +285,32 @@ async def gs_search_by_authors(browser: BrowserContext,
                                page_limit=3,
                                keyword='',
                                google_scholar_url='https://scholar.google.com/?hl=en&as_sdt=0,5',
+                               cite_mode='click',
+                               cite_concurrency=4,
                                ):
     """
     search by authors in google scholar
+
+    :param cite_mode: str
+        How to get the EndNote citations, `click` to click the cite button and download the file one by one,
+        `request` to fetch the citations of a whole result page concurrently with the request api of browser context,
+        which shares cookies with the pages.
+    :param cite_concurrency: int
+        The max number of citations to fetch at the same time in request mode
     """
+    assert cite_mode in ('click', 'request'), 'cite_mode should be click or request'
     os.makedirs(out_dir, exist_ok=True)
     gs_result_file = os.path.join(out_dir, 'gs_result.jsonl')
 
-    # load existed results
-    gs_search_result = []
-    if os.path.exists(gs_result_file):
-        gs_search_result: List[GsSearchItem] = load_jsonl(gs_result_file)
+    # existed results are indexed by article url
+    with JsonlStore(gs_result_file, key=lambda item: item['url']) as gs_result_store:
+        await _gs_search_by_authors(browser, gs_result_store, authors, page_limit=page_limit, keyword=keyword,
+                                    google_scholar_url=google_scholar_url,
+                                    cite_mode=cite_mode, cite_concurrency=cite_concurrency)
 
-    processed_articles = set(item['url'] for item in gs_search_result)
 
+async def _gs_search_by_authors(browser: BrowserContext, gs_result_store: JsonlStore, authors: List[str],
+                                page_limit=3, keyword='', google_scholar_url='', cite_mode='click', cite_concurrency=4):
     gs_page = browser.pages[0]
     for author in authors:
         # search articles by auther
@@ -184,72 +329,118 @@ async def gs_search_by_authors(browser: BrowserContext,
                     logger.warn('no more page to process')
                     break
 
-            # iterate each article in google scholar,
-            cite_modal = gs_page.locator('div#gs_cit')
-
             article_divs = await gs_page.locator('div.gs_r.gs_or.gs_scl').all()
-            for article_div in article_divs:
-                try:
-                    article_url = await article_div.locator('h3.gs_rt a').get_attribute('href', timeout=1e3)
-                    if article_url in processed_articles:
-                        logger.info('article %s has been processed', article_url)
-                        continue
-
-                    # download and parse endnote citation
-                    await article_div.locator('a.gs_or_cit').click()
-
-                    async with gs_page.expect_download() as download_info:
-                        await cite_modal.locator('a.gs_citi').get_by_text('EndNote').click()
-                    download = await download_info.value
-                    # close cite modal
-                    await cite_modal.locator('a#gs_cit-x').click()
-
-                    await download.save_as(download.suggested_filename)
-                    with open(download.suggested_filename, 'r', encoding='utf-8') as fp:
-                        cite_data = fp.read()
-
-                    citation = parse_endnote(cite_data)
-                    logger.info('citation: %s', citation)
-
-                    # get authors with google scholar and the link to their profile
-                    profile_links = await article_div.locator('div.gs_a a').all()
-                    gs_profiles = []
-                    for profile_link in profile_links:
-                        gs_profile = GsProfileEntry()  # type: ignore
-                        gs_profile['name'] = await profile_link.inner_text()
-                        gs_profile['url'] = await profile_link.get_attribute('href')  # type: ignore
-                        logger.info('gs_profile: %s', gs_profile)
-                        gs_profiles.append(gs_profile)
-
-                    gs_search_item = GsSearchItem(
-                        url=article_url,  # type: ignore
-                        citation=citation,
-                        profiles=gs_profiles,
-                    )
-                    gs_search_result.append(gs_search_item)
-
-                    # write result to file
-                    with open(gs_result_file, 'a', encoding='utf-8') as fp:
-                        fp.write(json.dumps(gs_search_item, ensure_ascii=False))
-                        fp.write('\n')
-
-                    processed_articles.add(article_url)  # type: ignore
-
-                except TimeoutError as e:
-                    logger.exception("unexpected error occured")
+            # extract the data of all articles at once to save round trips
+            article_data = await gs_page.evaluate(GS_RESULTS_JS)
+            articles = []
+            for article_div, article in zip(article_divs, article_data):
+                if not article['url']:
+                    logger.warning('no link found for article %s', article['cid'])
+                    continue
+                if article['url'] in gs_result_store:
+                    logger.info('article %s has been processed', article['url'])
+                    continue
+                articles.append((article_div, article))
+
+            if cite_mode == 'request':
+                cite_data_list = await _gs_fetch_endnotes(browser, gs_page.url, [a['cid'] for _, a in articles],
+                                                          concurrency=cite_concurrency)
+            else:
+                cite_data_list = []
+                for article_div, _ in articles:
+                    cite_data_list.append(await _gs_download_endnote(gs_page, article_div))
+
+            for (_, article), cite_data in zip(articles, cite_data_list):
+                if not cite_data:
+                    continue
+                article_url = article['url']
+                citation = parse_endnote(cite_data)
+                logger.info('citation: %s', citation)
+
+                # get authors with google scholar and the link to their profile
+                gs_profiles = [GsProfileEntry(name=p['name'], url=p['url']) for p in article['profiles']]  # type: ignore
+                logger.info('gs_profiles: %s', gs_profiles)
+
+                gs_search_item = GsSearchItem(
+                    url=article_url,  # type: ignore
+                    citation=citation,
+                    profiles=gs_profiles,
+                )
+                gs_result_store.add(gs_search_item)  # type: ignore
+
+
+async def _gs_download_endnote(gs_page: Page, article_div) -> str:
+    """
+    download the EndNote citation of an article by clicking the cite button
+    """
+    cite_modal = gs_page.locator('div#gs_cit')
+    try:
+        await article_div.locator('a.gs_or_cit').click()
+        async with gs_page.expect_download() as download_info:
+            await cite_modal.locator('a.gs_citi').get_by_text('EndNote').click()
+        download = await download_info.value
+        # close cite modal
+        await cite_modal.locator('a#gs_cit-x').click()
+
+        await download.save_as(download.suggested_filename)
+        with open(download.suggested_filename, 'r', encoding='utf-8') as fp:
+            return fp.read()
+    except TimeoutError:
+        logger.exception("unexpected error occured")
+        return ''
+
+
+async def _gs_fetch_endnotes(browser: BrowserContext, page_url: str, cids: List[str], concurrency=4) -> List[str]:
+    """
+    fetch the EndNote citations of articles in memory with the request api of browser context
+
+    The cite popup of each article is fetched to find the export link of EndNote,
+    and then the citation is fetched from the link.
+    An empty string is returned for the article that fails to fetch.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch(cid: str):
+        cite_url = urljoin(page_url, f'/scholar?q=info:{cid}:scholar.google.com/&output=cite&scirp=0&hl=en')
+        try:
+            async with semaphore:
+                res = await browser.request.get(cite_url)
+                endnote_url = gs_get_endnote_url(await res.text())
+                if not endnote_url:
+                    logger.warning('no EndNote link found for article %s', cid)
+                    return ''
+                res = await browser.request.get(urljoin(cite_url, endnote_url))
+                if not res.ok:
+                    logger.warning('fail to fetch citation of article %s: %s', cid, res.status)
+                    return ''
+                return await res.text()
+        except Exception:
+            logger.exception('fail to fetch citation of article %s', cid)
+            return ''
+
+    return await asyncio.gather(*[fetch(cid) for cid in cids])
+
+
+def gs_get_endnote_url(cite_html: str) -> str:
+    """
+    get the EndNote export link from the html of cite popup
+    """
+    soup = BeautifulSoup(cite_html, 'html.parser')
+    for a in soup.select('a.gs_citi'):
+        if a.get_text(strip=True) == 'EndNote':
+            return str(a.get('href', ''))
+    return ''
 
 
 def gs_list_profile_urls(result_file: str):
-    result: List[GsSearchItem] = load_jsonl(result_file)
-    urls = set(profile['url'] for item in result for profile in item['profiles'])
+    urls = set(profile['url'] for item in iter_jsonl(result_file) for profile in item['profiles'])
     print('\n'.join(urls))
 
 
 def gs_list_authors(result_file: str):
     from colorama import deinit
     deinit()
-    result: List[GsSearchItem] = load_jsonl(result_file)
-    names = set(author for item in result for author in item['citation']['authors'])
+    names = set(author for item in iter_jsonl(result_file) for author in item['citation']['authors'])
     print('\n'.join(names))
 
 
@@ -259,46 +450,95 @@ def gs_get_profile_id(url: str):
     params = dict(kv.split('=') for kv in query.split('&'))
     return params['user']
 
-def gs_fix_profile_from_html(out_dir: str, suffix = None):
+def gs_fix_profile_from_html(out_dir: str, suffix = None, workers=0):
+    """
+    rebuild profiles from the saved html files without launching browser
+
+    The profiles in gs_profiles.jsonl are rebuilt in order, then the html files
+    that are not in gs_profiles.jsonl, the result is written to gs_profiles_{suffix}.jsonl
+
+    :param workers: number of processes to parse html files, 0 means the number of cpu cores
+    """
     if suffix is None:
         # use timestemp as suffix
         suffix = datetime.now().strftime('%Y%m%d%H%M%S')
 
     gs_html_dir = os.path.join(out_dir, 'gs_htmls')
+    gs_pdf_dir = os.path.join(out_dir, 'gs_pdfs')
     src = os.path.join(out_dir, 'gs_profiles.jsonl')
     dst = os.path.join(out_dir, f'gs_profiles_{suffix}.jsonl')
 
-    profiles: List[GsProfileItem] = load_jsonl(src)
-    for profile in profiles:
-        # fix co_authors name
-        for co_author in profile['co_authors']:
-            if isinstance(co_author['name'], list):
-                co_author['name'] = co_author['name'][0]
-        # fix data from html
-        html_path = os.path.join(gs_html_dir, os.path.basename(profile['html_path']))
-        with open(html_path, 'r', encoding='utf-8') as fp:
-            soup = BeautifulSoup(fp, 'html.parser')
-        # get article from html
-        article_links = soup.select('a.gsc_a_at')
-        articles = [article_div.text for article_div in article_links]
-        profile['articles'] = articles
-        # get tags from html
-        tags_links = soup.select('a.gsc_prf_inta.gs_ibl')
-        tags = [tag_div.text for tag_div in tags_links]
-        profile['tags'] = tags
-
-    with open(dst, 'w', encoding='utf-8') as fp:
-        for profile in profiles:
+    # (html_path, url, pdf_path) of profiles to rebuild
+    tasks: List[Tuple[str, str, str]] = []
+    if os.path.exists(src):
+        for profile in iter_jsonl(src):
+            # no html is saved with artifacts=none
+            html_file = os.path.basename(profile.get('html_path') or '')
+            html_path = os.path.join(gs_html_dir, html_file)
+            if not html_file or not os.path.isfile(html_path):
+                logger.warning('skip profile without html: %s', profile.get('url'))
+                continue
+            tasks.append((html_path, profile['url'], profile.get('pdf_path', '')))
+    known_html_paths = set(task[0] for task in tasks)
+    for html_file in sorted(os.listdir(gs_html_dir)):
+        html_path = os.path.join(gs_html_dir, html_file)
+        if html_path in known_html_paths or not html_file.startswith('profile_'):
+            continue
+        uid = html_file[len('profile_'):-len('.html')]
+        pdf_path = os.path.join(gs_pdf_dir, f'profile_{uid}.pdf')
+        tasks.append((html_path, f'/citations?user={uid}', pdf_path if os.path.exists(pdf_path) else ''))
+
+    with ProcessPoolExecutor(workers or os.cpu_count()) as executor, \
+            open(dst, 'w', encoding='utf-8') as fp:
+        for i, profile in enumerate(executor.map(_gs_parse_profile_file, tasks, chunksize=16), 1):
             fp.write(json.dumps(profile, ensure_ascii=False))
             fp.write('\n')
+            if i % 1000 == 0:
+                logger.info('%d/%d profiles rebuilt', i, len(tasks))
+
 
+def _gs_parse_profile_file(task: Tuple[str, str, str]):
+    html_path, url, pdf_path = task
+    with open(html_path, 'r', encoding='utf-8') as fp:
+        profile = gs_parse_profile_html(fp.read(), url)
+    profile['pdf_path'] = pdf_path
+    profile['html_path'] = html_path
+    return profile
+
+
+def gs_parse_profile_html(html_text: str, url: str) -> GsProfileItem:
+    """
+    parse google scholar profile from html, the same as what gs_explore_profiles gets from the page
+    """
+    soup = BeautifulSoup(html_text, 'html.parser')
+
+    def text(selector: str):
+        el = soup.select_one(selector)
+        return el.get_text('\n', strip=True) if el else ''
+
+    cited_stats = ''
+    table = soup.select_one('table#gsc_rsb_st')
+    if table:
+        rows = [[cell.get_text(strip=True) for cell in tr.find_all(['th', 'td'])] for tr in table.find_all('tr')]
+        cited_stats = '\n'.join('\t'.join(row) for row in rows)
+
+    homepage = ''
+    for a in soup.select('a.gsc_prf_ila'):
+        if 'Homepage' in a.get_text():
+            homepage = a.get('href') or ''
+            break
 
-def load_jsonl(file: str):
-    result = []
-    with open(file, 'r', encoding='utf-8') as fp:
-        for line in fp:
-            result.append(json.loads(line))
-    return result
+    profile = GsProfileItem()  # type: ignore
+    profile['url'] = url
+    profile['name'] = text('div#gsc_prf_in')
+    profile['brief'] = text('div#gsc_prf_w')
+    profile['cited_stats'] = cited_stats
+    profile['homepage'] = homepage  # type: ignore
+    profile['co_authors'] = [GsProfileEntry(name=a.get_text(strip=True), url=a.get('href'))  # type: ignore
+                             for a in soup.select('ul.gsc_rsb_a li a')]
+    profile['articles'] = [a.text for a in soup.select('a.gsc_a_at')]
+    profile['tags'] = [a.text for a in soup.select('a.gsc_prf_inta.gs_ibl')]
+    return profile
 
 
 def parse_endnote(text: str):
@@ -358,12 +598,23 @@ class GsCmd:
                              page_limit=3,
                              keyword='',
                              google_scholar_url='https://scholar.google.com/?hl=en&as_sdt=0,5',
+                             cite_mode='click',
+                             cite_concurrency=4,
+                             block='light',
                              ):
+        """
+        :param block: str
+            The profile of requests to block in browser, see browser.BLOCK_PROFILES,
+            the images are kept by default so that captcha can be solved by hand
+        """
         authors = [line.strip() for line in sys.stdin]
+        blocker = ResourceBlocker(block)
         async def run():
-            async with BrowserCmd()._launch_async(self._browser_dir) as browser_ctx:
+            async with BrowserCmd()._launch_async(self._browser_dir, blocker=blocker) as browser_ctx:
                 await gs_search_by_authors(
-                    browser_ctx, authors=authors, out_dir=out_dir, keyword=keyword, page_limit=page_limit, google_scholar_url=google_scholar_url)
+                    browser_ctx, authors=authors, out_dir=out_dir, keyword=keyword, page_limit=page_limit, google_scholar_url=google_scholar_url,
+                    cite_mode=cite_mode, cite_concurrency=cite_concurrency)
+                blocker.save(os.path.join(out_dir, 'resource-stats.json'))
                 pending()
         asyncio.run(run())
 
@@ -372,13 +623,34 @@ class GsCmd:
                             depth_limit=1,
                             google_scholar_url='https://scholar.google.com/',
                             order_by_year=True,
+                            concurrency=1,
+                            artifacts=None,
+                            pdf_workers=1,
+                            block='light',
                             ):
+        """
+        :param artifacts: str
+            The artifacts to keep for each profile, one of none, html, html+pdf,
+            default to html+pdf if the browser is headless, otherwise html as pdf can't be rendered
+        :param block: str
+            The profile of requests to block in browser, see browser.BLOCK_PROFILES,
+            the stylesheets and images are kept by default as the pdf is rendered in browser
+            and captcha can be solved by hand
+        """
+        headless = load_browser_config(self._browser_dir).get('headless', False)
+        if artifacts is None:
+            artifacts = 'html+pdf' if headless else 'html'
+        assert headless or artifacts != 'html+pdf', \
+            'pdf can only be rendered in headless mode, set headless in config.json of browser_dir or use --artifacts html'
         profile_urls = [line.strip() for line in sys.stdin]
+        blocker = ResourceBlocker(block)
         async def run():
-            async with BrowserCmd()._launch_async(self._browser_dir) as browser_ctx:
+            async with BrowserCmd()._launch_async(self._browser_dir, blocker=blocker) as browser_ctx:
                 await gs_explore_profiles(
                     browser_ctx, gs_profile_urls=profile_urls, out_dir=out_dir, depth_limit=depth_limit, order_by_year=order_by_year, google_scholar_url=google_scholar_url,
+                    concurrency=concurrency, artifacts=artifacts, pdf_workers=pdf_workers,
                 )
+                blocker.save(os.path.join(out_dir, 'resource-stats.json'))
                 pending()
         asyncio.run(run())
 
@@ -391,5 +663,5 @@ class GsCmd:
         gs_list_authors(result_file)
 
 
-    def gs_fix_profile_from_html(self, out_dir: str, suffix = None):
-        gs_fix_profile_from_html(out_dir, suffix)
+    def gs_fix_profile_from_html(self, out_dir: str, suffix = None, workers=0):
+        gs_fix_profile_from_html(out_dir, suffix, workers=workers)
@@ -1,25 +1,38 @@
 from playwright.async_api import async_playwright, Page, TimeoutError
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from urllib.parse import urlparse
+from typing import Optional
+from collections import Counter
 from pprint import pprint
 
 import pandas as pd
 import subprocess as sp
-import requests
+import functools
+import tempfile
 import asyncio
 import random
 import json
+import re
 import time
 import uuid
 import os
 
 from auto_assist.lib import (
-    url_to_key, get_md_code_block, excel_autowidth,
-    expand_globs, get_logger, clean_html, formal_filename,
+    url_to_key, get_md_code_block,
+    expand_globs, scan_dir, get_logger, clean_html, clean_soup, clean_html_file, html_to_markdown, formal_filename,
     jsonl_load, jsonl_dump, jsonl_loads,
-    json_load_file, json_dump_file,
-    is_chinese_name,
+    json_load_file, json_dump_file, json_dump_file_iter, split_markdown, merge_records,
+    BoilerplateFilter, estimate_tokens,
+    is_chinese_name, chinese_name_mask,
     )
-from auto_assist.browser import launch_browser, page_sleath
+from auto_assist.browser import (
+    launch_browser, page_sleath, DomainThrottle, PageLoadStats, ResourceBlocker, BLOCK_PROFILES, wait_page_ready,
+    track_dom_mutations,
+)
+from auto_assist.fetcher import HybridFetcher
+from auto_assist.pipeline import StagePipeline, run_in_thread
+from auto_assist.llm import LlmGateway, LlmCache
+from auto_assist.store import Manifest, SheetWriter, TableWriter
 from auto_assist import config
 
 from . import prompt
@@ -31,26 +44,113 @@ class HunterCmd:
     def __init__(self,
                  pandoc_cmd='pandoc',
                  pandoc_opt='+RTS -M1024m -RTS --sandbox -f html-native_divs-native_spans -t markdown',
+                 converter='pandoc',
                  openai_log='./openai-log.jsonl',
                  browser_dir=None,
-                 proxy=None):
+                 proxy=None,
+                 domain_concurrency=1,
+                 domain_interval=1.0,
+                 convert_workers=2,
+                 parse_workers=4,
+                 queue_size=32,
+                 openai_model='deepseek-chat',
+                 openai_max_in_flight=8,
+                 openai_rpm=0,
+                 openai_tpm=0,
+                 openai_cache='./openai-cache.sqlite',
+                 openai_cache_size=1024,
+                 chunk_tokens=8000,
+                 manifest=True,
+                 verify_manifest=False,
+                 fetcher='browser',
+                 fetch_strategy='./fetch-strategy.json',
+                 block='default'):
         """
         Camnnd line interface to the Chemistry Hunter
 
         :param pandoc_cmd: str
             The command to run pandoc
+        :param converter: str
+            The html to markdown converter, 'pandoc' or 'python'
         :param proxy: str
-            The proxy to use for requests and playwright
+            The proxy to use for http client and playwright
+        :param domain_concurrency: int
+            The max number of pages loading from the same domain at the same time
+        :param domain_interval: float
+            The min interval in seconds between two page loads of the same domain
+        :param convert_workers: int
+            The number of workers to convert html to markdown
+        :param parse_workers: int
+            The number of workers to parse markdown with LLM
+        :param queue_size: int
+            The max number of pending jobs of each stage, the scrapers will wait if it is full
+        :param openai_max_in_flight: int
+            The max number of LLM requests waiting for response
+        :param openai_rpm: int
+            The max LLM requests per minute, 0 means unlimited
+        :param openai_tpm: int
+            The max LLM tokens per minute, 0 means unlimited
+        :param openai_cache: str
+            The SQLite file to cache LLM responses, empty to disable
+        :param openai_cache_size: int
+            The max size of the LLM cache in MB, 0 means unlimited
+        :param chunk_tokens: int
+            The max tokens of markdown to extract faculty or group members at a time,
+            larger page will be split into chunks, 0 means never split
+        :param manifest: bool
+            Whether to decide what to resume from manifest.jsonl of the output directory
+            instead of checking files one by one, the artifacts built from a changed upstream will be rebuilt
+        :param verify_manifest: bool
+            Whether to check that the artifacts in manifest exist, so that the files deleted by hand are rebuilt
+        :param fetcher: str
+            How to fetch pages, 'browser' to load every page in browser,
+            'hybrid' to try a pooled http client first and fall back to browser if the page requires it
+        :param fetch_strategy: str
+            The json file to remember the hosts that require browser with hybrid fetcher, empty to disable
+        :param block: str
+            The profile of requests to block in browser, 'default' to block images, media, fonts, stylesheets,
+            ads and large downloads, 'light' to block media, ads and large downloads only, 'none' to block nothing
         """
         self._pandoc_cmd = pandoc_cmd
         self._pandoc_opt = pandoc_opt
+        assert converter in ('pandoc', 'python'), f'invalid converter: {converter}'
+        self._converter = converter
         self._proxy = proxy
         self._browser_dir = browser_dir
         self._openai_log = openai_log
-        self._last_request_ts = 0
-        self._wait_interval = 0
-
-    def search_faculties(self, in_excel, out_dir, parse=False, max_tries=3, delay=1):
+        self._domain_concurrency = domain_concurrency
+        self._domain_interval = domain_interval
+        self._throttle = DomainThrottle(domain_concurrency, domain_interval)
+        self._convert_workers = convert_workers
+        self._parse_workers = parse_workers
+        self._queue_size = queue_size
+        self._pipeline = None
+        self._openai_model = openai_model
+        self._openai_max_in_flight = openai_max_in_flight
+        self._openai_rpm = openai_rpm
+        self._openai_tpm = openai_tpm
+        self._openai_cache = openai_cache
+        self._openai_cache_size = openai_cache_size
+        self._chunk_tokens = chunk_tokens
+        self._boilerplate = BoilerplateFilter()
+        self._boilerplate_dir = None
+        self._deferred_parse = None
+        self._llm = None
+        self._use_manifest = manifest
+        self._verify_manifest = verify_manifest
+        self._manifest = None
+        assert fetcher in ('browser', 'hybrid'), f'invalid fetcher: {fetcher}'
+        self._fetcher_mode = fetcher
+        self._fetch_strategy = fetch_strategy
+        self._fetcher = None
+        self._page_stats = PageLoadStats()
+        assert block in BLOCK_PROFILES, f'invalid block profile: {block}'
+        self._block = block
+        self._blocker = None
+        self._prefilter_stats = Counter()
+        self._prefilter_urls = set()
+
+    def search_faculties(self, in_excel, out_dir, parse=False, max_tries=3, delay=1, concurrency=1, prune=False):
         """
         Search faculty members from excel file
 
@@ -60,18 +160,20 @@ class HunterCmd:
             The output directory to save the faculty members
         :param parse: bool
             Whether to parse the faculty members
+        :param concurrency: int
+            The number of pages to process rows in parallel
+        :param prune: bool
+            Whether to prune boilerplate of pages before parsing
         """
         df = self.load_excel(in_excel)
         async def _run():
             async with async_playwright() as pw:
                 # setup browser
                 assert isinstance(self._browser_dir, str)
-                browser = await launch_browser(self._browser_dir)(pw)
-                page = browser.pages[0]
-                await page.route('**/*.{png,jpg,jpeg,webp,css,woff,woff2,ttf,svg}', lambda route: route.abort())
-                for i, row in df.iterrows():
-                    await self._async_search_faculty(row, out_dir, page, parse=parse)
-        asyncio.run(_run())
+                browser = await launch_browser(self._browser_dir, blocker=self._get_blocker())(pw)
+                jobs = [functools.partial(self._async_search_faculty, row, out_dir, parse=parse, prune=prune)
+                        for _, row in df.iterrows()]
+                await self._async_run_pool(browser, jobs, concurrency, out_dir=out_dir, prune=prune)
 
         for _ in range(max_tries):
             try:
@@ -82,7 +184,7 @@ class HunterCmd:
                 logger.exception(f'fail to search faculties')
                 time.sleep(delay)
 
-    def process_faculties(self, *faculty_dirs, out_excel):
+    def process_faculties(self, *faculty_dirs, out_excel=None, out_table=None, workers=0):
         """
         filter candidates from jsonl files
 
@@ -90,53 +192,32 @@ class HunterCmd:
             The faculty directories that contains faculty members
         :param out_excel: str
             The output excel file to save the candidates
+        :param out_table: str
+            The output table file of parquet, feather or csv to save the candidates,
+            the excel file is built from it if both are provided
+        :param workers: int
+            The number of processes to read the directories, 0 means the number of cpu cores
         """
-        candidates = []
-        for faculty_dir in expand_globs(faculty_dirs):
-            index_json_file = os.path.join(faculty_dir, 'index.json')
-            index = json_load_file(index_json_file)
-            faculty_json_file = os.path.join(faculty_dir, 'faculty.html.md.jsonl')
-            with open(faculty_json_file, 'r', encoding='utf-8') as f:
-                faculties = list(jsonl_load(f))
-            base_url = index.get('FacultyPage', '')
-            base_url = base_url.split('?', maxsplit=1)[0]  # remove query string
-            assert isinstance(base_url, str), f'invalid base url: {base_url}'
-            for faculty in faculties:
-                faculty['src'] = index['FacultyPage']
-                faculty['institute'] = index.get('Institute', '')
-                faculty['department'] = index.get('Department', '')
-                profile_url = faculty.get('profile_url', '')
-                if profile_url and not profile_url.startswith('http'):
-                    _base_url = base_url
-                    if profile_url.startswith('/'):
-                        _base_url = base_url[:8] + base_url[8:].split('/', maxsplit=1)[0]
-                    faculty['profile_url'] = _base_url + profile_url
-                title = faculty.get('title', '').lower()
-                if not title:
-                    logger.warning(f'title is empty for {faculty["name"]} in {faculty_json_file}')
-
-                if is_chinese_name(faculty['name']):
-                    candidates.append(faculty)
-
-        df = pd.DataFrame(candidates)
-        with open(out_excel, 'wb') as f:
-            df.to_excel(f, index=False)
-
-    def search_cvs(self, in_excel, out_dir, max_search=3, max_tries=1, delay=1, parse=False, limit=0):
+        with SheetWriter(['Sheet1'], out_table, out_excel, autowidth=False) as writer:
+            for faculties in map_dirs(_process_faculty_dir, expand_globs(faculty_dirs), workers):
+                for faculty in faculties:
+                    writer.write('Sheet1', faculty)
+
+    def search_cvs(self, in_excel, out_dir, max_search=3, max_tries=1, delay=1, parse=False, limit=0,
+                   concurrency=1, prune=False):
         df = self.load_excel(in_excel, sheet_name='Sheet1')
         async def _run():
             async with async_playwright() as pw:
                 # setup browser
                 assert isinstance(self._browser_dir, str)
-                browser = await launch_browser(self._browser_dir)(pw)
-                page = browser.pages[0]
-                await page.route('**/*.{png,jpg,jpeg,webp,css,woff,woff2,ttf,svg}', lambda route: route.abort())
-
+                browser = await launch_browser(self._browser_dir, blocker=self._get_blocker())(pw)
+                jobs = []
                 for i, (_, row) in enumerate(df.iterrows()):
                     if limit > 0 and i >= limit:
                         break
-                    await self._async_search_cv(row, out_dir, page,
-                                                max_search=max_search, parse=parse)
+                    jobs.append(functools.partial(self._async_search_cv, row, out_dir,
+                                                  max_search=max_search, parse=parse, prune=prune))
+                await self._async_run_pool(browser, jobs, concurrency, out_dir=out_dir, prune=prune)
         for _ in range(max_tries):
             try:
                 asyncio.run(_run())
@@ -146,72 +227,60 @@ class HunterCmd:
                 logger.exception(f'fail to search cvs')
                 time.sleep(delay)
 
-    def process_cvs(self, *cv_dirs, out_excel):
+    def process_cvs(self, *cv_dirs, out_excel=None, out_table=None, workers=0):
         """
         filter teams from json files
 
         :param cv_dirs: list of str
             The cv directories that contains cv information
-        :param out_file: str
+        :param out_excel: str
             The output file in excel format to save the teams
+        :param out_table: str
+            The output table file of parquet, feather or csv to save the teams,
+            the excel file is built from it if both are provided
+        :param workers: int
+            The number of processes to read the directories, 0 means the number of cpu cores
         """
-        groups = []
+        with SheetWriter(['groups'], out_table, out_excel, max_width=150) as writer:
+            for cv_groups in map_dirs(_process_cv_dir, expand_globs(cv_dirs), workers):
+                for group in cv_groups:
+                    writer.write('groups', group)
 
-        for cv_dir in expand_globs(cv_dirs):
-            cv_file_pattern = os.path.join(cv_dir, 'cv-*.json')
-            for cv_file in expand_globs([cv_file_pattern]):
-                cv = json_load_file(cv_file)
-                member = cv.get('name', '')
-                if not member:
-                    continue
-                email = cv.get('email', '')
-                for exp in cv.get('experiences', []):
-                    advisor = exp.get('advisor', '')
-                    if not advisor:
-                        continue
-                    group = {
-                        'member': member,
-                        'email': email,
-                        'title': exp.get('title', ''),
-                        'institute': exp.get('institute', ''),
-                        'group': exp.get('group', ''),
-                        'advisor': advisor,
-                    }
-                    groups.append(group)
-
-        with open(out_excel, 'wb') as f:
-            df = pd.DataFrame(groups)
-            with pd.ExcelWriter(f, engine_kwargs={'options': {'strings_to_urls': False}}) as writer:
-                df.to_excel(writer, sheet_name='groups', index=False)
-                excel_autowidth(df, writer.sheets['groups'], max_width=150)
-
-    def search_group_members(self, in_excel, out_dir, max_search=3, max_tries=1, delay=1, parse=False):
+    def search_group_members(self, in_excel, out_dir, max_search=3, max_tries=1, delay=1, parse=False,
+                             concurrency=1, prune=False, prefilter=False):
         """
         Search group members from excel file
 
         :param in_excel: str
             The input excel file that contains advisor and group information
         :param out_dir: str
+        :param concurrency: int
+            The number of pages to process rows in parallel
+        :param prune: bool
+            Whether to prune boilerplate of pages before parsing
+        :param prefilter: bool
+            Whether to skip the google results that look like personal profiles
+            or whose page is already taken by another group, the report is saved to prefilter.json
         """
         df = self.load_excel(in_excel)
         async def _run():
             async with async_playwright() as pw:
                 # setup browser
                 assert isinstance(self._browser_dir, str)
-                browser = await launch_browser(self._browser_dir)(pw)
-                page = browser.pages[0]
-                await page.route('**/*.{png,jpg,jpeg,webp,css,woff,woff2,ttf,svg}',
-                                 lambda route: route.abort())
+                browser = await launch_browser(self._browser_dir, blocker=self._get_blocker())(pw)
+                self._reset_prefilter()
                 # search team members
                 known_advisors = set()
-
+                jobs = []
                 for i, row in df.iterrows():
                     advisor = row.get('advisor')
                     if not isinstance(advisor, str) or not advisor or advisor.lower() in known_advisors:
                         continue
                     known_advisors.add(advisor.lower())
-                    await self._async_search_group(row, out_dir, page,
-                                                   max_search=max_search, parse=parse)
+                    jobs.append(functools.partial(self._async_search_group, row, out_dir,
+                                                  max_search=max_search, parse=parse, prune=prune,
+                                                  prefilter=prefilter))
+                await self._async_run_pool(browser, jobs, concurrency, out_dir=out_dir, prune=prune)
 
         for _ in range(max_tries):
             try:
@@ -221,8 +290,10 @@ class HunterCmd:
             except Exception as e:
                 logger.exception(f'fail to search team members')
                 time.sleep(delay)
+        if prefilter:
+            self._report_prefilter(out_dir, max_search, parse)
 
-    def process_groups(self, *group_dirs, out_excel):
+    def process_groups(self, *group_dirs, out_excel=None, out_table=None, workers=0):
         """
         Filter group members from group directories
 
@@ -230,89 +301,65 @@ class HunterCmd:
             The group directories that contains group members
         :param out_excel: str
             The output excel file to save the group members
+        :param out_table: str
+            The output table file of parquet, feather or csv, the groups and candidates are saved to
+            {name}.groups.{ext} and {name}.candidates.{ext}, the excel file is built from them if both are provided
+        :param workers: int
+            The number of processes to read the directories, 0 means the number of cpu cores
         """
-        groups = []
-        candidates = []
-
         known_names = set()
-        for group_dir in expand_globs(group_dirs):
-            index_json_file = os.path.join(group_dir, 'index.json')
-            group = json_load_file(index_json_file)
-            google_search_file = os.path.join(group_dir, 'google-search.json')
-            google_results = json_load_file(google_search_file)
-            urls = [r['url'] for r in google_results if valid_group_url(r['url'])][:3]
-
-            groups.append({
-                'institute': group.get('institute', ''),
-                'group': group.get('group', ''),
-                'advisor': group.get('advisor', ''),
-                'urls': '\r\n'.join(urls),
-            })
-
-            for group_file in expand_globs([f'{group_dir}\group-*.jsonl']):
-                with open(group_file, 'r', encoding='utf-8') as f:
-                    members = list(jsonl_load(f))
-
-                for member in members:
-                    try:
-                        name = member.get('name', '')
-                        if name.lower() in known_names:
-                            continue
-                        known_names.add(name.lower())
-                        # is chinese name is decided by LLM, double check is required
-                        is_chinese = member.get('is_chinese', False)
-                        if not is_chinese:
-                            # double check if the name is chinese
-                            is_chinese = is_chinese_name(name)
-                        if not is_chinese:
-                            continue
-                        title = member.get('title', '')
-                        # filter out non-graduate students, if title is empty also keep it
-                        if title and not is_graduate(title):
-                            continue
-                        candidates.append({
-                            'name': name,
-                            'title': title,
-                            'email': member.get('email', ''),
-                            'advisor': group.get('advisor', ''),
-                            'group': group.get('group', ''),
-                            'institute': group.get('institute', ''),
-                            'description': member.get('description', ''),
-                        })
-                    except Exception as e:
-                        logger.exception(f'fail to process {group_file}')
-                        logger.info(f'member: {member}')
-
-        group_df = pd.DataFrame(groups)
-        candidate_df = pd.DataFrame(candidates)
-
-        with pd.ExcelWriter(out_excel, engine_kwargs={'options':{'strings_to_urls': False}}) as writer:
-            writer.book.formats[0].set_text_wrap()  # type: ignore
-            group_df.to_excel(writer, sheet_name='groups', index=False)
-            candidate_df.to_excel(writer, sheet_name='candidates', index=False)
-            excel_autowidth(group_df, writer.sheets['groups'], max_width=150)
-            excel_autowidth(candidate_df, writer.sheets['candidates'], max_width=150)
+        with SheetWriter(['groups', 'candidates'], out_table, out_excel, max_width=150, text_wrap=True) as writer:
+            for group, members in map_dirs(_process_group_dir, expand_globs(group_dirs), workers):
+                writer.write('groups', group)
+                # the first member of a name wins even if it is not a candidate
+                for name, candidate in members:
+                    if name.lower() in known_names:
+                        continue
+                    known_names.add(name.lower())
+                    if candidate is not None:
+                        writer.write('candidates', candidate)
 
     def search_students(self, in_excel, out_dir, max_search=3, max_tries=1,
-                        delay=1, parse=False, sheet_name='candidates', limit=0, offset=0):
+                        delay=1, parse=False, sheet_name='candidates', limit=0, offset=0,
+                        concurrency=1, prune=False, prefilter=False):
+        """
+        Search the cv of students from excel file
+
+        :param in_excel: str
+            The input excel file that contains name, title and institute of students
+        :param out_dir: str
+        :param limit: int
+            The index of row to stop before, 0 means no limit, rows are sorted by title
+        :param offset: int
+            The index of row to start from
+        :param concurrency: int
+            The number of pages to process rows in parallel
+        :param prune: bool
+            Whether to prune boilerplate of pages before parsing
+        :param prefilter: bool
+            Whether to skip the rows that are unlikely candidates before searching them,
+            and the google results that don't mention the name, the report is saved to prefilter.json
+        """
         df = self.load_excel(in_excel, sheet_name=sheet_name)
         # sort df by title so that we can put missing title to the end
         df = df.sort_values('title', na_position='last')
+        df = df.iloc[offset:limit] if limit > 0 else df.iloc[offset:]
+        skipped = None
+        if prefilter:
+            df, skipped = prefilter_students(df)
         async def _run():
             async with async_playwright() as pw:
                 # setup browser
                 assert isinstance(self._browser_dir, str)
-                browser = await launch_browser(self._browser_dir)(pw)
-                page = browser.pages[0]
+                browser = await launch_browser(self._browser_dir, blocker=self._get_blocker())(pw)
                 # await page_sleath(page)
-                await page.route('**/*.{png,jpg,jpeg,webp,css,woff,woff2,ttf,svg}', lambda route: route.abort())
-                for i, (_, row) in enumerate(df.iterrows()):
-                    if limit > 0 and i >= limit:
-                        break
-                    if i < offset:
-                        continue
-                    await self._async_search_student(row, out_dir, page,
-                                                     max_search=max_search, parse=parse)
+                self._reset_prefilter()
+                jobs = []
+                for _, row in df.iterrows():
+                    jobs.append(functools.partial(self._async_search_student, row, out_dir,
+                                                  max_search=max_search, parse=parse, prune=prune,
+                                                  prefilter=prefilter))
+                await self._async_run_pool(browser, jobs, concurrency, out_dir=out_dir, prune=prune)
         for _ in range(max_tries):
             try:
                 asyncio.run(_run())
@@ -321,65 +368,49 @@ class HunterCmd:
             except Exception as e:
                 logger.exception(f'fail to search students')
                 time.sleep(delay)
+        if prefilter:
+            self._report_prefilter(out_dir, max_search, parse, skipped)
 
-    def process_students(self, *student_dirs, out_json):
-        students = []
-        for student_dir in expand_globs(student_dirs):
-            try:
-                index_json_file = os.path.join(student_dir, 'index.json')
-                index = json_load_file(index_json_file)
-            except:
-                continue
-            # search the json file of students
-            student_json_files = expand_globs([f'{student_dir}\cv-*.md.json'])
-            if not student_json_files:
-                continue
-
-            student_json_files = sorted(student_json_files, key=lambda f: os.path.getsize(f), reverse=True)
-            student_jsons = [json_load_file(f) for f in student_json_files]
+    def process_students(self, *student_dirs, out_json=None, out_table=None, workers=0):
+        """
+        Merge the json files of each student and score them
+
+        :param student_dirs: list of str
+            The student directories that contains cv json files
+        :param out_json: str
+            The output json file to save the students
+        :param out_table: str
+            The output table file of parquet, feather or csv to save the students,
+            experiences and publications are saved as json strings
+        :param workers: int
+            The number of processes to read the directories, 0 means the number of cpu cores
+        """
+        assert out_json or out_table, 'at least one of out_json and out_table should be provided'
+        table_writer = TableWriter(out_table) if out_table else None
 
-            student = student_jsons[0]
-            if not is_graduate(student.get('title') or ''):
-                continue
+        def _iter_students():
+            for student in map_dirs(_process_student_dir, expand_globs(student_dirs), workers):
+                if student is None:
+                    continue
+                if table_writer is not None:
+                    table_writer.write(student)
+                yield student
 
-            experiences = []
-            publications = []
-            for s in student_jsons:
-                if len(s.get('experiences', [])) > len(experiences):
-                    experiences = s.get('experiences', [])
-                if len(s.get('publications', [])) > len(publications):
-                    publications = s.get('publications', [])
-            # score: for each is_famous publication or experience  add 10, otherwise add 1
-            score = 0
-            for exp in experiences:
-                if exp.get('is_famous'):
-                    score += 10
-                else:
-                    score += 1
-            for pub in publications:
-                if pub.get('is_famous'):
-                    score += 10
-                else:
-                    score += 1
-            student['score'] = score
-            student['experiences'] = experiences
-            student['publications'] = publications
-            student['id'] = str(uuid.uuid4())
-            student['institute'] = index.get('institute', '')
-            email = student.get('email', index.get('email'))
-            if email:
-                student['email'] = email
-
-            students.append(student)
-        json_dump_file(students, out_json)
+        # stream the students to file instead of holding them in memory
+        if out_json:
+            json_dump_file_iter(_iter_students(), out_json)
+        else:
+            for _ in _iter_students():
+                pass
+        if table_writer is not None:
+            table_writer.close()
 
     def google_search(self, keyword: str, debug=False):
         async def _run():
             async with async_playwright() as pw:
                 assert isinstance(self._browser_dir, str)
-                browser = await launch_browser(self._browser_dir)(pw)
-                page = browser.pages[0]
-                await page.route('**/*.{png,jpg,jpeg,webp,css,woff,woff2,ttf,svg}', lambda route: route.abort())
+                browser = await launch_browser(self._browser_dir, blocker=self._get_blocker())(pw)
+                page, = await self._async_open_pages(browser, 1)
                 links = await self._async_google_search(keyword, page)
                 if debug:
                     pprint(links)
@@ -399,23 +430,98 @@ class HunterCmd:
         """
         return sp.check_call(f'{self._pandoc_cmd} {self._pandoc_opt} "{in_html}" -o "{out_md}"', shell=True)
 
-    def convert_html_to_md(self, *html_files: str, out_dir: str):
+    def _convert_html(self, in_html, out_md, soup=None):
+        """
+        Convert html to markdown with the selected converter
+
+        :param soup: BeautifulSoup
+            The parsed in_html, the python converter will use it instead of reading the file
+        """
+        if self._converter == 'pandoc':
+            return self.pandoc_convert(in_html, out_md)
+        if soup is None:
+            with open(in_html, 'r', encoding='utf-8') as f:
+                soup = f.read()
+        md = html_to_markdown(soup)
+        with open(out_md, 'w', encoding='utf-8') as f:
+            f.write(md)
+
+    def pandoc_convert_batch(self, in_htmls, out_mds):
         """
-        Convert html files to markdown files with pandoc
+        Convert multiple html files to markdown with a single pandoc process
+
+        The files are parsed individually with --file-scope, and separated by
+        marker files so that the output can be split back into files.
+
+        :param in_htmls: list of str
+            The input html files
+        :param out_mds: list of str
+            The output markdown files
+        """
+        marker = 'AUTOASSISTSPLIT'
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            args = []
+            for i, in_html in enumerate(in_htmls):
+                marker_file = os.path.join(tmp_dir, f'{i}.html')
+                with open(marker_file, 'w', encoding='utf-8') as f:
+                    f.write(f'<p>{marker}{i}</p>')
+                args.extend([marker_file, in_html])
+            cmd = f'{self._pandoc_cmd} {self._pandoc_opt} --file-scope ' + ' '.join(f'"{arg}"' for arg in args)
+            output = sp.check_output(cmd, shell=True, encoding='utf-8')
+
+        parts = re.split(f'^{marker}(\\d+)$', output, flags=re.M)
+        # parts: [preamble, idx, content, idx, content, ...]
+        contents = {int(idx): content for idx, content in zip(parts[1::2], parts[2::2])}
+        if len(contents) != len(in_htmls):
+            raise ValueError(f'expect {len(in_htmls)} documents from pandoc, got {len(contents)}')
+        for i, out_md in enumerate(out_mds):
+            # --file-scope prefixes the ids of headings with file path, e.g. {#path__to__file.html__title}
+            content = re.sub(r' ?\{#[^\s{}]*__[^\s{}]*\}', '', contents[i])
+            with open(out_md, 'w', encoding='utf-8') as f:
+                f.write(content.strip('\n') + '\n')
+
+    def convert_html_to_md(self, *html_files: str, out_dir: str, workers=0, batch_size=32):
+        """
+        Convert html files to markdown files with the selected converter
+
+        The files are converted in batches by a pool of workers,
+        with pandoc each batch is converted by a single pandoc process.
 
         :param html_files: list of str
             The html files to convert
         :param out_dir: str
+        :param workers: int
+            The number of workers, 0 means the number of cpu cores
+        :param batch_size: int
+            The number of files to convert by a worker at a time
         """
         in_files = expand_globs(html_files)
         os.makedirs(out_dir, exist_ok=True)
-        for in_file in in_files:
-            filename = os.path.basename(in_file)
-            out_file = os.path.join(out_dir, filename + '.md')
-            logger.info(f'converting {in_file} to {out_file}')
-            self.pandoc_convert(in_file, out_file)
+        out_files = [os.path.join(out_dir, os.path.basename(in_file) + '.md') for in_file in in_files]
+        batches = [(in_files[i:i + batch_size], out_files[i:i + batch_size])
+                   for i in range(0, len(in_files), batch_size)]
+        workers = workers or os.cpu_count() or 1
+
+        if self._converter == 'pandoc':
+            # pandoc is run in subprocess, so threads are good enough
+            with ThreadPoolExecutor(workers) as executor:
+                for n in executor.map(lambda batch: self._pandoc_convert_batch_or_each(*batch), batches):
+                    logger.info(f'converted {n} files')
+        else:
+            with ProcessPoolExecutor(workers) as executor:
+                for n in executor.map(_convert_html_batch, batches):
+                    logger.info(f'converted {n} files')
 
-    def clean_html(self, *html_files: str, out_dir = None):
+    def _pandoc_convert_batch_or_each(self, in_files, out_files):
+        try:
+            self.pandoc_convert_batch(in_files, out_files)
+        except Exception:
+            # find out the bad file by converting them one by one
+            logger.exception(f'fail to convert batch of {in_files[0]}, fallback to convert one by one')
+            return _convert_each(self.pandoc_convert, in_files, out_files)
+        return len(in_files)
+
+    def clean_html(self, *html_files: str, out_dir = None, workers=0):
         """
         Clean html files to reduce size
 
@@ -423,20 +529,30 @@ class HunterCmd:
             The html files to clean
         :param out_dir: st
             The output directory, if None, will overwrite the input files
+        :param workers: int
+            The number of processes to clean files in parallel, 0 means the number of cpu cores
         """
         if out_dir is not None:
             os.makedirs(out_dir, exist_ok=True)
         in_files = expand_globs(html_files)
-        for in_file in in_files:
-            filename = os.path.basename(in_file)
-            out_file = os.path.join(out_dir, filename) if out_dir else in_file
-            logger.info(f'cleaning {in_file} to {out_file}')
-            with open(in_file, 'r+', encoding='utf-8') as f:
-                cleaned = clean_html(f)
-                f.seek(0)
-                f.write(cleaned)
+        out_files = [os.path.join(out_dir, os.path.basename(in_file)) if out_dir else in_file
+                     for in_file in in_files]
+        with ProcessPoolExecutor(workers or os.cpu_count()) as executor:
+            for out_file in executor.map(clean_html_file, in_files, out_files, chunksize=16):
+                logger.info(f'cleaned {out_file}')
+
+    def _clean_html(self, html, keep_attrs=False):
+        """
+        Clean html of scraped page
 
-    async def _async_search_faculty(self, faculty: pd.Series, out_dir, page: Page, parse=False):
+        :return: tuple of cleaned html and the soup for the python converter, or None if it is not needed
+        """
+        if self._converter == 'python':
+            soup = clean_soup(html, keep_attrs=keep_attrs)
+            return str(soup), soup
+        return clean_html(html, keep_attrs=keep_attrs), None
+
+    async def _async_search_faculty(self, faculty: pd.Series, out_dir, page: Page, parse=False, prune=False):
         """
         Extract faculty member information from web page
         """
@@ -445,75 +561,65 @@ class HunterCmd:
             return
         key = url_to_key(url, no_ext=True)
         faculty_dir = os.path.join(out_dir, key)
-        os.makedirs(faculty_dir, exist_ok=True)
 
         # dump index.json
         index_file = os.path.join(faculty_dir, 'index.json')
-        with open(index_file, 'w', encoding='utf-8') as f:
-            f.write(faculty.to_json())
+        self._write_index(index_file, faculty.to_json())
 
         # scrape faculty page
         faculty_html_file = os.path.join(faculty_dir, 'faculty.html')
         faculty_md_file = faculty_html_file + '.md'
         faculty_jsonl_file = faculty_md_file + '.jsonl'
 
-        if not os.path.exists(faculty_html_file):
+        soup = None
+        if not self._is_done(faculty_html_file):
             html = await self._async_scrape_url(url, page)
-            html = clean_html(html, keep_attrs=True)
+            html, soup = self._clean_html(html, keep_attrs=True)
             with open(faculty_html_file, 'w', encoding='utf-8') as f:
                 f.write(html)
-
-        if not os.path.exists(faculty_md_file):
-            self.pandoc_convert(faculty_html_file, faculty_md_file)
+            self._record(faculty_html_file)
 
         # parse faculty page
-        if not parse or os.path.exists(faculty_jsonl_file):
-            return
+        parse_job = None
+        if parse:
+            parse_job = functools.partial(self._async_parse_faculty, faculty_md_file, faculty_jsonl_file,
+                                          url=url, prune=prune)
+        await self._async_submit(faculty_html_file, faculty_md_file, parse_job, faculty_jsonl_file, soup=soup, url=url)
 
-        with open(faculty_md_file, 'r', encoding='utf-8') as f:
-            faculty_md_content = f.read()
+    async def _async_parse_faculty(self, faculty_md_file, faculty_jsonl_file, url, prune=False):
+        faculty_md_content = self._read_markdown(faculty_md_file, url, prune=prune)
 
-        answer = ''
         try:
-            res = self._get_open_ai_response(
-                client=self._get_open_ai_client(),
-                prompt=prompt.RETRIVE_FACULTY_MEMBERS,
-                text='\n'.join([
-                    'Markdown: """',
-                    faculty_md_content,
-                    '"""',
-                ])
-            )
-            answer = res.choices[0].message.content
-            data = next(get_md_code_block(answer, '```json')).strip()
-            obj = jsonl_loads(data)
+            obj = await self._async_extract_jsonl(prompt.RETRIVE_FACULTY_MEMBERS, faculty_md_content, faculty_md_file)
+            if not obj:
+                # the empty result is saved too, so that the page is not sent to LLM again on rerun
+                logger.warning(f'no data found for {faculty_md_file}')
             with open(faculty_jsonl_file, 'w', encoding='utf-8') as f:
                 jsonl_dump(f, obj)
+            self._record(faculty_jsonl_file, upstream=faculty_md_file)
         except Exception as e:
             logger.exception(f'fail to parse json data: {faculty_md_file}')
-            logger.info(f'answer: {answer}')
 
     async def _async_search_cv(self, profile: pd.Series, out_dir, page: Page,
-                               max_search=3, profile_url=None, parse=False):
+                               max_search=3, profile_url=None, parse=False, prune=False):
         name = profile['name']
         institute = profile['institute']
         key = formal_filename(f'{name}-{institute}')
 
         cv_dir = os.path.join(out_dir, key)
-        os.makedirs(cv_dir, exist_ok=True)
         # dump index.json
 
         index_file = os.path.join(cv_dir, 'index.json')
-        with open(index_file, 'w', encoding='utf-8') as f:
-            f.write(profile.to_json())
+        self._write_index(index_file, profile.to_json())
 
         # run google search
         gs_result_file = os.path.join(cv_dir, 'google-search.json')
         search_keyword = f'professor {name} {institute} (CV or resume or homepage or profile)'
 
-        if not os.path.exists(gs_result_file):
+        if not self._is_done(gs_result_file):
             gs_results = await self._async_google_search(search_keyword, page)
             json_dump_file(gs_results, gs_result_file)
+            self._record(gs_result_file)
         else:
             gs_results = json_load_file(gs_result_file)
 
@@ -531,65 +637,69 @@ class HunterCmd:
             cv_md_file = cv_html_file + '.md'
             cv_json_file = cv_md_file + '.json'
 
-            if not os.path.exists(cv_html_file):
+            soup = None
+            if not self._is_done(cv_html_file):
                 cv_html = await self._async_scrape_url(url, page)
-                cv_html = clean_html(cv_html)
+                cv_html, soup = self._clean_html(cv_html)
                 with open(cv_html_file, 'w', encoding='utf-8') as f:
                     f.write(cv_html)
-
-            if not os.path.exists(cv_md_file):
-                self.pandoc_convert(cv_html_file, cv_md_file)
+                self._record(cv_html_file)
 
             # parse cv
-            if not parse or os.path.exists(cv_json_file):
-                continue
-
-            with open(cv_md_file, 'r', encoding='utf-8') as f:
-                cv_md_content = f.read()
-            answer = ''
-            try:
-                res = self._get_open_ai_response(
-                    client=self._get_open_ai_client(),
-                    prompt=prompt.RETRIEVE_SCHOLAR_OBJECT,
-                    text='\n'.join([
-                        'Markdown: """',
-                        cv_md_content,
-                        '"""',
-                    ])
-                )
-                answer = res.choices[0].message.content
-                data = next(get_md_code_block(answer, '```json')).strip()
-                obj = json.loads(data)
-                json_dump_file(obj, cv_json_file)
-            except Exception as e:
-                logger.exception(f'fail to parse json data: {cv_md_file}')
-                logger.info(f'answer: {answer}')
-                continue
+            parse_job = None
+            if parse:
+                parse_job = functools.partial(self._async_parse_cv, cv_md_file, cv_json_file,
+                                              url=url, prune=prune)
+            await self._async_submit(cv_html_file, cv_md_file, parse_job, cv_json_file, soup=soup, url=url)
+
+    async def _async_parse_cv(self, cv_md_file, cv_json_file, url, prune=False):
+        cv_md_content = self._read_markdown(cv_md_file, url, prune=prune)
+        answer = ''
+        try:
+            res = await self._async_get_open_ai_response(
+                prompt=prompt.RETRIEVE_SCHOLAR_OBJECT,
+                text='\n'.join([
+                    'Markdown: """',
+                    cv_md_content,
+                    '"""',
+                ])
+            )
+            answer = res.choices[0].message.content
+            data = next(get_md_code_block(answer, '```json')).strip()
+            obj = json.loads(data)
+            json_dump_file(obj, cv_json_file)
+            self._record(cv_json_file, upstream=cv_md_file)
+        except Exception as e:
+            logger.exception(f'fail to parse json data: {cv_md_file}')
+            logger.info(f'answer: {answer}')
 
     async def _async_search_student(self, profile: pd.Series, out_dir, page: Page,
-                                    max_search=3, profile_url=None, parse=False):
+                                    max_search=3, profile_url=None, parse=False, prune=False, prefilter=False):
         name = profile['name']
         institute = profile['institute']
         key = formal_filename(f'{name}-{institute}')
 
         student_dir = os.path.join(out_dir, key)
-        os.makedirs(student_dir, exist_ok=True)
         # dump index.json
         index_file = os.path.join(student_dir, 'index.json')
-        with open(index_file, 'w', encoding='utf-8') as f:
-            f.write(profile.to_json())
+        self._write_index(index_file, profile.to_json())
         # run google search
         gs_result_file = os.path.join(student_dir, f'google-search.json')
         search_keyword = f'{name} from {institute}'
 
-        if not os.path.exists(gs_result_file):
+        if not self._is_done(gs_result_file):
             gs_results = await self._async_google_search(search_keyword, page)
             json_dump_file(gs_results, gs_result_file)
+            self._record(gs_result_file)
         else:
             gs_results = json_load_file(gs_result_file)
 
         # retrive data from web page
-        urls = [r['url'] for r in gs_results if valid_student_url(r['url'])][:max_search]
+        gs_urls = [r for r in gs_results if valid_student_url(r['url'])][:max_search]
+        if prefilter:
+            gs_urls = self._prefilter_results(gs_urls, functools.partial(match_name_result, name=name),
+                                              student_dir, 'cv-')
+        urls = [r['url'] for r in gs_urls]
         if profile_url:
             urls.append(profile_url)
 
@@ -601,197 +711,468 @@ class HunterCmd:
             cv_md_file = cv_html_file + '.md'
             cv_json_file = cv_md_file + '.json'
 
-            if not os.path.exists(cv_html_file):
+            soup = None
+            if not self._is_done(cv_html_file):
                 cv_html = await self._async_scrape_url(url, page)
-                cv_html = clean_html(cv_html)
+                cv_html, soup = self._clean_html(cv_html)
                 with open(cv_html_file, 'w', encoding='utf-8') as f:
                     f.write(cv_html)
-
-            if not os.path.exists(cv_md_file):
-                self.pandoc_convert(cv_html_file, cv_md_file)
+                self._record(cv_html_file)
 
             # parse cv
-            if not parse or os.path.exists(cv_json_file):
-                continue
-
-            with open(cv_md_file, 'r', encoding='utf-8') as f:
-                cv_md_content = f.read()
-            answer = ''
-            try:
-                res = self._get_open_ai_response(
-                    client=self._get_open_ai_client(),
-                    prompt=prompt.RETRIEVE_STUDENT_OBJECT,
-                    text='\n'.join([
-                        f'The below is the markdown file related to {name} from {institute}',
-                        'Markdown: """',
-                        cv_md_content,
-                        '"""',
-                    ])
-                )
-                answer = res.choices[0].message.content
-                data = next(get_md_code_block(answer, '```json')).strip()
-                obj = json.loads(data)
-                obj['src'] = url
-                obj.update(gs_linkedin)
-                json_dump_file(obj, cv_json_file)
-            except Exception as e:
-                logger.exception(f'fail to parse json data: {cv_md_file}')
-                logger.info(f'answer: {answer}')
-                json_dump_file({'src': url, 'answer': answer, 'error': str(e) }, cv_json_file)
-                continue
+            parse_job = None
+            if parse:
+                parse_job = functools.partial(self._async_parse_student, cv_md_file, cv_json_file,
+                                              name=name, institute=institute, url=url, extra=gs_linkedin,
+                                              prune=prune)
+            await self._async_submit(cv_html_file, cv_md_file, parse_job, cv_json_file, soup=soup, url=url)
+
+    async def _async_parse_student(self, cv_md_file, cv_json_file, name, institute, url, extra, prune=False):
+        cv_md_content = self._read_markdown(cv_md_file, url, prune=prune)
+        answer = ''
+        try:
+            res = await self._async_get_open_ai_response(
+                prompt=prompt.RETRIEVE_STUDENT_OBJECT,
+                text='\n'.join([
+                    f'The below is the markdown file related to {name} from {institute}',
+                    'Markdown: """',
+                    cv_md_content,
+                    '"""',
+                ])
+            )
+            answer = res.choices[0].message.content
+            data = next(get_md_code_block(answer, '```json')).strip()
+            obj = json.loads(data)
+            obj['src'] = url
+            obj.update(extra)
+            json_dump_file(obj, cv_json_file)
+        except Exception as e:
+            logger.exception(f'fail to parse json data: {cv_md_file}')
+            logger.info(f'answer: {answer}')
+            json_dump_file({'src': url, 'answer': answer, 'error': str(e) }, cv_json_file)
+        self._record(cv_json_file, upstream=cv_md_file)
 
     async def _async_search_group(self, group: pd.Series, out_dir, page: Page,
-                                  max_search=3, parse=False):
+                                  max_search=3, parse=False, prune=False, prefilter=False):
         advisor = group['advisor']
         institute = group['institute']
         key = formal_filename(f'{advisor}-{institute}')
 
         group_dir = os.path.join(out_dir, key)
-        os.makedirs(group_dir, exist_ok=True)
 
         # dump index.json
         index_file = os.path.join(group_dir, 'index.json')
-        with open(index_file, 'w', encoding='utf-8') as f:
-            f.write(group.to_json())
+        self._write_index(index_file, group.to_json())
 
         # google search
         gs_search_file = os.path.join(group_dir, 'google-search.json')
         search_keywords = f'(research group of {advisor}) AND (members or people) AND (graduate or phd or postdoctoral) {institute}'
-        if not os.path.exists(gs_search_file):
+        if not self._is_done(gs_search_file):
             gs_results = await self._async_google_search(search_keywords, page)
             json_dump_file(gs_results, gs_search_file)
+            self._record(gs_search_file)
         else:
             gs_results = json_load_file(gs_search_file)
 
         # sort the results by if member in the title or snippet
         gs_results = sorted(gs_results, reverse=True, key=score_group_search)
-        urls = [r['url'] for r in gs_results if valid_group_url(r['url'])][:max_search]
+        gs_urls = [r for r in gs_results if valid_group_url(r['url'])][:max_search]
+        if prefilter:
+            # a page listing the members is fetched once even if it's found by many advisors
+            gs_urls = self._prefilter_results(gs_urls, lambda r: score_group_search(r) >= 0,
+                                              group_dir, 'group-', self._prefilter_urls)
+        urls = [r['url'] for r in gs_urls]
         for url in urls:
             filename = url_to_key(url)
             group_html_file = os.path.join(group_dir, f'group-{filename}')
             group_md_file = group_html_file + '.md'
             group_jsonl_file = group_md_file + '.jsonl'
 
-            if not os.path.exists(group_html_file):
+            soup = None
+            if not self._is_done(group_html_file):
                 group_html = await self._async_scrape_url(url, page)
-                group_html = clean_html(group_html)
+                group_html, soup = self._clean_html(group_html)
                 with open(group_html_file, 'w', encoding='utf-8') as f:
                     f.write(group_html)
-
-            if not os.path.exists(group_md_file):
-                self.pandoc_convert(group_html_file, group_md_file)
+                self._record(group_html_file)
 
             # parse group members
-            if not parse or os.path.exists(group_jsonl_file):
+            parse_job = None
+            if parse:
+                parse_job = functools.partial(self._async_parse_group, group_md_file, group_jsonl_file,
+                                              url=url, prune=prune)
+            await self._async_submit(group_html_file, group_md_file, parse_job, group_jsonl_file, soup=soup, url=url)
+
+    async def _async_parse_group(self, group_md_file, group_jsonl_file, url, prune=False):
+        group_md_content = self._read_markdown(group_md_file, url, prune=prune)
+
+        try:
+            members = await self._async_extract_jsonl(prompt.RETRIEVE_GROUP_MEMBERS, group_md_content, group_md_file)
+            if not members:
+                # the empty result is saved too, so that the page is not sent to LLM again on rerun
+                logger.warning(f'no data found for {group_md_file}')
+            with open(group_jsonl_file, 'w', encoding='utf-8') as f:
+                jsonl_dump(f, members)
+            self._record(group_jsonl_file, upstream=group_md_file)
+        except Exception as e:
+            logger.exception(f'fail to parse json data: {group_md_file}')
+
+    def _read_markdown(self, md_file, url, prune=False):
+        """
+        Read markdown file to send to LLM, prune the boilerplate if required
+        """
+        with open(md_file, 'r', encoding='utf-8') as f:
+            md_content = f.read()
+        if not prune:
+            return md_content
+        pruned = self._boilerplate.prune(md_content, host=urlparse(url).netloc, page=self._boilerplate_page(md_file))
+        before, after = estimate_tokens(md_content), estimate_tokens(pruned)
+        logger.info(f'pruned {md_file}: {before} -> {after} tokens, saved {before - after}')
+        return pruned
+
+    def _boilerplate_page(self, md_file):
+        # the pages are saved relative to the output directory
+        if self._boilerplate_dir:
+            return os.path.relpath(md_file, self._boilerplate_dir)
+        return md_file
+
+    def _count_boilerplate(self, out_dir=None):
+        """
+        Count the blocks of the pages to parse and the pages counted in the previous runs,
+        so that the boilerplate of a page is pruned the same no matter the order the pages are parsed.
+        The counts are saved to boilerplate.json of out_dir.
+        """
+        boilerplate_file = os.path.join(out_dir, 'boilerplate.json') if out_dir else None
+        if boilerplate_file and os.path.exists(boilerplate_file):
+            self._boilerplate.load(boilerplate_file)
+        for md_file, url, _ in self._deferred_parse:
+            try:
+                with open(md_file, 'r', encoding='utf-8') as f:
+                    md_content = f.read()
+            except FileNotFoundError:
+                # it will be converted again by the parse job
                 continue
+            self._boilerplate.add(md_content, host=urlparse(url).netloc, page=self._boilerplate_page(md_file))
+        if boilerplate_file:
+            self._boilerplate.save(boilerplate_file)
+
+    async def _async_extract_jsonl(self, system_prompt, md_content, md_file):
+        """
+        Extract jsonl records from markdown with LLM
 
-            with open(group_md_file, 'r', encoding='utf-8') as f:
-                group_md_content = f.read()
+        Markdown larger than chunk_tokens is split into chunks that are
+        extracted concurrently, and then the records are merged by name.
+        """
+        chunks = [md_content]
+        if self._chunk_tokens > 0:
+            chunks = split_markdown(md_content, self._chunk_tokens) or chunks
+        if len(chunks) > 1:
+            logger.info(f'split {md_file} into {len(chunks)} chunks')
 
+        async def _extract(chunk):
             answer = ''
             try:
-                res = self._get_open_ai_response(
-                    client=self._get_open_ai_client(),
-                    prompt=prompt.RETRIEVE_GROUP_MEMBERS,
+                res = await self._async_get_open_ai_response(
+                    prompt=system_prompt,
                     text='\n'.join([
                         'Markdown: """',
-                        group_md_content,
+                        chunk,
                         '"""',
                     ]),
                 )
                 answer = res.choices[0].message.content
                 data = next(get_md_code_block(answer, '```json')).strip()
-                if not data:
-                    logger.warning(f'no data found for {group_md_file}')
-                    continue
                 # check if the data is valid jsonl
-                members = jsonl_loads(data)
-                with open(group_jsonl_file, 'w', encoding='utf-8') as f:
-                    jsonl_dump(f, members)
-            except Exception as e:
-                logger.exception(f'fail to parse json data: {group_md_file}')
+                return jsonl_loads(data) if data else []
+            except Exception:
                 logger.info(f'answer: {answer}')
-                continue
+                raise
 
-    async def _async_google_search(self, keyword: str, page: Page):
-        await page.goto('https://www.google.com/ncr')
-        # add some random delay and mouse move to avoid bot detection
-        random_xy_seq = [(random.uniform(100, 500), random.uniform(100, 500))
-                         for _ in range(random.randint(3, 5))]
-        for x, y in random_xy_seq:
-            await page.mouse.move(x, y)
-            await asyncio.sleep(random.uniform(0.1, 0.2))
-        await page.click('textarea[name="q"]')
-        await page.type('textarea[name="q"]', keyword, delay=random.randint(50, 100))
-        await page.press('textarea[name="q"]', 'Enter')
-        await page.wait_for_selector('div#search div.g[jscontroller][jsaction]')
-        random_xy_seq = [(random.uniform(100, 500), random.uniform(100, 500))
-                         for _ in range(random.randint(1, 2))]
-        for x, y in random_xy_seq:
-            await page.mouse.move(x, y)
-            await asyncio.sleep(random.uniform(0.1, 0.2))
-
-        result = await page.evaluate(
-            '''() => Array.from(document.querySelectorAll('div#search div.g[jscontroller][jsaction]')).map(e => ({
-            title: e.querySelector('h3')?.innerText,
-            url: e.querySelector('a')?.href,
-            snippet: e.querySelector('span')?.innerText
-        }))''')
-        return result
+        results = await asyncio.gather(*[_extract(chunk) for chunk in chunks])
+        records = [record for result in results for record in result]
+        if len(chunks) > 1:
+            records = merge_records(records)
+        return records
 
-    def _requests_get(self, url):
-        user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36 Edg/130.0.0.0 '
-        if self._proxy:
-            proxies = {
-                'http': self._proxy,
-                'https': self._proxy,
-            }
+    async def _async_submit(self, html_file, md_file, parse_job=None, parse_file=None, soup=None, url=None):
+        """
+        Submit html file to the convert stage, the markdown file will be
+        passed to the parse stage once it is ready.
+        If boilerplate is pruned, the parse job is deferred until all pages are converted.
+
+        :param parse_job: coroutine function
+            The job to parse the markdown file, None to skip parsing
+        :param parse_file: str
+            The output file of parse job, the job is skipped if it is up to date with the markdown file
+        :param soup: BeautifulSoup
+            The parsed html_file, if provided, it will be converted directly
+        :param url: str
+            The url of the page, to count the boilerplate by host
+        """
+        pipeline = self._pipeline
+        assert pipeline is not None, 'pipeline is not running'
+
+        async def _convert():
+            if not self._is_done(md_file, upstream=html_file):
+                await run_in_thread(self._convert_html, html_file, md_file, soup=soup)
+                self._record(md_file, upstream=html_file)
+            if parse_job is not None and not self._is_done(parse_file, upstream=md_file):
+                if self._deferred_parse is not None:
+                    self._deferred_parse.append((md_file, url, _parse))
+                else:
+                    await pipeline.put('parse', _parse)
+
+        async def _parse():
+            try:
+                await parse_job()
+            except FileNotFoundError:
+                # the markdown is deleted while the job is queued, or before the run
+                if os.path.exists(md_file) or not os.path.exists(html_file):
+                    raise
+                logger.warning(f'{md_file} is deleted, convert it again')
+                await run_in_thread(self._convert_html, html_file, md_file)
+                self._record(md_file, upstream=html_file)
+                await parse_job()
+
+        await pipeline.put('convert', _convert)
+
+    def _reset_prefilter(self):
+        self._prefilter_stats = Counter()
+        self._prefilter_urls = set()
+
+    def _prefilter_results(self, results, keep, out_dir, prefix, seen=None):
+        """
+        Drop the google results to fetch that fail keep or whose url is in seen,
+        the dropped pages that are not fetched yet are counted as avoided
+
+        :param results: list of google results to fetch
+        :param keep: function that takes a google result
+        :param out_dir: str, the directory to save the pages
+        :param prefix: str, the prefix of page files
+        :param seen: set of urls taken by other rows, it will be updated
+        """
+        kept = []
+        for result in results:
+            url = result['url']
+            if keep(result) and (seen is None or url not in seen):
+                kept.append(result)
+                if seen is not None:
+                    seen.add(url)
+            elif not self._is_done(os.path.join(out_dir, prefix + url_to_key(url))):
+                self._prefilter_stats['urls'] += 1
+        return kept
+
+    def _report_prefilter(self, out_dir, max_search, parse, skipped: Optional[pd.DataFrame] = None):
+        """
+        Log and save the work avoided by prefilter to prefilter.json of out_dir
+
+        A skipped row would have run a google search and fetched up to max_search pages,
+        and each fetched page would take at least one LLM call to parse.
+        """
+        skipped_rows = 0 if skipped is None else len(skipped)
+        skipped_urls = self._prefilter_stats['urls']
+        max_fetches = skipped_urls + skipped_rows * max_search
+        report = {
+            'skipped_rows': skipped_rows,
+            'skipped_urls': skipped_urls,
+            'avoided_searches': skipped_rows,
+            'avoided_fetches_max': max_fetches,
+            'avoided_llm_calls_max': max_fetches if parse else 0,
+            'reasons': {} if skipped is None else skipped['reason'].value_counts().to_dict(),
+            'skipped': [] if skipped is None else skipped.to_dict('records'),
+        }
+        logger.info(f'prefilter skipped {skipped_rows} rows and {skipped_urls} pages, '
+                    f'avoided {skipped_rows} google searches, up to {max_fetches} page fetches '
+                    f'and {report["avoided_llm_calls_max"]} LLM calls')
+        os.makedirs(out_dir, exist_ok=True)
+        json_dump_file(report, os.path.join(out_dir, 'prefilter.json'))
+
+    def _is_done(self, path, upstream=None):
+        """
+        Check if the artifact is built and up to date with its upstream
+        """
+        if self._manifest is None:
+            return os.path.exists(path)
+        return self._manifest.done(path, upstream=upstream)
+
+    def _record(self, path, upstream=None):
+        if self._manifest is not None:
+            self._manifest.record(path, upstream=upstream)
+
+    def _write_index(self, index_file, text):
+        """
+        Write index.json of a row, it is only written if the content is changed
+        """
+        # the directory must exist if index.json is in manifest
+        if self._manifest is None or self._manifest.verify or self._manifest.get_hash(index_file) is None:
+            os.makedirs(os.path.dirname(index_file), exist_ok=True)
+        if self._manifest is not None:
+            self._manifest.write_text(index_file, text)
         else:
-            proxies = None
-        return requests.get(url, proxies=proxies, headers={'User-Agent': user_agent})
+            with open(index_file, 'w', encoding='utf-8') as f:
+                f.write(text)
+
+    async def _async_run_pool(self, browser, jobs, concurrency=1, out_dir=None, prune=False):
+        """
+        Run jobs with a pool of pages
+
+        :param browser: BrowserContext
+            The browser context to open pages in
+        :param jobs: list of coroutine functions
+            Each job will be called with a page, e.g. job(page)
+        :param concurrency: int
+            The number of pages to run jobs in parallel
+        :param out_dir: str
+            The output directory of jobs to keep manifest
+        :param prune: bool
+            Whether the parse jobs prune boilerplate, they are deferred until all pages are converted
+        """
+        # throttle and llm client should be created in the running loop
+        self._throttle = DomainThrottle(self._domain_concurrency, self._domain_interval)
+        self._llm = self._get_llm_gateway()
+        self._page_stats = PageLoadStats()
+        self._boilerplate = BoilerplateFilter()
+        self._boilerplate_dir = out_dir
+        self._deferred_parse = [] if prune else None
+        if self._fetcher_mode == 'hybrid':
+            self._fetcher = HybridFetcher(self._throttle, proxy=self._proxy, strategy_file=self._fetch_strategy or None)
+        if self._use_manifest and out_dir:
+            self._manifest = Manifest(out_dir, verify=self._verify_manifest)
+        try:
+            await track_dom_mutations(browser)
+            pages = await self._async_open_pages(browser, max(1, concurrency))
+            queue = asyncio.Queue()
+            for job in jobs:
+                queue.put_nowait(job)
+
+            async def _worker(page: Page):
+                while not queue.empty():
+                    job = queue.get_nowait()
+                    await job(page)
+
+            # convert and parse in background stages so that pages never wait for them
+            stages = {'convert': self._convert_workers, 'parse': self._parse_workers}
+            async with StagePipeline(stages, maxsize=self._queue_size) as pipeline:
+                self._pipeline = pipeline
+                try:
+                    await asyncio.gather(*[_worker(page) for page in pages])
+                    if self._deferred_parse is not None:
+                        await pipeline.join('convert')
+                        await run_in_thread(self._count_boilerplate, out_dir)
+                        for _, _, parse_job in self._deferred_parse:
+                            await pipeline.put('parse', parse_job)
+                finally:
+                    self._pipeline = None
+                    self._deferred_parse = None
+        finally:
+            # release the clients and save the stats of the jobs done even if a job fails
+            await self._llm.close()
+            if self._fetcher is not None:
+                await self._fetcher.close()
+                self._fetcher = None
+            if self._manifest is not None:
+                self._manifest.close()
+                self._manifest = None
+            self._report_page_stats(out_dir)
+            if self._blocker is not None and out_dir:
+                self._blocker.save(os.path.join(out_dir, 'resource-stats.json'))
+
+    def _get_blocker(self):
+        """
+        Create the blocker of a new browser context, its counters are saved after each run
+        """
+        self._blocker = ResourceBlocker(self._block)
+        return self._blocker
+
+    def _report_page_stats(self, out_dir=None):
+        """
+        Log the slowest domains and save the timing of all domains to page-stats.json of out_dir
+        """
+        summary = self._page_stats.summary()
+        if not summary:
+            return
+        slowest = sorted(summary.items(), reverse=True,
+                         key=lambda item: item[1]['challenge'] + item[1]['ready'])
+        for domain, timing in slowest[:10]:
+            logger.info(f'page load of {domain}: {timing}')
+        if out_dir:
+            json_dump_file(summary, os.path.join(out_dir, 'page-stats.json'))
+
+    async def _async_open_pages(self, browser, n: int):
+        pages = list(browser.pages[:n])
+        while len(pages) < n:
+            pages.append(await browser.new_page())
+        return pages
+
+    async def _async_google_search(self, keyword: str, page: Page):
+        google_url = 'https://www.google.com/ncr'
+        # google is shared by all workers, so it must be throttled as a whole
+        async with self._throttle(google_url):
+            await page.goto(google_url)
+            # add some random delay and mouse move to avoid bot detection
+            random_xy_seq = [(random.uniform(100, 500), random.uniform(100, 500))
+                             for _ in range(random.randint(3, 5))]
+            for x, y in random_xy_seq:
+                await page.mouse.move(x, y)
+                await asyncio.sleep(random.uniform(0.1, 0.2))
+            await page.click('textarea[name="q"]')
+            await page.type('textarea[name="q"]', keyword, delay=random.randint(50, 100))
+            await page.press('textarea[name="q"]', 'Enter')
+            await page.wait_for_selector('div#search div.g[jscontroller][jsaction]')
+            random_xy_seq = [(random.uniform(100, 500), random.uniform(100, 500))
+                             for _ in range(random.randint(1, 2))]
+            for x, y in random_xy_seq:
+                await page.mouse.move(x, y)
+                await asyncio.sleep(random.uniform(0.1, 0.2))
+
+            result = await page.evaluate(
+                '''() => Array.from(document.querySelectorAll('div#search div.g[jscontroller][jsaction]')).map(e => ({
+                title: e.querySelector('h3')?.innerText,
+                url: e.querySelector('a')?.href,
+                snippet: e.querySelector('span')?.innerText
+            }))''')
+        return result
 
     async def _async_scrape_url(self, url, page: Page, delay=0.5):
+        if self._fetcher is not None:
+            return await self._fetcher.fetch(url, functools.partial(self._async_browse_url, page=page, delay=delay))
+        return await self._async_browse_url(url, page, delay)
+
+    async def _async_browse_url(self, url, page: Page, delay=0.5):
+        """
+        Load a page in browser and wait until it's ready
+
+        :param delay: float
+            The seconds without DOM mutation to take the page as stable
+        """
         try:
-            await page.goto(url, timeout=60e3)
-            await page.wait_for_load_state('domcontentloaded')
+            async with self._throttle(url):
+                await page.goto(url, timeout=60e3)
+                await page.wait_for_load_state('domcontentloaded')
         except TimeoutError as e:
             logger.exception(f'wait {url} tiemout')
 
-        if delay > 0:
-            await asyncio.sleep(delay)
-        if 'linkedin' in url:
-            await asyncio.sleep(5)  # wait for linkedin to load
-        # if there is cloudflare protection, try to solve it
-        # detect cloudflare protection
-        title = await page.title()
-        if 'just a moment' in title.lower():
-            await asyncio.sleep(10)
+        # linkedin keeps loading for a while
+        max_wait = 8 if 'linkedin' in url else 5
+        await wait_page_ready(page, quiet=delay, max_wait=max_wait, stats=self._page_stats)
         content = await page.content()
         return content
 
-    def _get_open_ai_client(self):
-        base_url = config.get('openai_base_url')
-        api_key = config.get('openai_api_key')
-        client = OpenAI(base_url=base_url, api_key=api_key)
-        return client
-
-    def _get_open_ai_response(self, client: OpenAI, prompt, text):
-        messages = [
-            {'role': 'system', 'content': prompt},
-            {'role': 'user', 'content': text},
-        ]
-        elapsed = int(time.time()) - self._last_request_ts
-        if elapsed < self._wait_interval:
-            time.sleep(self._wait_interval - elapsed)
-
-        self._last_request_ts = int(time.time())
-        res = client.chat.completions.create(
-            model='deepseek-chat',
-            messages=messages,  # type: ignore
-            stream=False,
-            max_tokens=4096 * 2,
-            timeout=1800,
+    def _get_llm_gateway(self):
+        return LlmGateway(
+            base_url=config.get('openai_base_url'),
+            api_key=config.get('openai_api_key'),
+            model=self._openai_model,
+            max_in_flight=self._openai_max_in_flight,
+            rpm=self._openai_rpm,
+            tpm=self._openai_tpm,
+            cache=LlmCache(self._openai_cache, self._openai_cache_size * 2 ** 20) if self._openai_cache else None,
         )
+
+    async def _async_get_open_ai_response(self, prompt, text):
+        if self._llm is None:
+            self._llm = self._get_llm_gateway()
+        res = await self._llm.chat(prompt, text)
         with open(self._openai_log, 'a', encoding='utf-8') as f:
             json.dump(res.model_dump(), f)
         return res
@@ -802,6 +1183,264 @@ class HunterCmd:
             return pd.read_excel(f, sheet_name=sheet_name)  # type: ignore
 
 
+def _convert_html_batch(batch):
+    return _convert_each(_convert_html_file, *batch)
+
+
+def _convert_html_file(in_file, out_file):
+    with open(in_file, 'r', encoding='utf-8') as f:
+        md = html_to_markdown(f.read())
+    with open(out_file, 'w', encoding='utf-8') as f:
+        f.write(md)
+
+
+def _convert_each(convert, in_files, out_files):
+    """
+    Convert files one by one, a bad file is logged and skipped
+
+    :return: the number of converted files
+    """
+    n = 0
+    for in_file, out_file in zip(in_files, out_files):
+        try:
+            convert(in_file, out_file)
+            n += 1
+        except Exception:
+            logger.exception(f'fail to convert {in_file}')
+    return n
+
+
+def _process_faculty_dir(faculty_dir):
+    """
+    Read the faculty members of chinese names from a faculty directory
+    """
+    candidates = []
+    index_json_file = os.path.join(faculty_dir, 'index.json')
+    index = json_load_file(index_json_file)
+    faculty_json_file = os.path.join(faculty_dir, 'faculty.html.md.jsonl')
+    with open(faculty_json_file, 'r', encoding='utf-8') as f:
+        faculties = list(jsonl_load(f))
+    base_url = index.get('FacultyPage', '')
+    base_url = base_url.split('?', maxsplit=1)[0]  # remove query string
+    assert isinstance(base_url, str), f'invalid base url: {base_url}'
+    for faculty in faculties:
+        faculty['src'] = index['FacultyPage']
+        faculty['institute'] = index.get('Institute', '')
+        faculty['department'] = index.get('Department', '')
+        profile_url = faculty.get('profile_url', '')
+        if profile_url and not profile_url.startswith('http'):
+            _base_url = base_url
+            if profile_url.startswith('/'):
+                _base_url = base_url[:8] + base_url[8:].split('/', maxsplit=1)[0]
+            faculty['profile_url'] = _base_url + profile_url
+        title = faculty.get('title', '').lower()
+        if not title:
+            logger.warning(f'title is empty for {faculty["name"]} in {faculty_json_file}')
+
+        if is_chinese_name(faculty['name']):
+            candidates.append(faculty)
+    return candidates
+
+
+def _process_cv_dir(cv_dir):
+    """
+    Read the groups of experiences from the cv files of a directory
+    """
+    groups = []
+    cv_files, = scan_dir(cv_dir, 'cv-*.json')
+    for cv_file in cv_files:
+        cv = json_load_file(cv_file)
+        member = cv.get('name', '')
+        if not member:
+            continue
+        email = cv.get('email', '')
+        for exp in cv.get('experiences', []):
+            advisor = exp.get('advisor', '')
+            if not advisor:
+                continue
+            group = {
+                'member': member,
+                'email': email,
+                'title': exp.get('title', ''),
+                'institute': exp.get('institute', ''),
+                'group': exp.get('group', ''),
+                'advisor': advisor,
+            }
+            groups.append(group)
+    return groups
+
+
+def _process_group_dir(group_dir):
+    """
+    Read the group and its members from a group directory
+
+    :return: the group and a list of (name, candidate) of members,
+        candidate is None if the member is not a chinese graduate
+    """
+    index_json_file = os.path.join(group_dir, 'index.json')
+    group = json_load_file(index_json_file)
+    google_search_file = os.path.join(group_dir, 'google-search.json')
+    google_results = json_load_file(google_search_file)
+    urls = [r['url'] for r in google_results if valid_group_url(r['url'])][:3]
+
+    group_row = {
+        'institute': group.get('institute', ''),
+        'group': group.get('group', ''),
+        'advisor': group.get('advisor', ''),
+        'urls': '\r\n'.join(urls),
+    }
+
+    members = []
+    group_files, = scan_dir(group_dir, 'group-*.jsonl')
+    for group_file in group_files:
+        with open(group_file, 'r', encoding='utf-8') as f:
+            group_members = list(jsonl_load(f))
+
+        for member in group_members:
+            try:
+                name = member.get('name', '')
+                members.append((name, _get_group_candidate(member, group)))
+            except Exception as e:
+                logger.exception(f'fail to process {group_file}')
+                logger.info(f'member: {member}')
+    return group_row, members
+
+
+def _get_group_candidate(member, group):
+    name = member.get('name', '')
+    # is chinese name is decided by LLM, double check is required
+    is_chinese = member.get('is_chinese', False)
+    if not is_chinese:
+        # double check if the name is chinese
+        is_chinese = is_chinese_name(name)
+    if not is_chinese:
+        return None
+    title = member.get('title', '')
+    # filter out non-graduate students, if title is empty also keep it
+    if title and not is_graduate(title):
+        return None
+    return {
+        'name': name,
+        'title': title,
+        'email': member.get('email', ''),
+        'advisor': group.get('advisor', ''),
+        'group': group.get('group', ''),
+        'institute': group.get('institute', ''),
+        'description': member.get('description', ''),
+    }
+
+
+def prefilter_students(students: pd.DataFrame):
+    """
+    Pick the likely candidates from students before searching them
+
+    A student is skipped if the name is empty, the name and institute are duplicated,
+    the title is given but not graduate, or the name is not chinese.
+
+    :param students: data frame of students with columns of name, title and institute
+    :return: the kept students, and the skipped ones with name, title, institute and reason
+    """
+    def _column(name):
+        if name not in students:
+            return pd.Series('', index=students.index, dtype=object)
+        return students[name].fillna('').astype(str).str.strip()
+
+    names, titles, institutes = _column('name'), _column('title'), _column('institute')
+    reasons = pd.Series('', index=students.index, dtype=object)
+    reasons[names == ''] = 'no_name'
+    keys = names.str.lower() + '\t' + institutes.str.lower()
+    reasons[(reasons == '') & keys.duplicated()] = 'duplicated'
+    reasons[(reasons == '') & (titles != '') & ~graduate_title_mask(titles)] = 'not_graduate'
+    # the names are checked at last as it's the most expensive
+    unsure = reasons == ''
+    reasons[unsure & ~chinese_name_mask(names[unsure]).reindex(students.index, fill_value=True)] = 'not_chinese'
+
+    kept = reasons == ''
+    skipped = pd.DataFrame({'name': names, 'title': titles, 'institute': institutes, 'reason': reasons})[~kept]
+    return students[kept], skipped
+
+
+def match_name_result(result, name: str):
+    """
+    Check if a google result mentions all words of the name in its title, snippet or url,
+    the words can be in any order and joined, e.g. "Wei Zhang" matches "Zhang-Wei" and "zhangwei"
+    """
+    words = re.findall(r'[^\W\d_]+', name.lower())
+    text = ' '.join(result.get(key) or '' for key in ('title', 'snippet', 'url'))
+    text = re.sub(r'[\W\d_]+', '', text.lower())
+    return all(word in text for word in words)
+
+
+def _process_student_dir(student_dir):
+    """
+    Merge the cv json files of a student directory, None if it's not a graduate
+    """
+    try:
+        index_json_file = os.path.join(student_dir, 'index.json')
+        index = json_load_file(index_json_file)
+    except:
+        return None
+    # search the json file of students
+    student_json_files, = scan_dir(student_dir, 'cv-*.md.json')
+    if not student_json_files:
+        return None
+
+    student_json_files = sorted(student_json_files, key=lambda f: os.path.getsize(f), reverse=True)
+    student_jsons = [json_load_file(f) for f in student_json_files]
+
+    student = student_jsons[0]
+    if not is_graduate(student.get('title') or ''):
+        return None
+
+    experiences = []
+    publications = []
+    for s in student_jsons:
+        if len(s.get('experiences', [])) > len(experiences):
+            experiences = s.get('experiences', [])
+        if len(s.get('publications', [])) > len(publications):
+            publications = s.get('publications', [])
+    # score: for each is_famous publication or experience  add 10, otherwise add 1
+    score = 0
+    for exp in experiences:
+        if exp.get('is_famous'):
+            score += 10
+        else:
+            score += 1
+    for pub in publications:
+        if pub.get('is_famous'):
+            score += 10
+        else:
+            score += 1
+    student['score'] = score
+    student['experiences'] = experiences
+    student['publications'] = publications
+    student['id'] = str(uuid.uuid4())
+    student['institute'] = index.get('institute', '')
+    email = student.get('email', index.get('email'))
+    if email:
+        student['email'] = email
+    return student
+
+
+def map_dirs(fn, dirs, workers=0):
+    """
+    Apply fn to each directory with a process pool, the results are yielded in order
+
+    :param fn: function
+        A module level function that takes a directory
+    :param workers: int
+        The number of processes, 0 means the number of cpu cores, 1 to run in current process
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(dirs) < 2:
+        yield from map(fn, dirs)
+        return
+    with ProcessPoolExecutor(workers) as executor:
+        # a chunk of directories per task to reduce the cost of ipc
+        chunksize = max(1, min(64, len(dirs) // (workers * 4)))
+        yield from executor.map(fn, dirs, chunksize=chunksize)
+
+
 def is_graduate(title: str):
     title = title.lower()
     for keyword in ['phd', 'doctor', 'ph.d', 'post']:
@@ -812,6 +1451,19 @@ def is_graduate(title: str):
     return False
 
 
+_GRADUATE_PATTERN = re.compile(r'phd|doctor|ph\.d|post', re.IGNORECASE)
+
+
+def graduate_title_mask(titles: pd.Series):
+    """
+    Vectorized is_graduate over a pandas series of titles
+    """
+    titles = titles.fillna('').astype(str)
+    graduate = titles.str.contains('graduate', case=False, regex=False) & \
+        ~titles.str.contains('under', case=False, regex=False)
+    return titles.str.contains(_GRADUATE_PATTERN, regex=True) | graduate
+
+
 def valid_cv_url(url):
     if '.pdf' in url:
         return False
@@ -0,0 +1,170 @@
+from urllib.parse import urlparse
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Optional, Tuple, Type
+
+import importlib.util
+import json
+import os
+import re
+
+from .browser import DomainThrottle
+from .lib import get_logger
+
+logger = get_logger(__name__)
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) ' \
+    'Chrome/130.0.0.0 Safari/537.36 Edg/130.0.0.0'
+
+# the hosts that require the cookies of the browser
+BROWSER_ONLY_HOSTS = ('linkedin.com',)
+
+_CHALLENGE_PATTERN = re.compile(r'<title>\s*(just a moment|attention required)|_cf_chl_opt', re.IGNORECASE)
+_INVISIBLE_PATTERN = re.compile(r'<(script|style|noscript|template)\b.*?</\1\s*>|<!--.*?-->', re.IGNORECASE | re.DOTALL)
+_TAG_PATTERN = re.compile(r'<[^>]*>')
+
+
+def check_http_page(status_code: int, headers, html: str, min_text=200):
+    """
+    Check if a page fetched without browser is usable
+
+    :param headers: the response headers, a mapping of lower case names
+    :param min_text: int, the min number of visible characters, a page with less text
+        is taken as rendered by javascript
+    :return: the reason to fall back to browser, empty if the page is usable
+    """
+    if headers.get('cf-mitigated') == 'challenge' or _CHALLENGE_PATTERN.search(html):
+        return 'challenge'
+    if status_code >= 400:
+        return f'status {status_code}'
+    content_type = headers.get('content-type', '')
+    if content_type and 'html' not in content_type:
+        return f'content type {content_type}'
+    text = _TAG_PATTERN.sub(' ', _INVISIBLE_PATTERN.sub(' ', html))
+    if len(''.join(text.split())) < min_text:
+        return 'no text'
+    return ''
+
+
+class HybridFetcher:
+    """
+    Fetch pages with a pooled http client and fall back to the browser when it's required
+
+    The http client keeps connections alive, and uses HTTP/2 if h2 is installed.
+    The connections to the same domain are limited by the throttle as the browser is.
+    A page falls back to the browser if it's an error, an anti-bot challenge,
+    not html or has little text without javascript.
+    The hosts that keep failing with http are fetched with the browser directly,
+    the counts of each host are saved to strategy_file so that the next run starts from them.
+
+    :param throttle: DomainThrottle
+        The throttle of page loads shared with the browser
+    :param proxy: str
+        The proxy of http client
+    :param strategy_file: str
+        The json file to save the counts of each host, None to disable
+    :param timeout: float
+        The timeout in seconds of http requests
+    :param max_connections: int
+        The max connections of the pool
+    :param min_text: int
+        The min number of visible characters of a usable page
+    """
+
+    def __init__(self,
+                 throttle: DomainThrottle,
+                 proxy: Optional[str] = None,
+                 strategy_file: Optional[str] = None,
+                 timeout=30,
+                 max_connections=32,
+                 min_text=200):
+        self._throttle = throttle
+        self._proxy = proxy
+        self._strategy_file = strategy_file
+        self._timeout = timeout
+        self._max_connections = max_connections
+        self._min_text = min_text
+        self._client = None
+        # the errors of requests to fall back to browser, the ones of httpx are added with the client
+        self._errors: Tuple[Type[BaseException], ...] = (OSError,)
+        # host -> {'http': n, 'fallback': n}
+        self._hosts: Dict[str, Dict[str, int]] = {}
+        if strategy_file and os.path.exists(strategy_file):
+            with open(strategy_file, encoding='utf-8') as f:
+                self._hosts = json.load(f)
+        self.stats = Counter()
+
+    @property
+    def client(self):
+        # created lazily so that it is bound to the running loop
+        if self._client is None:
+            import httpx
+            opts = dict(
+                headers={'User-Agent': USER_AGENT},
+                timeout=self._timeout,
+                limits=httpx.Limits(max_connections=self._max_connections,
+                                    max_keepalive_connections=self._max_connections),
+                follow_redirects=True,
+                # the same as the browser which ignores https errors
+                verify=False,
+                http2=importlib.util.find_spec('h2') is not None,
+            )
+            try:
+                self._client = httpx.AsyncClient(proxy=self._proxy, **opts)
+            except TypeError:  # httpx < 0.26
+                self._client = httpx.AsyncClient(proxies=self._proxy, **opts)
+            self._errors = (httpx.HTTPError, httpx.InvalidURL, OSError)
+        return self._client
+
+    def use_http(self, url: str):
+        """
+        Check if http should be tried first for the url
+        """
+        host = get_host(url)
+        if any(host == h or host.endswith('.' + h) for h in BROWSER_ONLY_HOSTS):
+            return False
+        counts = self._hosts.get(host, {})
+        fallback = counts.get('fallback', 0)
+        return fallback < 2 or fallback <= counts.get('http', 0)
+
+    async def fetch(self, url: str, browser_fetch: Callable[[str], Awaitable[str]]) -> str:
+        """
+        Fetch the html of a page
+
+        :param browser_fetch: coroutine function to fetch the url with the browser
+        """
+        if self.use_http(url):
+            html, reason = await self._http_get(url)
+            counts = self._hosts.setdefault(get_host(url), {})
+            if not reason:
+                counts['http'] = counts.get('http', 0) + 1
+                self.stats['http'] += 1
+                return html
+            logger.info(f'fetch {url} with browser: {reason}')
+            counts['fallback'] = counts.get('fallback', 0) + 1
+            self.stats['fallback'] += 1
+        self.stats['browser'] += 1
+        return await browser_fetch(url)
+
+    async def _http_get(self, url: str):
+        # it raises if httpx is not installed instead of falling back to browser silently
+        client = self.client
+        try:
+            async with self._throttle(url):
+                res = await client.get(url)
+            html = res.text
+        except self._errors as e:
+            return None, f'{type(e).__name__} {e}'
+        return html, check_http_page(res.status_code, res.headers, html, self._min_text)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._strategy_file:
+            with open(self._strategy_file, 'w', encoding='utf-8') as f:
+                json.dump(self._hosts, f, indent=2)
+        logger.info('fetcher stats: %s', dict(self.stats))
+
+
+def get_host(url: str):
+    return urlparse(url).netloc.split(':')[0].lower()
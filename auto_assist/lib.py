@@ -1,8 +1,19 @@
 from urllib.parse import urlparse
-from typing import Iterable, List
-from bs4 import BeautifulSoup
-
+from typing import Iterable, List, Dict
+from collections import Counter
+from bs4 import BeautifulSoup, NavigableString, Tag
+from bs4.element import PreformattedString
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+import functools
+import hashlib
 import logging
+import fnmatch
 import glob
 import json
 import os
@@ -22,6 +33,9 @@ def get_logger(name=None):
     return logging.getLogger(name)
 
 
+logger = get_logger(__name__)
+
+
 def pending():
     input('Press any key to exit ...')
 
@@ -30,11 +44,86 @@ def contain_chinese(text):
     return re.search('[\u4e00-\u9fa5]', text) is not None
 
 
-def is_chinese_name(name):
-    for token in name.split():
-        if is_pinyin(token):
+# split a token of name into words, the apostrophe is kept as it separates syllables, e.g. Xi'an
+_NAME_SEPARATOR_PATTERN = re.compile("[^\\w'\u2019]+|[\\d_]+")
+# max_syllables -> token -> kind of token, see _get_pinyin_kind
+_PINYIN_KINDS: Dict[int, Dict[str, int]] = {}
+
+
+def is_chinese_name(name, max_syllables=2):
+    """
+    Check if a name is chinese, e.g. "Wei Zhang", "Xiaoming Li" or "Zhang-Wei"
+
+    A name with a word of single pinyin syllable is chinese. Joined syllables like "Xiaoming"
+    are common in western names too, e.g. "Mike" or "Tina", so a name without a single syllable word
+    is only chinese if all its words are pinyin.
+
+    :param name: str
+    :param max_syllables: int, max syllables of a joined word, chinese given names have at most 2
+    """
+    tokens = name.lower().split()
+    for token in tokens:
+        if token in pinyin:
+            return True
+    kinds = _PINYIN_KINDS.get(max_syllables)
+    if kinds is None:
+        kinds = _PINYIN_KINDS.setdefault(max_syllables, {})
+    all_pinyin = None
+    # the tokens repeat a lot among names, so the kind of each token is cached
+    for token in tokens:
+        kind = kinds.get(token)
+        if kind is None:
+            kind = _get_pinyin_kind(token, max_syllables)
+            if len(kinds) < 2 ** 20:
+                kinds[token] = kind
+        if kind == 1:
             return True
-    return False
+        if kind >= 0:
+            all_pinyin = kind == 2 and all_pinyin is not False
+    return bool(all_pinyin)
+
+
+def _get_pinyin_kind(token: str, max_syllables: int):
+    """
+    :return: 1 if a word of token is a single syllable, 2 if all words are joined syllables,
+        0 if it's not pinyin, -1 if it has no word
+    """
+    words = [word for word in _NAME_SEPARATOR_PATTERN.split(token) if word]
+    if not words:
+        return -1
+    if any(word in pinyin for word in words):
+        return 1
+    pattern = _pinyin_word_pattern(max_syllables)
+    return 2 if all(pattern.fullmatch(word) for word in words) else 0
+
+
+@functools.lru_cache(maxsize=None)
+def _pinyin_word_pattern(max_syllables: int):
+    # the syllable table compiled as a trie so matching a word doesn't try every syllable,
+    # as in the pinyin orthography, a syllable starting with a, o or e can only follow
+    # another one after an apostrophe, e.g. "Xi'an" is 2 syllables while "Xian" is 1
+    syllable = _trie_pattern(pinyin)
+    joined_syllable = _trie_pattern(s for s in pinyin if s[0] not in 'aoe')
+    return re.compile(f"{syllable}(?:['\u2019]{syllable}|{joined_syllable}){{0,{max_syllables - 1}}}")
+
+
+def _trie_pattern(words):
+    trie = {}
+    for word in words:
+        node = trie
+        for c in word:
+            node = node.setdefault(c, {})
+        node[''] = {}
+
+    def _build(node):
+        alts = [re.escape(c) + _build(child) for c, child in sorted(node.items()) if c]
+        if not alts:
+            return ''
+        pattern = alts[0] if len(alts) == 1 and len(alts[0]) == 1 else '(?:' + '|'.join(alts) + ')'
+        # the longer syllable is tried first as the quantifier is greedy
+        return pattern + '?' if '' in node else pattern
+
+    return _build(trie)
 
 
 def is_pinyin(word: str):
@@ -42,6 +131,211 @@ def is_pinyin(word: str):
     return word.lower() in pinyin
 
 
+def chinese_name_mask(names):
+    """
+    Vectorized is_chinese_name over a pandas series of names
+
+    :param names: pandas series of str, missing values are taken as empty names
+    :return: pandas series of bool
+    """
+    import pandas as pd
+    # names repeat a lot across groups, so each unique name is only checked once
+    codes, uniques = pd.factorize(names.fillna('').astype(str))
+    flags = [is_chinese_name(name) for name in uniques.tolist()]
+    return pd.Series([flags[code] for code in codes.tolist()], index=names.index, dtype=bool)
+
+
+def estimate_tokens(text: str):
+    """
+    Estimate the number of LLM tokens of text without a tokenizer,
+    roughly 4 chars per token for latin text and 1 token per CJK char
+    """
+    cjk = len(re.findall('[\u4e00-\u9fa5]', text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def split_markdown(md_text: str, max_tokens: int) -> List[str]:
+    """
+    Split markdown into chunks within the token budget
+
+    The text is split on the boundaries of headings first, then paragraphs
+    and list blocks, then lines, and the pieces are packed into chunks greedily.
+
+    :param md_text: str
+        The markdown text
+    :param max_tokens: int
+        The max tokens of a chunk, estimated by estimate_tokens
+    """
+    chunks = []
+    buf, buf_tokens = '', 0
+    for piece in _md_split(md_text, max_tokens, 0):
+        tokens = estimate_tokens(piece)
+        if buf and buf_tokens + tokens > max_tokens:
+            chunks.append(buf)
+            buf, buf_tokens = '', 0
+        buf += piece
+        buf_tokens += tokens
+    if buf.strip():
+        chunks.append(buf)
+    return chunks
+
+
+# split before headings, after blank lines, after lines
+_MD_SPLIT_PATTERNS = [r'(?m)^(?=#{1,6} )', r'(?<=\n\n)(?=[^\n])', r'(?<=\n)']
+
+
+def _md_split(text: str, max_tokens: int, level: int):
+    if estimate_tokens(text) <= max_tokens:
+        yield text
+    elif level < len(_MD_SPLIT_PATTERNS):
+        for part in re.split(_MD_SPLIT_PATTERNS[level], text):
+            yield from _md_split(part, max_tokens, level + 1)
+    else:
+        # a single line is too long, just cut it
+        size = max_tokens * 2
+        for i in range(0, len(text), size):
+            yield text[i:i + size]
+
+
+_MD_LINK_PATTERN = re.compile(r'\[([^\]]*)\]\([^)]*\)')
+_BOILERPLATE_PATTERN = re.compile(
+    r'cookie|privacy|copyright|\(c\)|©|all rights reserved|skip to (main )?content|terms of (use|service)'
+    r'|accessibility|sitemap|follow us|subscribe|back to top', re.I)
+
+
+class BoilerplateFilter:
+    """
+    Prune boilerplate blocks from markdown to save LLM tokens
+
+    A block is a paragraph or list separated by blank lines, a block is pruned if it is
+    * in the leading or trailing blocks that repeat on other pages of the same host, e.g. header and footer
+    * a block of links before the first heading, e.g. navigation menu
+    * a short block of boilerplate keywords before the first or after the last heading, e.g. cookie banner
+
+    If the page has no heading, the last two rules only apply to blocks that are also on another page of the host,
+    as a list of members is often a block of links too.
+
+    The repeated blocks are counted among the pages that are added, so all pages should be added
+    before any of them is pruned, then a page is always pruned the same no matter the order.
+
+    :param min_repeat: int
+        The number of other pages of the same host a block must appear in to be pruned
+    """
+
+    def __init__(self, min_repeat=2):
+        self._min_repeat = min_repeat
+        # host -> page -> block hashes of the page
+        self._pages: Dict[str, Dict[str, List[str]]] = {}
+        # host -> block hash -> number of pages that contain the block
+        self._counts: Dict[str, Counter] = {}
+
+    def add(self, md_text: str, host: str, page: str):
+        """
+        Count the blocks of a page, the blocks of the page added before are replaced
+
+        :param md_text: str
+            The markdown text of the page
+        :param host: str
+            The host of the page, repeated blocks are counted among pages of the same host
+        :param page: str
+            The identity of the page, e.g. url or file path
+        """
+        self._add_digests(host, page, list(dict.fromkeys(_md_block_digest(b) for b in _md_blocks(md_text))))
+
+    def _add_digests(self, host: str, page: str, digests: List[str]):
+        pages = self._pages.setdefault(host, {})
+        counts = self._counts.setdefault(host, Counter())
+        counts.subtract(pages.get(page, []))
+        counts.update(digests)
+        pages[page] = digests
+
+    def prune(self, md_text: str, host: str, page: str):
+        """
+        :param md_text: str
+            The markdown text to prune, it's added if the page is not added before
+        :param host: str
+            The host of the page
+        :param page: str
+            The identity of the page
+        """
+        if page not in self._pages.get(host, {}):
+            self.add(md_text, host, page)
+        counts = self._counts[host]
+        blocks = _md_blocks(md_text)
+
+        repeated = []
+        shared = []
+        for block in blocks:
+            # the page itself is one of the pages that contain the block
+            others = counts[_md_block_digest(block)] - 1
+            repeated.append(others >= self._min_repeat)
+            shared.append(others > 0)
+
+        headings = [i for i, block in enumerate(blocks) if block.startswith('#')]
+        if headings:
+            first_heading, last_heading = headings[0], headings[-1]
+            chrome = [True] * len(blocks)
+        else:
+            # there is no heading to tell the content from the menu
+            first_heading, last_heading = len(blocks), -1
+            chrome = shared
+
+        # the template of the site is at the head and tail
+        start, end = 0, len(blocks)
+        while start < end and repeated[start]:
+            start += 1
+        while end > start and repeated[end - 1]:
+            end -= 1
+
+        kept = []
+        for i in range(start, end):
+            block = blocks[i]
+            if chrome[i]:
+                if i < first_heading and _md_link_density(block) > 0.8:
+                    continue
+                if (i < first_heading or i > last_heading) and len(block) < 200 and _BOILERPLATE_PATTERN.search(block):
+                    continue
+            kept.append(block)
+        return '\n\n'.join(kept) + '\n' if kept else ''
+
+    def load(self, path: str):
+        """
+        Load the blocks of pages saved by save
+        """
+        with open(path, 'r', encoding='utf-8') as fp:
+            data = json.load(fp)
+        for host, pages in data.items():
+            for page, digests in pages.items():
+                self._add_digests(host, page, digests)
+
+    def save(self, path: str):
+        """
+        Save the blocks of pages, so that the pages of the later runs are counted with them
+        """
+        with open(path, 'w', encoding='utf-8') as fp:
+            json.dump(self._pages, fp)
+
+
+def _md_blocks(md_text: str):
+    return [b.strip() for b in re.split(r'\n\s*\n', md_text) if b.strip()]
+
+
+def _md_block_digest(block: str):
+    return hashlib.md5(' '.join(block.split()).encode('utf-8')).hexdigest()
+
+
+def _md_link_density(text: str):
+    """
+    The ratio of link text in all text of a markdown block
+    """
+    link_text = ''.join(m.group(1) for m in _MD_LINK_PATTERN.finditer(text))
+    plain_text = _MD_LINK_PATTERN.sub(lambda m: m.group(1), text)
+    words = re.sub(r'[\W_]+', '', plain_text)
+    if not words:
+        return 0
+    return len(re.sub(r'[\W_]+', '', link_text)) / len(words)
+
+
 def url_to_key(url: str, include_query=False, no_ext=False):
     """
     Convert url to a valid filename
@@ -65,19 +359,71 @@ def expand_globs(patterns: Iterable[str], raise_invalid=False) -> List[str]:
 
     :param patterns: list of paths or glob patterns
     :param raise_invalid: if True, will raise error if no file found for a glob pattern
-    :return: list of expanded paths
+    :return: list of expanded paths, duplicated paths are removed and the order is kept
     """
-    paths = []
+    paths: Dict[str, None] = {}
+    n_dup = 0
     for pattern in patterns:
-        result = glob.glob(pattern, recursive=True) if '*' in pattern else [pattern]
-        if raise_invalid and len(result) == 0:
-            raise FileNotFoundError(f'No file found for {pattern}')
+        # a literal path may contain magic characters too, e.g. `group[1]`
+        result = _iglob(pattern) if glob.has_magic(pattern) and not os.path.exists(pattern) else [pattern]
+        n = 0
         for p in result:
-            if p not in paths:
-                paths.append(p)
+            n += 1
+            if p in paths:
+                n_dup += 1
             else:
-                print(f'path {p} already exists in the list')
-    return paths
+                paths[p] = None
+        if raise_invalid and n == 0:
+            raise FileNotFoundError(f'No file found for {pattern}')
+    if n_dup:
+        logger.info(f'{n_dup} duplicated paths are ignored')
+    return list(paths)
+
+
+def _iglob(pattern: str):
+    """
+    glob with a single scandir if only the last part of pattern has magic
+    """
+    dirname, basename = os.path.split(pattern)
+    if not basename or glob.has_magic(dirname) or '**' in basename:
+        return glob.iglob(pattern, recursive=True)
+    matches = scan_dir(dirname or os.curdir, basename)[0]
+    if not dirname:
+        return [os.path.basename(p) for p in matches]
+    return matches
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_pattern(pattern: str):
+    # file names are case insensitive on windows
+    flags = re.IGNORECASE if os.path.normcase('A') == 'a' else 0
+    return re.compile(fnmatch.translate(pattern), flags).match
+
+
+def scan_dir(dirname: str, *patterns: str) -> List[List[str]]:
+    """
+    Match files in a directory with many patterns in one scan
+
+    Like glob, hidden files only match the patterns start with dot.
+
+    :param dirname: the directory to scan
+    :param patterns: glob patterns of file names, e.g. `cv-*.md.json`
+    :return: a list of matched paths for each pattern
+    """
+    matchers = [_compile_pattern(p) for p in patterns]
+    hidden = [p.startswith('.') for p in patterns]
+    result: List[List[str]] = [[] for _ in patterns]
+    try:
+        it = os.scandir(dirname)
+    except (FileNotFoundError, NotADirectoryError):
+        return result
+    with it:
+        for entry in it:
+            name = entry.name
+            for i, match in enumerate(matchers):
+                if (hidden[i] or name[0] != '.') and match(name):
+                    result[i].append(os.path.join(dirname, name))
+    return result
 
 
 def get_md_code_block(md_text: str, start: str, end: str='```'):
@@ -129,6 +475,44 @@ def json_dump_file(data, path, encoding='utf-8', ensure_ascii=False):
         json.dump(data, f, ensure_ascii=ensure_ascii, indent=2)
 
 
+def json_dump_file_iter(items, path, encoding='utf-8', ensure_ascii=False):
+    """
+    Dump items to file as json array in the same format of json_dump_file,
+    but the items are written one by one so that they don't have to be in memory
+    """
+    with open(path, 'w', encoding=encoding) as f:
+        f.write('[')
+        empty = True
+        for item in items:
+            f.write('\n  ' if empty else ',\n  ')
+            # newlines in strings are escaped, so it's safe to indent by replacing
+            f.write(json.dumps(item, ensure_ascii=ensure_ascii, indent=2).replace('\n', '\n  '))
+            empty = False
+        f.write(']' if empty else '\n]')
+
+
+def merge_records(records: Iterable[dict], key='name'):
+    """
+    Merge records with the same key (case insensitive), the first non-empty value of each field wins
+
+    :param records: list of dict
+    :param key: str
+        The field to identify a record, records without it are dropped
+    """
+    merged = {}
+    for record in records:
+        k = ' '.join(str(record.get(key) or '').lower().split())
+        if not k:
+            continue
+        if k not in merged:
+            merged[k] = dict(record)
+            continue
+        for field, value in record.items():
+            if value not in (None, '', [], {}) and merged[k].get(field) in (None, '', [], {}):
+                merged[k][field] = value
+    return list(merged.values())
+
+
 def dict_ignore_none(d):
     return {k: v for k, v in d.items() if v is not None}
 
@@ -139,16 +523,194 @@ def ensure_dir(path):
         os.makedirs(d, exist_ok=True)
 
 
+CLEAN_HTML_TAGS = ['script', 'style', 'noscript', 'svg', 'img', 'iframe', 'code']
+
+
+_XML_DECLARATION_PATTERN = re.compile(r'^\s*<\?xml[^>]*\?>')
+
+
 def clean_html(markup, keep_attrs=False):
+    """
+    Remove scripts, styles, images, etc and the attributes of tags from html,
+    lxml is used if installed as it is much faster than BeautifulSoup
+
+    :param markup: str or file object
+    :param keep_attrs: bool
+        Keep the attributes of meta tags
+    """
+    if lxml is None:
+        return str(clean_soup(markup, keep_attrs=keep_attrs))
+    if hasattr(markup, 'read'):
+        markup = markup.read()
+    if not markup.strip():
+        return ''
+    if isinstance(markup, str):
+        # lxml doesn't accept str with an encoding declaration, e.g. xhtml of old sites
+        markup = _XML_DECLARATION_PATTERN.sub('', markup, count=1)
+    try:
+        doc = lxml.html.document_fromstring(markup)
+    except (ValueError, etree.ParserError):
+        # e.g. the document has only comments
+        return str(clean_soup(markup, keep_attrs=keep_attrs))
+    etree.strip_elements(doc, *CLEAN_HTML_TAGS, with_tail=False)
+    for el in doc.iter(etree.Element):
+        if not keep_attrs or el.tag != 'meta':
+            el.attrib.clear()
+    # lxml will make up a doctype if there isn't one
+    doctype = None
+    if markup.lstrip()[:9].lower() == '<!doctype':
+        doctype = doc.getroottree().docinfo.doctype
+    return lxml.html.tostring(doc, encoding='unicode', doctype=doctype)
+
+
+def clean_soup(markup, keep_attrs=False):
     soup = BeautifulSoup(markup, 'html.parser')
     for tag in soup():
         attrs = tag.attrs.copy() if tag.attrs else []
         if not keep_attrs or tag.name not in ['meta']:
             for attr in attrs:
                 del tag[attr]
-        if tag.name in ['script', 'style', 'noscript', 'svg', 'img', 'iframe', 'code']:
+        if tag.name in CLEAN_HTML_TAGS:
             tag.decompose()
-    return str(soup)
+    return soup
+
+
+def clean_html_file(in_file, out_file=None, keep_attrs=False):
+    """
+    Clean html file, overwrite the input file if out_file is None
+    """
+    with open(in_file, 'r', encoding='utf-8') as f:
+        cleaned = clean_html(f, keep_attrs=keep_attrs)
+    with open(out_file or in_file, 'w', encoding='utf-8') as f:
+        f.write(cleaned)
+    return out_file or in_file
+
+
+def html_to_markdown(markup):
+    """
+    Convert html to markdown in process, as a light alternative to pandoc
+
+    :param markup: str or BeautifulSoup
+        The html text or the parsed soup, e.g. the result of clean_soup
+    """
+    soup = markup if isinstance(markup, Tag) else BeautifulSoup(markup, 'html.parser')
+    root = soup.body or soup
+    try:
+        md = _md_render(root)
+    except RecursionError:
+        # malformed page of deeply nested tags, e.g. unclosed font or div
+        logger.warning('html is nested too deeply, convert it to plain text')
+        md = root.get_text('\n')
+    md = _md_normalize(md).replace(_MD_INDENT, ' ')
+    return md + '\n' if md else ''
+
+
+_MD_SKIP_TAGS = {'head', 'title', 'meta', 'link', 'script', 'style', 'noscript', 'template'}
+_MD_HEADING_TAGS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+# placeholder of meaningful indentation so that it survives line stripping
+_MD_INDENT = '\x01'
+
+
+def _md_normalize(text: str):
+    """
+    strip the lines and collapse the blank lines between blocks
+    """
+    lines = [line.strip() for line in text.split('\n')]
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+
+def _md_indent(text: str, first: str, rest: str):
+    lines = text.split('\n')
+    return '\n'.join([first + lines[0]] + [rest + line if line else line for line in lines[1:]])
+
+
+def _md_render(node) -> str:
+    if isinstance(node, NavigableString):
+        if isinstance(node, PreformattedString):  # comment, doctype, cdata, etc
+            return ''
+        return re.sub(r'\s+', ' ', str(node))
+    if node.name in _MD_SKIP_TAGS:
+        return ''
+    if node.name == 'pre':
+        code = re.sub(r'(?m)^[ \t]+', lambda m: _MD_INDENT * len(m.group()), node.get_text().strip('\n'))
+        return '\n\n```\n' + code + '\n```\n\n'
+    if node.name in ('ul', 'ol'):
+        return _md_render_list(node)
+    if node.name == 'table':
+        return _md_render_table(node)
+
+    text = ''.join(_md_render(child) for child in node.children)
+    if node.name in _MD_HEADING_TAGS:
+        text = ' '.join(text.split())
+        return '\n\n' + '#' * _MD_HEADING_TAGS[node.name] + ' ' + text + '\n\n' if text else ''
+    if node.name == 'br':
+        return '\n'
+    if node.name == 'hr':
+        return '\n\n------------------------------------------------------------------------\n\n'
+    if node.name in ('strong', 'b'):
+        return _md_wrap(text, '**')
+    if node.name in ('em', 'i'):
+        return _md_wrap(text, '*')
+    if node.name == 'a':
+        href = node.get('href')
+        return f'[{text.strip()}]({href})' if href and text.strip() else text
+    if node.name == 'blockquote':
+        return '\n\n' + _md_indent(_md_normalize(text), '> ', '> ') + '\n\n'
+    if node.name in ('span', 'small', 'sup', 'sub', 'u', 'font', 'abbr', 'cite', 'label', 'time', 'mark', 'q'):
+        return text
+    # treat the rest as block, e.g. div, p, section, etc
+    return '\n\n' + text + '\n\n'
+
+
+def _md_wrap(text: str, mark: str):
+    stripped = text.strip()
+    if not stripped:
+        return text
+    # keep the spaces around so that words won't be joined
+    lead = ' ' if text[0].isspace() else ''
+    tail = ' ' if text[-1].isspace() else ''
+    return f'{lead}{mark}{stripped}{mark}{tail}'
+
+
+def _md_render_list(node) -> str:
+    items = []
+    for i, li in enumerate(node.find_all('li', recursive=False), 1):
+        text = _md_normalize(''.join(_md_render(child) for child in li.children))
+        bullet = f'{i}.' if node.name == 'ol' else '-'
+        items.append(_md_indent(text, bullet.ljust(4, _MD_INDENT), _MD_INDENT * 4))
+    return '\n\n' + '\n'.join(items) + '\n\n'
+
+
+def _md_render_table(node) -> str:
+    rows = []
+    for tr in _md_table_rows(node):
+        cells = [' '.join(_md_render_cell(td).split()).replace('|', '\\|')
+                 for td in tr.find_all(['td', 'th'], recursive=False)]
+        if cells:
+            rows.append(cells)
+    if not rows:
+        return ''
+    n_col = max(len(row) for row in rows)
+    rows = [row + [''] * (n_col - len(row)) for row in rows]
+    lines = ['| ' + ' | '.join(row) + ' |' for row in rows]
+    lines.insert(1, '|' + '---|' * n_col)
+    return '\n\n' + '\n'.join(lines) + '\n\n'
+
+
+def _md_table_rows(node):
+    # the rows of nested tables are not the rows of this table
+    for child in node.find_all(['thead', 'tbody', 'tfoot', 'tr'], recursive=False):
+        if child.name == 'tr':
+            yield child
+        else:
+            yield from child.find_all('tr', recursive=False)
+
+
+def _md_render_cell(node) -> str:
+    # a table can't be nested in markdown, e.g. the layout table of old sites, so it's flattened to text
+    if node.find('table') is not None:
+        return node.get_text(' ')
+    return _md_render(node)
 
 
 def formal_filename(s):
@@ -156,16 +718,42 @@ def formal_filename(s):
 
 
 def excel_autowidth(df, sheet, max_width=None):
-    def width(s):
-        s = s.strip()
-        if not s:
-            return 0
-        w = max([len(str(x)) for x in s.splitlines()])
+    for idx, col in enumerate(df):
+        series = df[col].astype(str).str.strip()
+        widths = series.str.len()
+        # only multi-line cells have to be split
+        multiline = series.str.contains('\n', regex=False)
+        if multiline.any():
+            widths[multiline] = series[multiline].map(lambda s: max(len(x) for x in s.splitlines()))
+        w = int(widths.max()) if len(widths) else 0
         if max_width is not None:
             w = min(w, max_width)
-        return w
-
-    for idx, col in enumerate(df):
-        series = df[col]
-        max_len = max((series.astype(str).map(width).max(), len(str(series.name)))) + 1
+        max_len = max(w, len(str(col))) + 1
         sheet.set_column(idx, idx, max_len)
+
+
+EXCEL_MAX_ROWS = 1048576
+
+
+def write_excel(sheets, out_excel, max_width=None, text_wrap=False, autowidth=True):
+    """
+    Write data frames to sheets of an excel file
+
+    Rows that exceed the limit of excel are dropped, use table files for large data.
+
+    :param sheets: dict of sheet name to data frame
+    :param max_width: the max width of columns
+    :param text_wrap: whether to wrap text in cells
+    :param autowidth: whether to set the width of columns by content
+    """
+    import pandas as pd
+    with pd.ExcelWriter(out_excel, engine_kwargs={'options': {'strings_to_urls': False}}) as writer:
+        if text_wrap:
+            writer.book.formats[0].set_text_wrap()  # type: ignore
+        for sheet_name, df in sheets.items():
+            if len(df) >= EXCEL_MAX_ROWS:
+                logger.warning(f'{len(df)} rows of sheet {sheet_name} exceed the limit of excel, truncated')
+                df = df.iloc[:EXCEL_MAX_ROWS - 1]
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+            if autowidth:
+                excel_autowidth(df, writer.sheets[sheet_name], max_width=max_width)
@@ -1,2 +1,224 @@
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion
+from typing import Optional
 
+import hashlib
+import sqlite3
+import asyncio
+import json
+import time
 
+from .lib import get_logger, estimate_tokens
+
+logger = get_logger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket that is refilled continuously at `rate` tokens per minute
+
+    :param rate: int
+        The tokens refilled per minute, 0 means unlimited
+    :param capacity: int
+        The max tokens the bucket can hold, default to `rate`
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self._rate = rate / 60.0
+        self._capacity = capacity or rate
+        self._tokens = self._capacity
+        self._ts = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._ts) * self._rate)
+        self._ts = now
+
+    async def acquire(self, n: float = 1):
+        """
+        Wait until there are enough tokens and take them
+        """
+        if self._rate <= 0:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # a request larger than the bucket would wait forever
+        n = min(n, self._capacity)
+        async with self._lock:
+            self._refill()
+            while self._tokens < n:
+                await asyncio.sleep((n - self._tokens) / self._rate)
+                self._refill()
+            self._tokens -= n
+
+    def consume(self, n: float):
+        """
+        Take tokens without waiting, e.g. to correct an estimation after the fact.
+        The bucket may go negative so that the later requests will wait longer.
+        """
+        if self._rate <= 0:
+            return
+        self._refill()
+        self._tokens -= n
+
+
+class LlmCache:
+    """
+    Persistent cache of chat completions in a SQLite file
+
+    The key is the hash of model, system prompt and user text,
+    the least recently used entries are evicted when the total size exceeds `max_size`.
+
+    :param path: str
+        The path of the SQLite file
+    :param max_size: int
+        The max total size of cached responses in bytes, 0 means unlimited
+    """
+
+    def __init__(self, path: str, max_size=0):
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, atime REAL NOT NULL)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS cache_atime ON cache (atime)')
+        self._conn.commit()
+        self._max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_key(model: str, prompt: str, text: str):
+        data = json.dumps([model, prompt, text], ensure_ascii=False)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._conn.execute('SELECT value FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._conn.execute('UPDATE cache SET atime = ? WHERE key = ?', (time.time(), key))
+        self._conn.commit()
+        return row[0]
+
+    def set(self, key: str, value: str):
+        self._conn.execute('INSERT OR REPLACE INTO cache (key, value, size, atime) VALUES (?, ?, ?, ?)',
+                           (key, value, len(value), time.time()))
+        self._evict()
+        self._conn.commit()
+
+    def _evict(self):
+        if self._max_size <= 0:
+            return
+        total, = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM cache').fetchone()
+        if total <= self._max_size:
+            return
+        # evict to 90% of the limit so that it won't be triggered by every insert
+        excess = total - int(self._max_size * 0.9)
+        keys = []
+        for key, size in self._conn.execute('SELECT key, size FROM cache ORDER BY atime'):
+            if excess <= 0:
+                break
+            keys.append((key,))
+            excess -= size
+        self._conn.executemany('DELETE FROM cache WHERE key = ?', keys)
+
+    def stats(self):
+        count, size = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache').fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'count': count, 'size': size}
+
+    def close(self):
+        self._conn.close()
+
+
+class LlmGateway:
+    """
+    Shared entry of chat completion requests
+
+    A single AsyncOpenAI client is reused so that connections are pooled,
+    and requests are limited by max in flight, requests per minute and tokens per minute.
+
+    :param max_in_flight: int
+        The max number of requests waiting for response
+    :param rpm: int
+        The max requests per minute, 0 means unlimited
+    :param tpm: int
+        The max tokens per minute, 0 means unlimited
+    :param cache: LlmCache
+        The cache to lookup before sending requests, None to disable
+    """
+
+    def __init__(self,
+                 base_url=None,
+                 api_key=None,
+                 model='deepseek-chat',
+                 max_tokens=4096 * 2,
+                 timeout=1800,
+                 max_in_flight=8,
+                 rpm=0,
+                 tpm=0,
+                 cache: Optional[LlmCache] = None):
+        self._base_url = base_url
+        self._api_key = api_key
+        self._model = model
+        self._max_tokens = max_tokens
+        self._timeout = timeout
+        self._max_in_flight = max_in_flight
+        self._request_bucket = TokenBucket(rpm)
+        self._token_bucket = TokenBucket(tpm)
+        self._client: Optional[AsyncOpenAI] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._cache = cache
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = AsyncOpenAI(base_url=self._base_url, api_key=self._api_key,
+                                       timeout=self._timeout)
+        return self._client
+
+    async def chat(self, prompt: str, text: str) -> ChatCompletion:
+        """
+        Send the prompt as system message and text as user message
+        """
+        cache_key = ''
+        if self._cache is not None:
+            cache_key = self._cache.get_key(self._model, prompt, text)
+            value = self._cache.get(cache_key)
+            if value is not None:
+                return ChatCompletion.model_validate_json(value)
+
+        messages = [
+            {'role': 'system', 'content': prompt},
+            {'role': 'user', 'content': text},
+        ]
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_in_flight)
+
+        estimated = estimate_tokens(prompt) + estimate_tokens(text)
+        async with self._semaphore:
+            await self._request_bucket.acquire(1)
+            await self._token_bucket.acquire(estimated)
+            res = await self.client.chat.completions.create(
+                model=self._model,
+                messages=messages,  # type: ignore
+                stream=False,
+                max_tokens=self._max_tokens,
+            )
+        if res.usage is not None:
+            self._token_bucket.consume(res.usage.total_tokens - estimated)
+        # truncated answers are not worth to keep
+        if cache_key and res.choices and res.choices[0].finish_reason == 'stop':
+            self._cache.set(cache_key, res.model_dump_json())  # type: ignore
+        return res
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+        self._semaphore = None
+        if self._cache is not None:
+            logger.info('llm cache stats: %s', self._cache.stats())
+            self._cache.close()
+            self._cache = None
@@ -0,0 +1,77 @@
+from typing import Dict, List
+
+import functools
+import asyncio
+
+from .lib import get_logger
+
+logger = get_logger(__name__)
+
+
+async def run_in_thread(fn, *args, **kwargs):
+    """
+    Run blocking function in the default executor so that the event loop is not blocked
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, functools.partial(fn, *args, **kwargs))
+
+
+class StagePipeline:
+    """
+    Stages connected by bounded queues, each stage is served by its own workers.
+
+    A job is a coroutine function without arguments, it can put new jobs to
+    the later stages. Stages must be declared in the order of the data flow,
+    so that they can be drained one by one on exit.
+
+    Example:
+        async with StagePipeline({'convert': 2, 'parse': 4}, maxsize=32) as pipeline:
+            await pipeline.put('convert', job)
+    """
+
+    def __init__(self, workers: Dict[str, int], maxsize=0):
+        self._workers = workers
+        self._maxsize = maxsize
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._tasks: List[asyncio.Future] = []
+
+    async def put(self, stage: str, job):
+        """
+        Put a job to the stage, wait if the queue of the stage is full
+        """
+        await self._queues[stage].put(job)
+
+    async def join(self, stage: str):
+        """
+        Wait until all jobs put to the stage are done
+        """
+        await self._queues[stage].join()
+
+    async def _work(self, stage: str):
+        queue = self._queues[stage]
+        while True:
+            job = await queue.get()
+            try:
+                await job()
+            except Exception:
+                logger.exception(f'fail to run job of stage {stage}')
+            finally:
+                queue.task_done()
+
+    async def __aenter__(self):
+        for stage, n in self._workers.items():
+            self._queues[stage] = asyncio.Queue(self._maxsize)
+            for _ in range(max(1, n)):
+                self._tasks.append(asyncio.ensure_future(self._work(stage)))
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                # the jobs of a stage may feed the later stages
+                for queue in self._queues.values():
+                    await queue.join()
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,524 @@
+from typing import Callable, Iterator, Optional, Dict, Set, List
+
+import pandas as pd
+import threading
+import tempfile
+import hashlib
+import sqlite3
+import json
+import os
+
+from .lib import get_logger, write_excel
+
+logger = get_logger(__name__)
+
+
+class JsonlStore:
+    """
+    Append only jsonl file with a SQLite index of record keys
+
+    The jsonl file is still the source of truth so that it can be consumed by other tools,
+    the index maps the key of each record to its offset in the file,
+    so that looking up a key doesn't require to load the whole file.
+    The index is rebuilt from the file if it is missing or the file is replaced,
+    which is detected by the inode and the hash of the last indexed line,
+    only the tail that is not indexed will be scanned after a crash.
+
+    Records are flushed and the index is committed every `batch_size` records.
+    If the same key is added more than once, the last one wins.
+
+    Example:
+        with JsonlStore('gs_result.jsonl', key=lambda item: item['url']) as store:
+            if url not in store:
+                store.add(item)
+
+    :param path: str
+        The path of the jsonl file, the index is saved to `{path}.idx.sqlite`
+    :param key: callable
+        The function to get the key of a record
+    :param batch_size: int
+        The number of records to add before flush
+    """
+
+    def __init__(self, path: str, key: Callable[[dict], str], batch_size=100):
+        self._path = path
+        self._key = key
+        self._batch_size = batch_size
+        self._n_pending = 0
+        # the offset and content of the last line, to check if the file is replaced on next open
+        self._tail = (0, b'')
+        self._conn = sqlite3.connect(path + '.idx.sqlite')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS records (key TEXT PRIMARY KEY, offset INTEGER NOT NULL)')
+        # the values are of mixed types, e.g. size is int while tail_hash is str,
+        # the column of an old index is INTEGER that turns a hash of digits into number, so it's rebuilt
+        row = self._conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'meta'").fetchone()
+        if row and 'INTEGER' in row[0]:
+            self._conn.execute('DROP TABLE meta')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value NOT NULL)')
+        self._conn.commit()
+        self._sync_index()
+        self._fp = open(path, 'ab')
+        self._reader = open(path, 'rb')
+
+    def _get_meta(self, name: str):
+        row = self._conn.execute('SELECT value FROM meta WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, size: int):
+        tail_offset, tail_line = self._tail
+        meta = {
+            'size': size,
+            'inode': os.stat(self._path).st_ino,
+            'tail_offset': tail_offset,
+            'tail_hash': hashlib.sha1(tail_line).hexdigest(),
+        }
+        self._conn.executemany('INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)', meta.items())
+
+    def _is_index_valid(self, size: int):
+        indexed_size = self._get_meta('size')
+        if not indexed_size:
+            return indexed_size is not None or size == 0
+        if indexed_size > size or self._get_meta('inode') != os.stat(self._path).st_ino:
+            return False
+        # the file may be replaced with a larger one in place
+        tail_offset = self._get_meta('tail_offset')
+        if tail_offset is None:
+            return False
+        with open(self._path, 'rb') as fp:
+            fp.seek(tail_offset)
+            tail_line = fp.read(indexed_size - tail_offset)
+        self._tail = (tail_offset, tail_line)
+        return hashlib.sha1(tail_line).hexdigest() == self._get_meta('tail_hash')
+
+    def _sync_index(self):
+        if not os.path.exists(self._path):
+            open(self._path, 'wb').close()
+        size = os.path.getsize(self._path)
+        if self._is_index_valid(size):
+            offset = self._get_meta('size') or 0
+        else:
+            logger.info('%s is changed, rebuild index', self._path)
+            self._conn.execute('DELETE FROM records')
+            self._tail = (0, b'')
+            offset = 0
+        if offset == size:
+            self._set_meta(size)
+            self._conn.commit()
+            return
+        n = 0
+        with open(self._path, 'rb+') as fp:
+            fp.seek(offset)
+            for line in fp:
+                if not line.endswith(b'\n'):
+                    # drop the incomplete line written by a crashed run
+                    logger.warning('truncate incomplete record at %d of %s', offset, self._path)
+                    fp.truncate(offset)
+                    break
+                if line.strip():
+                    self._conn.execute('INSERT OR REPLACE INTO records (key, offset) VALUES (?, ?)',
+                                       (self._key(json.loads(line)), offset))
+                    n += 1
+                self._tail = (offset, line)
+                offset += len(line)
+        self._set_meta(offset)
+        self._conn.commit()
+        logger.info('index %d records of %s', n, self._path)
+
+    def __contains__(self, key: str):
+        return self._conn.execute('SELECT 1 FROM records WHERE key = ?', (key,)).fetchone() is not None
+
+    def __len__(self):
+        return self._conn.execute('SELECT COUNT(*) FROM records').fetchone()[0]
+
+    def get(self, key: str) -> Optional[dict]:
+        row = self._conn.execute('SELECT offset FROM records WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        # the record may still be in the write buffer
+        self._fp.flush()
+        self._reader.seek(row[0])
+        try:
+            record = json.loads(self._reader.readline())
+        except ValueError:
+            record = None
+        if record is None or self._key(record) != key:
+            # the file is changed by others after it's opened
+            logger.warning('index of %s is out of date, rebuild it', self._path)
+            self._conn.execute("DELETE FROM meta WHERE name = 'size'")
+            self._sync_index()
+            return self.get(key)
+        return record
+
+    def add(self, record: dict):
+        offset = self._fp.tell()
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        self._fp.write(line)
+        self._tail = (offset, line)
+        self._conn.execute('INSERT OR REPLACE INTO records (key, offset) VALUES (?, ?)',
+                           (self._key(record), offset))
+        self._n_pending += 1
+        if self._n_pending >= self._batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Flush records to file and then commit the index,
+        so that the index never points to the data that is not in file
+        """
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+        self._set_meta(self._fp.tell())
+        self._conn.commit()
+        self._n_pending = 0
+
+    def __iter__(self) -> Iterator[dict]:
+        """
+        Iterate the records in the order they are added, including the duplicated ones
+        """
+        self._fp.flush()
+        yield from iter_jsonl(self._path)
+
+    def close(self):
+        self.flush()
+        self._fp.close()
+        self._reader.close()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class Manifest:
+    """
+    Record of the artifacts in an output directory and the upstream they are built from
+
+    Each entry saves the hash of an artifact and the hash of its upstream artifact at the time it is built,
+    so that resuming can be decided without reading and hashing the files,
+    and an artifact is out of date once its upstream is rebuilt with different content.
+    The manifest is an append only jsonl file that is folded on load, the last entry of a path wins.
+
+    Artifacts created before the manifest are adopted on first check if they exist.
+    The manifest is trusted without checking the files, so a file deleted by hand is still taken as done
+    unless verify is enabled.
+
+    :param out_dir: str
+        The directory of the artifacts, the paths are saved relative to it
+    :param name: str
+        The file name of the manifest
+    :param verify: bool
+        Whether to check that the recorded artifacts exist, so that the deleted ones are built again
+    """
+
+    def __init__(self, out_dir: str, name='manifest.jsonl', verify=False):
+        os.makedirs(out_dir, exist_ok=True)
+        self._out_dir = out_dir
+        self.verify = verify
+        self._path = os.path.join(out_dir, name)
+        self._entries: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        n_lines = 0
+        if os.path.exists(self._path):
+            with open(self._path, 'r', encoding='utf-8') as fp:
+                for line in fp:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # the last line may be incomplete if the last run crashed
+                        logger.warning('skip invalid line of %s: %s', self._path, line)
+                        continue
+                    self._entries[entry['path']] = entry
+                    n_lines += 1
+        # compact the log if most of the lines are overridden
+        if n_lines > 2 * len(self._entries) + 1000:
+            tmp_path = self._path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as fp:
+                for entry in self._entries.values():
+                    fp.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            os.replace(tmp_path, self._path)
+        self._fp = open(self._path, 'a', encoding='utf-8')
+
+    def _key(self, path: str):
+        return os.path.relpath(path, self._out_dir)
+
+    def get_hash(self, path: str) -> Optional[str]:
+        entry = self._entries.get(self._key(path))
+        return entry['hash'] if entry else None
+
+    def done(self, path: str, upstream: Optional[str] = None) -> bool:
+        """
+        Check if the artifact is built and up to date with its upstream
+
+        :param path: str
+            The path of the artifact
+        :param upstream: str
+            The path of the artifact it is built from
+        """
+        upstream_hash = self.get_hash(upstream) if upstream else None
+        entry = self._entries.get(self._key(path))
+        if entry is None or self.verify:
+            if not os.path.exists(path):
+                return False
+        if entry is None:
+            # adopt the artifact that is built before the manifest
+            self.record(path, upstream=upstream)
+            return True
+        return entry.get('upstream') == upstream_hash
+
+    def record(self, path: str, upstream: Optional[str] = None):
+        """
+        Record the artifact after it is written to file
+        """
+        with open(path, 'rb') as fp:
+            data = fp.read()
+        self._append(path, hash_bytes(data), upstream)
+
+    def write_text(self, path: str, text: str):
+        """
+        Write text to file only if it is changed, e.g. index.json that is dumped in every run
+        """
+        data = text.encode('utf-8')
+        data_hash = hash_bytes(data)
+        old_hash = self.get_hash(path)
+        if old_hash is not None and self.verify and not os.path.exists(path):
+            old_hash = None
+        if old_hash is None and os.path.exists(path):
+            with open(path, 'rb') as fp:
+                old_hash = hash_bytes(fp.read())
+        if old_hash != data_hash:
+            with open(path, 'wb') as fp:
+                fp.write(data)
+        if self.get_hash(path) != data_hash:
+            self._append(path, data_hash, None)
+
+    def _append(self, path: str, data_hash: str, upstream: Optional[str]):
+        entry = {
+            'path': self._key(path),
+            'hash': data_hash,
+            'upstream': self.get_hash(upstream) if upstream else None,
+        }
+        with self._lock:
+            self._entries[entry['path']] = entry
+            self._fp.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._fp.flush()
+
+    def close(self):
+        self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+TABLE_FORMATS = ('parquet', 'feather', 'csv')
+
+
+class TableWriter:
+    """
+    Write records to a table file of parquet, feather or csv in chunks
+
+    The format is decided by the extension of the file.
+    Records are spooled to a temporary jsonl file while the columns and their types are collected,
+    and then converted to the table chunk by chunk on close,
+    so that the memory is bounded by chunk size and the records don't have to share the same keys.
+    Lists and dicts are saved as json strings.
+    parquet and feather require pyarrow.
+
+    Example:
+        with TableWriter('candidates.parquet') as writer:
+            for record in records:
+                writer.write(record)
+
+    :param path: str
+        The path of the table file
+    :param chunk_size: int
+        The number of rows to convert at a time, it's also the row group size of parquet
+    """
+
+    def __init__(self, path: str, chunk_size=10000):
+        self.path = path
+        self.format = get_table_format(path)
+        self._chunk_size = chunk_size
+        self._types: Dict[str, Set[str]] = {}
+        self._spool = tempfile.TemporaryFile('w+', encoding='utf-8')
+        self.n_rows = 0
+
+    def write(self, record: dict):
+        for key, value in record.items():
+            types = self._types.setdefault(key, set())
+            if value is not None:
+                types.add(type(value).__name__)
+        self._spool.write(json.dumps(record, ensure_ascii=False))
+        self._spool.write('\n')
+        self.n_rows += 1
+
+    def _get_dtypes(self):
+        dtypes = {}
+        for key, types in self._types.items():
+            if types == {'bool'}:
+                dtypes[key] = 'boolean'
+            elif types == {'int'}:
+                dtypes[key] = 'Int64'
+            elif types and types <= {'int', 'float'}:
+                dtypes[key] = 'float64'
+            else:
+                dtypes[key] = 'string'
+        return dtypes
+
+    def _iter_chunks(self, dtypes: Dict[str, str]):
+        self._spool.seek(0)
+        columns = list(dtypes)
+        rows: List[dict] = []
+        for line in self._spool:
+            rows.append(json.loads(line))
+            if len(rows) >= self._chunk_size:
+                yield _to_frame(rows, columns, dtypes)
+                rows = []
+        if rows or self.n_rows == 0:
+            yield _to_frame(rows, columns, dtypes)
+
+    def close(self):
+        dtypes = self._get_dtypes()
+        if self.format == 'csv':
+            for i, df in enumerate(self._iter_chunks(dtypes)):
+                df.to_csv(self.path, mode='a' if i else 'w', header=(i == 0), index=False, encoding='utf-8')
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            arrow_types = {'boolean': pa.bool_(), 'Int64': pa.int64(), 'float64': pa.float64(), 'string': pa.string()}
+            schema = pa.schema([(key, arrow_types[dtype]) for key, dtype in dtypes.items()])
+            if self.format == 'parquet':
+                writer = pq.ParquetWriter(self.path, schema)
+            else:
+                writer = pa.ipc.new_file(self.path, schema)
+            with writer:
+                for df in self._iter_chunks(dtypes):
+                    writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+        self._spool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._spool.close()
+
+
+def _to_frame(rows: List[dict], columns: List[str], dtypes: Dict[str, str]):
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    for key, dtype in dtypes.items():
+        col = df[key]
+        if dtype == 'string':
+            col = col.map(_to_text, na_action='ignore')
+        df[key] = col.astype(dtype)
+    return df
+
+
+def _to_text(value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+class SheetWriter:
+    """
+    Write records of sheets to table files, and build the excel file from the tables on close
+
+    :param sheets: list of str
+        The names of sheets
+    :param out_table: str
+        The table file to save, if there are more than one sheets, each sheet is saved to
+        a file with the sheet name inserted before the extension, e.g. out.candidates.parquet.
+        None to use temporary files for excel only
+    :param out_excel: str
+        The excel file to save, None to skip
+    :param excel_opts: dict
+        The options of write_excel
+    """
+
+    def __init__(self, sheets: List[str], out_table: Optional[str] = None, out_excel: Optional[str] = None,
+                 **excel_opts):
+        assert out_table or out_excel, 'at least one of out_table and out_excel should be provided'
+        self._tmp_dir = None
+        if out_table is None:
+            self._tmp_dir = tempfile.TemporaryDirectory()
+            out_table = os.path.join(self._tmp_dir.name, 'out' + _get_tmp_table_ext())
+        self._out_excel = out_excel
+        self._excel_opts = excel_opts
+        self._writers = {sheet: TableWriter(out_table if len(sheets) == 1 else get_sheet_path(out_table, sheet))
+                         for sheet in sheets}
+
+    def write(self, sheet: str, record: dict):
+        self._writers[sheet].write(record)
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+        if self._out_excel:
+            sheets = {sheet: read_table(writer.path) for sheet, writer in self._writers.items()}
+            write_excel(sheets, self._out_excel, **self._excel_opts)
+        if self._tmp_dir is not None:
+            self._tmp_dir.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._tmp_dir is not None:
+            self._tmp_dir.cleanup()
+
+
+def _get_tmp_table_ext():
+    try:
+        import pyarrow  # noqa: F401
+        return '.parquet'
+    except ImportError:
+        return '.csv'
+
+
+def get_table_format(path: str):
+    fmt = os.path.splitext(path)[1][1:].lower()
+    assert fmt in TABLE_FORMATS, f'unsupported table format {fmt}, should be one of {TABLE_FORMATS}'
+    return fmt
+
+
+def read_table(path: str) -> pd.DataFrame:
+    """
+    Read the table file written by TableWriter
+    """
+    fmt = get_table_format(path)
+    if fmt == 'parquet':
+        return pd.read_parquet(path)
+    if fmt == 'feather':
+        return pd.read_feather(path)
+    return pd.read_csv(path, keep_default_na=False, na_values=[''])
+
+
+def get_sheet_path(path: str, sheet: str):
+    """
+    Get the table path of a sheet, e.g. out.parquet -> out.candidates.parquet
+    """
+    base, ext = os.path.splitext(path)
+    return f'{base}.{sheet}{ext}'
+
+
+def hash_bytes(data: bytes):
+    return hashlib.sha1(data).hexdigest()
+
+
+def iter_jsonl(path: str) -> Iterator[dict]:
+    """
+    Iterate the records of a jsonl file without loading the whole file
+    """
+    with open(path, 'r', encoding='utf-8') as fp:
+        for line in fp:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,128 @@
+from unittest import TestCase
+import asyncio
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from auto_assist.browser import PageLoadStats, ResourceBlocker, wait_page_ready, get_domain
+
+
+class FakePage:
+
+    def __init__(self, url, titles, idle=0.0, quiet=0.0, quiet_elapsed=None):
+        """
+        :param idle: seconds to wait for network idle, None if it times out
+        :param quiet: seconds to wait for DOM quiescence
+        """
+        self.url = url
+        self.titles = list(titles)
+        self.idle = idle
+        self.quiet = quiet
+        self.quiet_elapsed = quiet_elapsed
+        self.cancelled = []
+
+    async def wait_for_load_state(self, state, timeout=None):
+        if self.idle is None:
+            raise PlaywrightTimeoutError('timeout')
+        await self._sleep('idle', self.idle)
+
+    async def title(self):
+        return self.titles.pop(0) if len(self.titles) > 1 else self.titles[0]
+
+    async def evaluate(self, js, args):
+        await self._sleep('quiet', self.quiet)
+        return args[0] if self.quiet_elapsed is None else self.quiet_elapsed
+
+    async def _sleep(self, signal, seconds):
+        try:
+            await asyncio.sleep(seconds)
+        except asyncio.CancelledError:
+            self.cancelled.append(signal)
+            raise
+
+
+class FakeContext:
+
+    def __init__(self):
+        self.routes = []
+        self.events = {}
+
+    async def route(self, url, handler):
+        self.routes.append(url)
+
+    def on(self, event, handler):
+        self.events[event] = handler
+
+
+class TestBrowser(TestCase):
+
+    def test_get_domain(self):
+        self.assertEqual(get_domain('https://www.chem.mit.edu/people'), 'mit.edu')
+        self.assertEqual(get_domain('https://www.chem.pku.edu.cn:8080/'), 'pku.edu.cn')
+
+    def test_wait_page_ready(self):
+        stats = PageLoadStats()
+
+        async def _run():
+            page = FakePage('https://www.a.edu/people', ['Just a moment...', 'People'])
+            timing = await wait_page_ready(page, stats=stats)
+            self.assertGreater(timing['challenge'], 0.4)
+
+            # the network of b.edu is never idle, the page is ready once the DOM is stable
+            page = FakePage('https://b.edu/1', ['People'], idle=None, quiet=0.1)
+            timing = await wait_page_ready(page, stats=stats)
+            self.assertLess(timing['ready'], 1)
+
+            # the DOM of c.edu keeps changing, the page is ready once the network is idle
+            page = FakePage('https://c.edu/1', ['People'], idle=0.1, quiet=10)
+            timing = await wait_page_ready(page, stats=stats)
+            self.assertLess(timing['ready'], 1)
+            self.assertEqual(page.cancelled, ['quiet'])
+
+            # the DOM quiescence times out
+            page = FakePage('https://c.edu/2', ['People'], idle=0.2, quiet_elapsed=5000)
+            await wait_page_ready(page, stats=stats)
+            self.assertEqual(page.cancelled, [])
+
+        asyncio.run(_run())
+        summary = stats.summary()
+        self.assertEqual(summary['a.edu']['pages'], 1)
+        self.assertEqual(summary['a.edu'].get('ready_by_idle', 0) + summary['a.edu'].get('ready_by_quiet', 0), 1)
+        self.assertEqual(summary['b.edu']['idle_timeout'], 1)
+        self.assertEqual(summary['b.edu']['ready_by_quiet'], 1)
+        self.assertEqual(summary['c.edu']['ready_by_idle'], 2)
+        self.assertEqual(summary['c.edu']['quiet_timeout'], 1)
+
+    def test_resource_blocker(self):
+        blocker = ResourceBlocker('default')
+        self.assertEqual(blocker.get_block_reason('image', 'https://a.edu/logo.png'), 'image')
+        self.assertEqual(blocker.get_block_reason('script', 'https://www.googletagmanager.com/gtag.js'), 'host')
+        self.assertEqual(blocker.get_block_reason('xhr', 'https://a.edu/files/data.zip?v=1'), 'extension')
+        self.assertEqual(blocker.get_block_reason('script', 'https://a.edu/app.js'), '')
+        # navigations are never blocked
+        self.assertEqual(blocker.get_block_reason('document', 'https://a.edu/files/data.zip', True), '')
+
+        light = ResourceBlocker('light')
+        self.assertEqual(light.get_block_reason('stylesheet', 'https://a.edu/style.css'), '')
+        self.assertEqual(ResourceBlocker('none').get_block_reason('image', 'https://a.edu/logo.png'), '')
+
+        blocker.record('a.edu', 100)
+        blocker.record('a.edu', 50)
+        blocker.record('b.edu', 10)
+        summary = blocker.summary()
+        self.assertEqual(summary['bytes'], 160)
+        self.assertEqual(list(summary['hosts']), ['a.edu', 'b.edu'])
+        self.assertEqual(summary['hosts']['a.edu'], {'requests': 2, 'bytes': 150})
+
+    def test_resource_blocker_apply(self):
+        async def _apply(profile):
+            context = FakeContext()
+            await ResourceBlocker(profile).apply(context)
+            return context
+
+        context = asyncio.run(_apply('default'))
+        self.assertEqual(context.routes, ['**/*'])
+        self.assertIn('requestfinished', context.events)
+        # nothing to block, the requests are counted by events only
+        context = asyncio.run(_apply('none'))
+        self.assertEqual(context.routes, [])
+        self.assertIn('requestfinished', context.events)
@@ -0,0 +1,105 @@
+from unittest import TestCase, mock
+import asyncio
+import tempfile
+import json
+import os
+
+from auto_assist.browser import DomainThrottle
+from auto_assist.fetcher import HybridFetcher, check_http_page
+
+static_html = '<html><head><title>Group</title></head><body><h1>Members</h1>' + \
+    '<p>Zhang Wei, PhD student</p>' * 20 + '</body></html>'
+spa_html = '<html><head><script>' + 'var a = 1;' * 100 + '</script></head><body><div id="root"></div></body></html>'
+challenge_html = '<html><head><title>Just a moment...</title></head><body>' + 'x' * 300 + '</body></html>'
+
+
+class FakeResponse:
+
+    def __init__(self, html, status_code=200, headers=None):
+        self.text = html
+        self.status_code = status_code
+        self.headers = headers or {'content-type': 'text/html; charset=utf-8'}
+
+
+class FakeClient:
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.urls = []
+
+    async def get(self, url):
+        self.urls.append(url)
+        page = self.pages[url]
+        if isinstance(page, Exception):
+            raise page
+        return page
+
+    async def aclose(self):
+        pass
+
+
+class TestFetcher(TestCase):
+
+    def test_check_http_page(self):
+        html_headers = {'content-type': 'text/html'}
+        self.assertEqual(check_http_page(200, html_headers, static_html), '')
+        self.assertEqual(check_http_page(200, html_headers, spa_html), 'no text')
+        self.assertEqual(check_http_page(403, html_headers, challenge_html), 'challenge')
+        self.assertEqual(check_http_page(404, html_headers, static_html), 'status 404')
+        self.assertEqual(check_http_page(200, {'content-type': 'application/pdf'}, ''), 'content type application/pdf')
+
+    def test_hybrid_fetcher(self):
+        pages = {
+            'https://a.edu/static': FakeResponse(static_html),
+            'https://b.edu/1': FakeResponse(spa_html),
+            'https://b.edu/2': FakeResponse(challenge_html, 403),
+            'https://b.edu/3': FakeResponse(spa_html),
+            'https://c.edu/down': ConnectionResetError('reset by peer'),
+        }
+        browsed = []
+
+        async def browser_fetch(url):
+            browsed.append(url)
+            return 'browser'
+
+        async def _run(strategy_file):
+            fetcher = HybridFetcher(DomainThrottle(interval=0), strategy_file=strategy_file)
+            fetcher._client = client = FakeClient(pages)
+            results = [await fetcher.fetch(url, browser_fetch) for url in pages]
+            results.append(await fetcher.fetch('https://www.linkedin.com/in/someone', browser_fetch))
+            await fetcher.close()
+            return results, client.urls
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            strategy_file = os.path.join(tmp_dir, 'fetch-strategy.json')
+            results, http_urls = asyncio.run(_run(strategy_file))
+            self.assertEqual(results, [static_html, 'browser', 'browser', 'browser', 'browser', 'browser'])
+            # b.edu is fetched with browser directly after 2 fallbacks
+            self.assertEqual(http_urls, ['https://a.edu/static', 'https://b.edu/1', 'https://b.edu/2',
+                                         'https://c.edu/down'])
+            with open(strategy_file, encoding='utf-8') as f:
+                self.assertEqual(json.load(f), {'a.edu': {'http': 1}, 'b.edu': {'fallback': 2},
+                                                'c.edu': {'fallback': 1}})
+
+            # the next run starts from the saved strategy
+            _, http_urls = asyncio.run(_run(strategy_file))
+            self.assertEqual(http_urls, ['https://a.edu/static', 'https://c.edu/down'])
+
+    def test_hybrid_fetcher_errors(self):
+        async def browser_fetch(url):
+            return 'browser'
+
+        async def _run(client=None):
+            fetcher = HybridFetcher(DomainThrottle(interval=0))
+            fetcher._client = client
+            try:
+                return await fetcher.fetch('https://a.edu/people', browser_fetch)
+            finally:
+                self.assertEqual(fetcher._hosts, {})
+
+        # a bug is raised instead of being taken as a page that requires browser
+        with self.assertRaises(KeyError):
+            asyncio.run(_run(FakeClient({})))
+        # so is a missing httpx
+        with mock.patch.dict('sys.modules', {'httpx': None}), self.assertRaises(ImportError):
+            asyncio.run(_run())
@@ -0,0 +1,102 @@
+from unittest import TestCase, mock
+import tempfile
+import asyncio
+import json
+import os
+
+from auto_assist.domain.google_scholar import (
+    gs_parse_profile_html, gs_fix_profile_from_html, gs_get_endnote_url, parse_endnote, gs_explore_profiles,
+)
+
+profile_html = """
+<html><body>
+<div id="gsc_prf_w"><div id="gsc_prf_in">Wei Zhang</div>
+<div class="gsc_prf_il">Professor of Chemistry, Peking University</div></div>
+<a class="gsc_prf_ila" href="https://zhang.pku.edu.cn">Homepage</a>
+<a class="gsc_prf_inta gs_ibl" href="#">Catalysis</a><a class="gsc_prf_inta gs_ibl" href="#">Batteries</a>
+<table id="gsc_rsb_st"><tr><th></th><th>All</th></tr><tr><td>Citations</td><td>1234</td></tr></table>
+<ul class="gsc_rsb_a"><li><a href="/citations?user=abc&amp;hl=en">Ming Li</a></li></ul>
+<table><tr><td><a class="gsc_a_at" href="#">Single atom catalysts</a></td></tr></table>
+</body></html>
+"""
+
+
+class TestGoogleScholar(TestCase):
+
+    def test_gs_parse_profile_html(self):
+        profile = gs_parse_profile_html(profile_html, '/citations?user=xyz')
+        self.assertEqual(profile['url'], '/citations?user=xyz')
+        self.assertEqual(profile['name'], 'Wei Zhang')
+        self.assertEqual(profile['brief'], 'Wei Zhang\nProfessor of Chemistry, Peking University')
+        self.assertEqual(profile['cited_stats'], '\tAll\nCitations\t1234')
+        self.assertEqual(profile['homepage'], 'https://zhang.pku.edu.cn')
+        self.assertEqual(profile['co_authors'], [{'name': 'Ming Li', 'url': '/citations?user=abc&hl=en'}])
+        self.assertEqual(profile['articles'], ['Single atom catalysts'])
+        self.assertEqual(profile['tags'], ['Catalysis', 'Batteries'])
+
+    def test_gs_fix_profile_from_html(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            os.makedirs(os.path.join(out_dir, 'gs_htmls'))
+            for uid in ['xyz', 'abc']:
+                with open(os.path.join(out_dir, 'gs_htmls', f'profile_{uid}.html'), 'w', encoding='utf-8') as fp:
+                    fp.write(profile_html)
+            with open(os.path.join(out_dir, 'gs_profiles.jsonl'), 'w', encoding='utf-8') as fp:
+                fp.write(json.dumps({'url': '/citations?hl=en&user=xyz', 'html_path': 'x/profile_xyz.html'}) + '\n')
+                # saved with artifacts=none, or the html is deleted
+                fp.write(json.dumps({'url': '/citations?hl=en&user=nohtml', 'html_path': ''}) + '\n')
+                fp.write(json.dumps({'url': '/citations?hl=en&user=gone', 'html_path': 'x/profile_gone.html'}) + '\n')
+            gs_fix_profile_from_html(out_dir, suffix='test', workers=1)
+            with open(os.path.join(out_dir, 'gs_profiles_test.jsonl'), encoding='utf-8') as fp:
+                profiles = [json.loads(line) for line in fp]
+        self.assertEqual([p['url'] for p in profiles], ['/citations?hl=en&user=xyz', '/citations?user=abc'])
+        self.assertEqual(profiles[1]['name'], 'Wei Zhang')
+
+    def test_gs_get_endnote_url(self):
+        cite_html = """
+        <div id="gs_citi">
+        <a class="gs_citi" href="https://scholar.googleusercontent.com/scholar.bib?q=info:abc">BibTeX</a>
+        <a class="gs_citi" href="https://scholar.googleusercontent.com/scholar.enw?q=info:abc&amp;output=citation">EndNote</a>
+        </div>
+        """
+        self.assertEqual(gs_get_endnote_url(cite_html),
+                         'https://scholar.googleusercontent.com/scholar.enw?q=info:abc&output=citation')
+        self.assertEqual(gs_get_endnote_url('<div></div>'), '')
+
+    def test_parse_endnote(self):
+        citation = parse_endnote('%0 Journal Article\n%T Title \n%A Li, Ming\n%A Zhang, Wei\n%D 2014\n')
+        self.assertEqual(citation['type'], 'Journal Article')
+        self.assertEqual(citation['title'], 'Title')
+        self.assertEqual(citation['authors'], ['Li, Ming', 'Zhang, Wei'])
+        self.assertEqual(citation['year'], '2014')
+
+    def test_gs_explore_profiles_resume(self):
+        class FakeBrowser:
+            pages = [object()]
+
+        co_authors = {'A': ['C'], 'B': ['D'], 'C': [], 'D': []}
+        failed = {'B'}
+        visited = []
+
+        async def _scrape(gs_page, user_url, uid, *args, **kwargs):
+            if uid in failed:
+                raise TimeoutError(f'captcha of {uid}')
+            visited.append(uid)
+            return {'url': user_url, 'name': uid, 'html_path': '', 'pdf_path': '',
+                    'co_authors': [{'name': u, 'url': f'/citations?user={u}'} for u in co_authors[uid]]}
+
+        seeds = ['/citations?user=A', '/citations?user=B']
+        with tempfile.TemporaryDirectory() as out_dir, \
+                mock.patch('auto_assist.domain.google_scholar._gs_scrape_profile', _scrape):
+            with self.assertRaises(TimeoutError):
+                asyncio.run(gs_explore_profiles(FakeBrowser(), seeds, out_dir, depth_limit=1, artifacts='none'))
+            with open(os.path.join(out_dir, 'gs_frontier.json'), encoding='utf-8') as fp:
+                state = json.load(fp)
+            # the failed profile is kept in the frontier with the co-authors queued before it fails
+            self.assertIn(['/citations?user=B', 0], state['frontier'])
+            self.assertEqual(visited, ['A'])
+
+            failed.clear()
+            asyncio.run(gs_explore_profiles(FakeBrowser(), seeds, out_dir, depth_limit=1, artifacts='none'))
+            self.assertEqual(sorted(visited), ['A', 'B', 'C', 'D'])
+            with open(os.path.join(out_dir, 'gs_frontier.json'), encoding='utf-8') as fp:
+                self.assertEqual(json.load(fp)['frontier'], [])
@@ -0,0 +1,228 @@
+from unittest import TestCase
+import asyncio
+import tempfile
+import shutil
+from types import SimpleNamespace
+import json
+import os
+
+import pandas as pd
+
+from auto_assist.domain.hunter import HunterCmd, prefilter_students, match_name_result, score_group_search
+from auto_assist.llm import LlmGateway, LlmCache
+from auto_assist.pipeline import StagePipeline
+from auto_assist.store import Manifest
+
+
+class TestHunter(TestCase):
+
+    def test_prefilter_students(self):
+        students = pd.DataFrame({
+            'name': ['Zhang Wei', 'John Smith', 'zhang wei', None, 'Li Ming', 'Xiaoming Wang'],
+            'title': ['PhD student', 'PhD', 'Postdoc', 'PhD', 'Undergraduate', None],
+            'institute': ['MIT', 'MIT', 'mit', 'MIT', 'MIT', 'MIT'],
+        })
+        kept, skipped = prefilter_students(students)
+        self.assertEqual(kept['name'].tolist(), ['Zhang Wei', 'Xiaoming Wang'])
+        self.assertEqual(skipped['reason'].tolist(), ['not_chinese', 'duplicated', 'no_name', 'not_graduate'])
+
+    def test_prefilter_results(self):
+        self.assertTrue(match_name_result({'title': 'Zhang-Wei | MIT', 'snippet': None, 'url': ''}, 'Wei Zhang'))
+        self.assertFalse(match_name_result({'title': 'Li Hua', 'snippet': 'PhD', 'url': ''}, 'Wei Zhang'))
+
+        hunter = HunterCmd(manifest=False)
+        results = [
+            {'url': 'https://a.edu/people', 'title': 'Group members', 'snippet': ''},
+            {'url': 'https://a.edu/~smith', 'title': 'Smith profile', 'snippet': ''},
+        ]
+        keep = lambda r: score_group_search(r) >= 0
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            hunter._reset_prefilter()
+            kept = hunter._prefilter_results(results, keep, tmp_dir, 'group-', hunter._prefilter_urls)
+            self.assertEqual([r['url'] for r in kept], ['https://a.edu/people'])
+            # the page is taken by the first group
+            self.assertEqual(hunter._prefilter_results(results, keep, tmp_dir, 'group-', hunter._prefilter_urls), [])
+
+            hunter._report_prefilter(tmp_dir, max_search=3, parse=True)
+            with open(os.path.join(tmp_dir, 'prefilter.json'), encoding='utf-8') as f:
+                report = json.load(f)
+            self.assertEqual(report['skipped_urls'], 3)
+            self.assertEqual(report['avoided_llm_calls_max'], 3)
+
+    def test_submit_deleted_artifacts(self):
+        hunter = HunterCmd(converter='python')
+        parsed = []
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            html_file = os.path.join(tmp_dir, 'faculty.html')
+            md_file = html_file + '.md'
+            jsonl_file = md_file + '.jsonl'
+
+            async def _parse():
+                with open(md_file, encoding='utf-8') as f:
+                    parsed.append(f.read())
+                with open(jsonl_file, 'w', encoding='utf-8') as f:
+                    f.write('{}')
+                hunter._record(jsonl_file, upstream=md_file)
+
+            async def _delete_md():
+                await asyncio.sleep(0.05)
+                os.remove(md_file)
+
+            async def _run(delete_md=False):
+                async with StagePipeline({'convert': 1, 'parse': 1}) as pipeline:
+                    hunter._pipeline = pipeline
+                    if delete_md:
+                        # delete the markdown after the parse job is queued
+                        await pipeline.put('parse', _delete_md)
+                    await hunter._async_submit(html_file, md_file, _parse, jsonl_file)
+                hunter._pipeline = None
+
+            with open(html_file, 'w', encoding='utf-8') as f:
+                f.write('<p>Zhang Wei</p>')
+            with Manifest(tmp_dir) as hunter._manifest:
+                asyncio.run(_run())
+                self.assertEqual(len(parsed), 1)
+                asyncio.run(_run())
+                self.assertEqual(len(parsed), 1)
+
+                # the deleted markdown is converted again with verify, and the parse is up to date with it
+                os.remove(md_file)
+                hunter._manifest.verify = True
+                asyncio.run(_run())
+                self.assertTrue(os.path.exists(md_file))
+                self.assertEqual(len(parsed), 1)
+
+                # the markdown deleted while the parse job is queued is converted again
+                os.remove(jsonl_file)
+                asyncio.run(_run(delete_md=True))
+                self.assertEqual(len(parsed), 2)
+                self.assertIn('Zhang Wei', parsed[-1])
+
+    def test_parse_empty_result(self):
+        hunter = HunterCmd(converter='python')
+        answers = []
+
+        async def _llm(prompt, text):
+            content = answers.pop(0)
+            if content is None:
+                raise ValueError('LLM failed')
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+        hunter._async_get_open_ai_response = _llm
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            md_file = os.path.join(tmp_dir, 'faculty.html.md')
+            with open(md_file, 'w', encoding='utf-8') as f:
+                f.write('# Contact')
+            with Manifest(tmp_dir) as hunter._manifest:
+                hunter._record(md_file)
+                for parse in [hunter._async_parse_faculty, hunter._async_parse_group]:
+                    jsonl_file = os.path.join(tmp_dir, f'{parse.__name__}.jsonl')
+                    # the failed call is retried on rerun
+                    answers.append(None)
+                    asyncio.run(parse(md_file, jsonl_file, url='https://a.edu/people'))
+                    self.assertFalse(hunter._is_done(jsonl_file, upstream=md_file))
+                    # while a page without any member is done
+                    answers.append('```json\n```')
+                    asyncio.run(parse(md_file, jsonl_file, url='https://a.edu/people'))
+                    self.assertTrue(hunter._is_done(jsonl_file, upstream=md_file))
+                    with open(jsonl_file, encoding='utf-8') as f:
+                        self.assertEqual(f.read(), '')
+
+    def test_convert_html_to_md(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            html_dir, out_dir = os.path.join(tmp_dir, 'html'), os.path.join(tmp_dir, 'md')
+            os.makedirs(html_dir)
+            for name in ['a', 'b', 'c']:
+                with open(os.path.join(html_dir, f'{name}.html'), 'w', encoding='utf-8') as f:
+                    f.write(f'<h1>{name}</h1>')
+            # a file that is not utf-8
+            with open(os.path.join(html_dir, 'b.html'), 'wb') as f:
+                f.write(b'<h1>\xff</h1>')
+
+            def _pandoc_convert(in_html, out_md):
+                with open(in_html, 'r', encoding='utf-8') as f:
+                    html = f.read()
+                with open(out_md, 'w', encoding='utf-8') as f:
+                    f.write(html)
+
+            def _pandoc_convert_batch(in_htmls, out_mds):
+                raise ValueError('bad file in batch')
+
+            for converter in ['python', 'pandoc']:
+                hunter = HunterCmd(converter=converter)
+                # pandoc is not needed, the batch always fails so the files are converted one by one
+                hunter.pandoc_convert = _pandoc_convert
+                hunter.pandoc_convert_batch = _pandoc_convert_batch
+                shutil.rmtree(out_dir, ignore_errors=True)
+                # the bad file doesn't stop the others in the same batch
+                hunter.convert_html_to_md(os.path.join(html_dir, '*.html'), out_dir=out_dir, workers=1, batch_size=3)
+                self.assertEqual(sorted(os.listdir(out_dir)), ['a.html.md', 'c.html.md'], converter)
+
+    def test_run_pool_teardown(self):
+        class FakeBrowser:
+            pages = []
+
+            async def add_init_script(self, script):
+                pass
+
+            async def new_page(self):
+                return object()
+
+        async def _fail(page):
+            raise ValueError('job failed')
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            hunter = HunterCmd()
+            hunter._get_llm_gateway = lambda: LlmGateway(cache=LlmCache(os.path.join(tmp_dir, 'cache.sqlite')))
+            hunter._get_blocker()
+            with self.assertRaises(ValueError):
+                asyncio.run(hunter._async_run_pool(FakeBrowser(), [_fail], out_dir=tmp_dir))
+            # the clients are closed and the stats are saved even if a job fails
+            self.assertIsNone(hunter._manifest)
+            self.assertIsNone(hunter._llm._cache)
+            self.assertTrue(os.path.exists(os.path.join(tmp_dir, 'resource-stats.json')))
+
+    def test_prune_order(self):
+        class FakeBrowser:
+            pages = [object(), object()]
+
+            async def add_init_script(self, script):
+                pass
+
+        nav = '<ul><li><a href="/">Home</a></li><li><a href="/people">People</a></li></ul>'
+        htmls = [f'<html><body>{nav}<p>Zhang Wei {i}, PhD student of group {i}</p></body></html>' for i in range(4)]
+
+        def _run(order):
+            prompts = {}
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                hunter = HunterCmd(converter='python')
+                hunter._get_llm_gateway = lambda: LlmGateway(cache=None)
+
+                def _job(i):
+                    html_file = os.path.join(tmp_dir, f'page{i}.html')
+                    md_file = html_file + '.md'
+                    url = f'https://chem.uni.edu/page{i}'
+
+                    async def _parse():
+                        # the later pages are parsed first
+                        await asyncio.sleep(0.01 * (4 - i))
+                        prompts[i] = hunter._read_markdown(md_file, url, prune=True)
+
+                    async def _submit(page):
+                        with open(html_file, 'w', encoding='utf-8') as f:
+                            f.write(htmls[i])
+                        await hunter._async_submit(html_file, md_file, _parse, md_file + '.jsonl', url=url)
+                    return _submit
+
+                asyncio.run(hunter._async_run_pool(FakeBrowser(), [_job(i) for i in order], 2,
+                                                   out_dir=tmp_dir, prune=True))
+                self.assertTrue(os.path.exists(os.path.join(tmp_dir, 'boilerplate.json')))
+            return prompts
+
+        prompts = _run([0, 1, 2, 3])
+        self.assertEqual(prompts, _run([3, 1, 0, 2]))
+        for i in range(4):
+            self.assertIn(f'Zhang Wei {i}', prompts[i])
+            # the menu of the first page is pruned too
+            self.assertNotIn('Home', prompts[i])
@@ -1,12 +1,33 @@
-from unittest import TestCase
+from unittest import TestCase, skipUnless
+import subprocess as sp
+import tempfile
+import shutil
+import os
+import re
 
-from auto_assist.lib import url_to_key, get_md_code_block
+from auto_assist.lib import (
+    url_to_key, get_md_code_block, html_to_markdown, clean_soup, clean_html,
+    split_markdown, estimate_tokens, merge_records, BoilerplateFilter,
+    json_dump_file, json_dump_file_iter, expand_globs, scan_dir,
+    is_chinese_name, chinese_name_mask,
+)
 
 md_text = """
 ```json
 {"key": "value"}
 ```"""
 
+html_text = """
+<html><head><title>Group</title><script>var a = 1;</script></head><body>
+<nav><ul><li><a href="/">Home</a></li><li><a href="/people">People</a></li></ul></nav>
+<h1>Smith Group</h1>
+<p>We study <b>catalysis</b> and <em>batteries</em>.</p>
+<h2>Members</h2>
+<ul><li>Zhang Wei, PhD student<ul><li>Catalysis</li></ul></li><li>Li Ming, Postdoc</li></ul>
+<table><tr><th>Name</th><th>Title</th></tr><tr><td>Wang Fang</td><td>Graduate student</td></tr></table>
+</body></html>
+"""
+
 
 class TestLib(TestCase):
 
@@ -17,4 +38,191 @@ class TestLib(TestCase):
 
     def test_get_md_code_block(self):
         data = next(get_md_code_block(md_text, '```json')).strip()
-        self.assertEqual(data, '{"key": "value"}')
\ No newline at end of file
+        self.assertEqual(data, '{"key": "value"}')
+
+    def test_clean_html(self):
+        html = '<html><head><meta charset="utf-8"><script>var a = 1;</script></head>' \
+            '<body><p class="x">Hi <img src="a.png"> there</p><code>c</code></body></html>'
+        cleaned = clean_html(html)
+        for s in ['class=', 'charset', '<img', 'var a', '<code']:
+            self.assertNotIn(s, cleaned)
+        self.assertIn('<p>Hi  there</p>', cleaned)
+        self.assertIn('charset="utf-8"', clean_html(html, keep_attrs=True))
+        xhtml = '<?xml version="1.0" encoding="UTF-8"?>\n<html xmlns="http://www.w3.org/1999/xhtml">' \
+            '<body><p class="x">Zhang Wei</p></body></html>'
+        cleaned = clean_html(xhtml)
+        self.assertIn('<p>Zhang Wei</p>', cleaned)
+        self.assertNotIn('class=', cleaned)
+        # lxml takes it as empty document
+        self.assertEqual(clean_html('<!-- nothing here -->'), '<!-- nothing here -->')
+
+    def test_html_to_markdown(self):
+        md = html_to_markdown(clean_soup(html_text))
+        self.assertIn('# Smith Group\n', md)
+        self.assertIn('We study **catalysis** and *batteries*.', md)
+        self.assertIn('-   Zhang Wei, PhD student\n\n    -   Catalysis\n-   Li Ming, Postdoc', md)
+        self.assertIn('| Wang Fang | Graduate student |', md)
+        self.assertNotIn('var a', md)
+
+    def test_html_to_markdown_nested(self):
+        html = '<table><tbody><tr><td>Name</td><td><table><tr><td>Zhang Wei</td><td>PhD</td></tr></table></td></tr>' \
+            '</tbody><tfoot><tr><td>End</td></tr></tfoot></table>'
+        md = html_to_markdown(html)
+        self.assertEqual(md.count('Zhang Wei'), 1)
+        self.assertIn('| Name | Zhang Wei PhD |', md)
+        self.assertIn('| End |  |', md)
+        self.assertNotIn('\\|', md)
+        # unclosed tags of malformed pages
+        md = html_to_markdown('<div>' + '<font>' * 3000 + 'Li Ming</div>')
+        self.assertEqual(md, 'Li Ming\n')
+
+    @skipUnless(shutil.which('pandoc'), 'pandoc is not installed')
+    def test_html_to_markdown_same_as_pandoc(self):
+        html = str(clean_soup(html_text))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            html_file = os.path.join(tmp_dir, 'group.html')
+            with open(html_file, 'w', encoding='utf-8') as f:
+                f.write(html)
+            pandoc_md = sp.check_output(['pandoc', '-f', 'html-native_divs-native_spans', '-t', 'markdown', html_file],
+                                        encoding='utf-8')
+        # markup style may differ, but the text should be the same
+        words = lambda md: re.findall(r'[\w.,]+', md)
+        self.assertEqual(words(pandoc_md), words(html_to_markdown(html)))
+
+    def test_split_markdown(self):
+        sections = ['# Faculty\n\n'] + [f'## Member {i}\n\n- Professor of Chemistry\n- member{i}@uni.edu\n\n'
+                                          for i in range(50)]
+        md = ''.join(sections)
+        chunks = split_markdown(md, 100)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunks), md)
+        for chunk in chunks:
+            self.assertLessEqual(estimate_tokens(chunk), 100)
+            self.assertTrue(chunk.startswith('#'))
+        self.assertEqual(split_markdown(md, 10000), [md])
+
+    def test_merge_records(self):
+        records = [
+            {'name': 'Zhang Wei', 'title': ''},
+            {'name': 'zhang  wei', 'title': 'PhD Student', 'email': 'zw@uni.edu'},
+            {'name': 'Li Ming', 'title': 'Postdoc'},
+            {'name': '', 'title': 'Professor'},
+        ]
+        self.assertEqual(merge_records(records), [
+            {'name': 'Zhang Wei', 'title': 'PhD Student', 'email': 'zw@uni.edu'},
+            {'name': 'Li Ming', 'title': 'Postdoc'},
+        ])
+
+    def test_boilerplate_filter(self):
+        nav = '-   [Home](/)\n-   [People](/people)\n-   [News](/news)'
+        footer = 'Copyright 2024 University. All rights reserved.'
+        pages = [f'{nav}\n\n# Group {i}\n\n-   Zhang Wei, PhD student\n\n-   Member {i}\n\n{footer}\n'
+                 for i in range(4)]
+        boilerplate = BoilerplateFilter(min_repeat=2)
+        pruned = [boilerplate.prune(md, host='chem.uni.edu', page=str(i)) for i, md in enumerate(pages)]
+        for i, md in enumerate(pruned):
+            self.assertNotIn('[Home]', md)
+            self.assertNotIn('Copyright', md)
+            self.assertIn(f'# Group {i}', md)
+            # repeated content in the middle of page must be kept
+            self.assertIn('Zhang Wei, PhD student', md)
+
+    def test_boilerplate_filter_without_heading(self):
+        nav = '-   [Home](/)\n-   [People](/people)\n-   [News](/news)'
+        pages = [f'{nav}\n\n-   [Zhang Wei {i}](/people/zhang{i})\n-   [Li Ming {i}](/people/li{i})\n\nPrivacy policy\n'
+                 for i in range(3)]
+
+        def _prune_all(order):
+            boilerplate = BoilerplateFilter(min_repeat=2)
+            for i, md in enumerate(pages):
+                boilerplate.add(md, host='chem.uni.edu', page=str(i))
+            return {i: boilerplate.prune(pages[i], host='chem.uni.edu', page=str(i)) for i in order}
+
+        pruned = _prune_all([0, 1, 2])
+        # the pages are pruned the same no matter the order once all of them are added
+        self.assertEqual(pruned, _prune_all([2, 0, 1]))
+        for i in range(3):
+            self.assertIn(f'[Zhang Wei {i}]', pruned[i])
+            self.assertNotIn('[Home]', pruned[i])
+            self.assertNotIn('Privacy', pruned[i])
+
+        # the counts are kept across runs
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'boilerplate.json')
+            boilerplate = BoilerplateFilter(min_repeat=2)
+            boilerplate.add(pages[0], host='chem.uni.edu', page='0')
+            boilerplate.add(pages[1], host='chem.uni.edu', page='1')
+            boilerplate.save(path)
+            boilerplate = BoilerplateFilter(min_repeat=2)
+            boilerplate.load(path)
+            self.assertEqual(boilerplate.prune(pages[2], host='chem.uni.edu', page='2'), pruned[2])
+
+        # a page added again replaces its blocks instead of counting them twice
+        address = 'Department of Chemistry, 1 Main Street'
+        boilerplate = BoilerplateFilter(min_repeat=2)
+        for i in [0, 1, 1]:
+            boilerplate.add(f'# Group {i}\n\n{address}\n', host='chem.uni.edu', page=str(i))
+        self.assertIn(address, boilerplate.prune(f'# Group 1\n\n{address}\n', host='chem.uni.edu', page='1'))
+        boilerplate.add(f'# Group 2\n\n{address}\n', host='chem.uni.edu', page='2')
+        self.assertNotIn(address, boilerplate.prune(f'# Group 1\n\n{address}\n', host='chem.uni.edu', page='1'))
+
+    def test_json_dump_file_iter(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            a_file, b_file = os.path.join(tmp_dir, 'a.json'), os.path.join(tmp_dir, 'b.json')
+            for data in [[], [{'name': '张伟', 'bio': 'line1\nline2', 'tags': [1, {}]}, 'x']]:
+                json_dump_file(data, a_file)
+                json_dump_file_iter(iter(data), b_file)
+                with open(a_file, encoding='utf-8') as a, open(b_file, encoding='utf-8') as b:
+                    self.assertEqual(a.read(), b.read())
+
+    def test_expand_globs(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for d in ['a', 'b']:
+                os.makedirs(os.path.join(tmp_dir, d))
+                for name in ['index.json', 'cv-1.md.json', 'cv-2.md.json', 'group-1.jsonl', '.cv-3.md.json']:
+                    open(os.path.join(tmp_dir, d, name), 'w').close()
+            a_dir, b_dir = os.path.join(tmp_dir, 'a'), os.path.join(tmp_dir, 'b')
+
+            paths = expand_globs([b_dir, os.path.join(tmp_dir, '*'), os.path.join(tmp_dir, 'c')])
+            self.assertEqual(paths, [b_dir, a_dir, os.path.join(tmp_dir, 'c')])
+            paths = expand_globs([os.path.join(tmp_dir, '*', 'cv-*.md.json'), os.path.join(a_dir, 'cv-*')])
+            self.assertEqual(len(paths), 4)
+            with self.assertRaises(FileNotFoundError):
+                expand_globs([os.path.join(tmp_dir, '*.txt')], raise_invalid=True)
+
+            cv_files, group_files, hidden_files = scan_dir(a_dir, 'cv-*.md.json', 'group-*.jsonl', '.*')
+            self.assertEqual(sorted(cv_files), [os.path.join(a_dir, 'cv-1.md.json'), os.path.join(a_dir, 'cv-2.md.json')])
+            self.assertEqual(group_files, [os.path.join(a_dir, 'group-1.jsonl')])
+            self.assertEqual(hidden_files, [os.path.join(a_dir, '.cv-3.md.json')])
+
+            # a literal path is kept as is even if it looks like a pattern
+            literal_dir = os.path.join(tmp_dir, 'group[a]')
+            os.makedirs(literal_dir)
+            self.assertEqual(expand_globs([literal_dir]), [literal_dir])
+            self.assertEqual(expand_globs([os.path.join(tmp_dir, 'group[ab]')]), [])
+
+    def test_chinese_name_mask(self):
+        import pandas as pd
+        names = pd.Series(['Zhang Wei', 'John Smith', None, 'zhang wei', 'Li Ming', 'John Smith'], index=range(10, 16))
+        mask = chinese_name_mask(names)
+        self.assertEqual(mask.index.tolist(), names.index.tolist())
+        self.assertEqual(mask.tolist(), [is_chinese_name(name) for name in names.fillna('')])
+
+    def test_is_chinese_name_joined(self):
+        for word in ['Xiaoming', 'Ouyang', "Xi'an", 'Xian', 'Zhangwei', "Tian'an", 'Qiong']:
+            self.assertTrue(is_chinese_name(word), word)
+        # a syllable starting with a, o or e only follows another one after an apostrophe,
+        # and a given name has 2 syllables at most
+        for word in ['Smith', 'Diane', 'Tianan', "li'", 'Xiaomingli']:
+            self.assertFalse(is_chinese_name(word), word)
+
+        for name in ['Zhang-Wei', 'Xiaoming Li', 'LI, Xiaoming', "Xi'an Wang"]:
+            self.assertTrue(is_chinese_name(name), name)
+        for name in ['John Smith', "O'Brien", 'Renée Müller', 'Ouyangxiaoming']:
+            self.assertFalse(is_chinese_name(name), name)
+        self.assertTrue(is_chinese_name('Ouyangxiaoming', max_syllables=4))
+        # western given names that are joined syllables
+        for name in ['Mike Jones', 'Tina Turner', 'Kate Moss', 'Linda Brown', 'Lisa Simpson', 'Anna Schmidt',
+                     'Nina Simone', 'Dana Scully', 'Lena Headey', 'Mina Harker', 'Hana Kim']:
+            self.assertFalse(is_chinese_name(name), name)
+        self.assertTrue(is_chinese_name('Xiaoming Zhangsan'))
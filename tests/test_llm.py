@@ -0,0 +1,182 @@
+from unittest import TestCase, mock
+import itertools
+import tempfile
+import asyncio
+import os
+
+from openai.types.chat import ChatCompletion
+
+from auto_assist.llm import TokenBucket, LlmCache, LlmGateway
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeCompletions:
+
+    def __init__(self, finish_reasons):
+        self.finish_reasons = list(finish_reasons)
+        self.calls = 0
+
+    async def create(self, model, messages, **kwargs):
+        self.calls += 1
+        return ChatCompletion.model_validate({
+            'id': f'chat-{self.calls}',
+            'object': 'chat.completion',
+            'created': 0,
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'finish_reason': self.finish_reasons.pop(0),
+                'message': {'role': 'assistant', 'content': f'answer {self.calls}'},
+            }],
+        })
+
+
+class FakeClient:
+
+    def __init__(self, finish_reasons):
+        self.completions = FakeCompletions(finish_reasons)
+        self.chat = self
+
+    async def close(self):
+        pass
+
+
+class TestLlm(TestCase):
+
+    def _patch_clock(self):
+        clock = FakeClock()
+        patchers = [
+            mock.patch('auto_assist.llm.time.monotonic', clock.monotonic),
+            mock.patch('auto_assist.llm.asyncio.sleep', clock.sleep),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return clock
+
+    def test_token_bucket(self):
+        clock = self._patch_clock()
+        # 60 tokens per minute is 1 token per second
+        bucket = TokenBucket(60, capacity=10)
+
+        async def _run():
+            await bucket.acquire(10)
+            self.assertEqual(clock.sleeps, [])
+            # wait for the missing tokens to be refilled
+            await bucket.acquire(3)
+            self.assertEqual(clock.now, 3)
+
+            # the refill is capped by the capacity
+            clock.now += 100
+            await bucket.acquire(10)
+            self.assertEqual(clock.now, 103)
+
+            # a request larger than the bucket waits for a full bucket only
+            await bucket.acquire(50)
+            self.assertEqual(clock.now, 113)
+
+        asyncio.run(_run())
+
+    def test_token_bucket_consume(self):
+        clock = self._patch_clock()
+        bucket = TokenBucket(60, capacity=10)
+
+        async def _run():
+            await bucket.acquire(5)
+            # the estimation is 5 tokens less than the usage, the bucket goes negative
+            bucket.consume(10)
+            await bucket.acquire(1)
+            self.assertEqual(clock.now, 6)
+
+        asyncio.run(_run())
+
+    def test_token_bucket_unlimited(self):
+        clock = self._patch_clock()
+        bucket = TokenBucket(0)
+
+        async def _run():
+            for _ in range(100):
+                await bucket.acquire(1000)
+            bucket.consume(1000)
+
+        asyncio.run(_run())
+        self.assertEqual(clock.sleeps, [])
+
+    def test_llm_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'cache.sqlite')
+            key = LlmCache.get_key('deepseek-chat', 'prompt', '中文')
+            # the key only depends on model, prompt and text
+            self.assertEqual(key, LlmCache.get_key('deepseek-chat', 'prompt', '中文'))
+            self.assertNotEqual(key, LlmCache.get_key('deepseek-reasoner', 'prompt', '中文'))
+            self.assertNotEqual(LlmCache.get_key('m', 'a', 'bc'), LlmCache.get_key('m', 'ab', 'c'))
+
+            cache = LlmCache(path)
+            self.assertIsNone(cache.get(key))
+            cache.set(key, 'value')
+            self.assertEqual(cache.get(key), 'value')
+            cache.close()
+
+            # the entries are kept across processes
+            cache = LlmCache(path)
+            self.assertEqual(cache.get(key), 'value')
+            self.assertIsNone(cache.get('missing'))
+            self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'count': 1, 'size': 5})
+            cache.close()
+
+    def test_llm_cache_eviction(self):
+        clock = itertools.count()
+        with mock.patch('auto_assist.llm.time.time', lambda: next(clock)), \
+                tempfile.TemporaryDirectory() as tmp_dir:
+            cache = LlmCache(os.path.join(tmp_dir, 'cache.sqlite'), max_size=100)
+            for key in 'abc':
+                cache.set(key, key * 30)
+            # a is used recently, so b is the least recently used
+            cache.get('a')
+            cache.set('d', 'd' * 30)
+            # the total size is evicted to 90% of the limit
+            self.assertEqual(cache.stats()['size'], 90)
+            self.assertIsNone(cache.get('b'))
+            for key in 'acd':
+                self.assertIsNotNone(cache.get(key))
+
+            cache.set('e', 'e' * 50)
+            self.assertLessEqual(cache.stats()['size'], 90)
+            self.assertEqual([key for key in 'acde' if cache.get(key) is not None], ['d', 'e'])
+            cache.close()
+
+    def test_llm_gateway_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = LlmCache(os.path.join(tmp_dir, 'cache.sqlite'))
+            gateway = LlmGateway(cache=cache)
+            client = FakeClient(['length', 'stop', 'stop'])
+            gateway._client = client
+
+            async def _run():
+                # the truncated answer is not cached
+                res = await gateway.chat('prompt', 'text')
+                self.assertEqual(res.choices[0].finish_reason, 'length')
+                res = await gateway.chat('prompt', 'text')
+                self.assertEqual(res.choices[0].message.content, 'answer 2')
+                res = await gateway.chat('prompt', 'text')
+                self.assertEqual(res.choices[0].message.content, 'answer 2')
+                self.assertEqual(client.completions.calls, 2)
+                self.assertEqual(cache.stats()['count'], 1)
+                self.assertEqual(cache.hits, 1)
+                self.assertEqual(cache.misses, 2)
+                await gateway.close()
+
+            asyncio.run(_run())
@@ -0,0 +1,66 @@
+from unittest import TestCase
+import asyncio
+
+from auto_assist.pipeline import StagePipeline, run_in_thread
+
+
+class TestPipeline(TestCase):
+
+    def test_drain_on_exit(self):
+        done = []
+
+        async def _fail():
+            raise ValueError('job failed')
+
+        async def _run():
+            async with StagePipeline({'convert': 2, 'parse': 1}, maxsize=2) as pipeline:
+                for i in range(5):
+                    async def _convert(i=i):
+                        await asyncio.sleep(0.01 * (5 - i))
+                        done.append(f'convert {i}')
+
+                        async def _parse():
+                            await asyncio.sleep(0.01)
+                            done.append(f'parse {i}')
+                        await pipeline.put('parse', _parse)
+                    await pipeline.put('convert', _convert)
+                # a failed job doesn't stop the workers
+                await pipeline.put('convert', _fail)
+            # all jobs are done on exit, including the ones put by the earlier stage
+            return list(done)
+
+        done_on_exit = asyncio.run(_run())
+        self.assertEqual(sorted(done_on_exit), sorted([f'convert {i}' for i in range(5)] +
+                                                      [f'parse {i}' for i in range(5)]))
+        for i in range(5):
+            self.assertLess(done_on_exit.index(f'convert {i}'), done_on_exit.index(f'parse {i}'))
+
+    def test_cancel_on_error(self):
+        started = []
+        done = []
+
+        async def _job(i):
+            started.append(i)
+            await asyncio.sleep(10)
+            done.append(i)
+
+        async def _run():
+            async with StagePipeline({'convert': 1}) as pipeline:
+                for i in range(3):
+                    await pipeline.put('convert', lambda i=i: _job(i))
+                await asyncio.sleep(0.01)
+                raise ValueError('stop')
+
+        loop = asyncio.new_event_loop()
+        try:
+            with self.assertRaises(ValueError):
+                loop.run_until_complete(asyncio.wait_for(_run(), 5))
+            # the running job is cancelled and the queued ones are dropped
+            self.assertEqual(started, [0])
+            self.assertEqual(done, [])
+            self.assertEqual([task for task in asyncio.all_tasks(loop) if not task.done()], [])
+        finally:
+            loop.close()
+
+    def test_run_in_thread(self):
+        self.assertEqual(asyncio.run(run_in_thread(sum, [1, 2], start=3)), 6)
@@ -0,0 +1,149 @@
+from unittest import TestCase, skipUnless
+import importlib.util
+import tempfile
+import sqlite3
+import os
+
+from auto_assist.store import JsonlStore, Manifest, TableWriter, read_table, iter_jsonl
+
+
+class TestStore(TestCase):
+
+    def test_jsonl_store(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'result.jsonl')
+            with JsonlStore(path, key=lambda r: r['url'], batch_size=2) as store:
+                for i in range(5):
+                    store.add({'url': f'u{i}', 'title': f'中文 {i}'})
+                self.assertIn('u3', store)
+                self.assertNotIn('u5', store)
+                self.assertEqual(store.get('u4'), {'url': 'u4', 'title': '中文 4'})
+
+            # simulate a crash: records appended without index, and an incomplete line
+            with open(path, 'a', encoding='utf-8') as fp:
+                fp.write('{"url": "u5", "title": "x"}\n{"url": "u6"')
+            with JsonlStore(path, key=lambda r: r['url']) as store:
+                self.assertEqual(len(store), 6)
+                self.assertEqual(store.get('u5'), {'url': 'u5', 'title': 'x'})
+                self.assertNotIn('u6', store)
+                store.add({'url': 'u0', 'title': 'new'})
+                self.assertEqual(store.get('u0'), {'url': 'u0', 'title': 'new'})
+            self.assertEqual([r['url'] for r in iter_jsonl(path)], ['u0', 'u1', 'u2', 'u3', 'u4', 'u5', 'u0'])
+
+            # the index is rebuilt if the file is replaced by a shorter one
+            with open(path, 'w', encoding='utf-8') as fp:
+                fp.write('{"url": "u9"}\n')
+            with JsonlStore(path, key=lambda r: r['url']) as store:
+                self.assertEqual(len(store), 1)
+                self.assertIn('u9', store)
+
+            # or replaced by a larger one, e.g. gs_profiles.jsonl is replaced by the fixed one
+            fixed_path = os.path.join(tmp_dir, 'fixed.jsonl')
+            with open(fixed_path, 'w', encoding='utf-8') as fp:
+                for i in range(5):
+                    fp.write(f'{{"url": "u{i}", "title": "fixed title {i}"}}\n')
+            os.replace(fixed_path, path)
+            with JsonlStore(path, key=lambda r: r['url']) as store:
+                self.assertEqual(len(store), 5)
+                self.assertNotIn('u9', store)
+                self.assertEqual(store.get('u3'), {'url': 'u3', 'title': 'fixed title 3'})
+
+            # or rewritten in place while it's open
+            with JsonlStore(path, key=lambda r: r['url']) as store:
+                with open(path, 'w', encoding='utf-8') as fp:
+                    fp.write('{"url": "u1", "title": "x"}\n{"url": "u3", "title": "y"}\n')
+                self.assertEqual(store.get('u3'), {'url': 'u3', 'title': 'y'})
+
+    def test_jsonl_store_meta(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'result.jsonl')
+            with open(path, 'w', encoding='utf-8') as fp:
+                fp.write('{"url": "u0"}\n')
+            # the index of an old version, the hash of the tail is stored as a number
+            conn = sqlite3.connect(path + '.idx.sqlite')
+            conn.execute('CREATE TABLE meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+            conn.execute("INSERT INTO meta (name, value) VALUES ('size', 14), ('tail_hash', '1234')")
+            conn.commit()
+            conn.close()
+            with JsonlStore(path, key=lambda r: r['url']) as store:
+                self.assertIn('u0', store)
+                self.assertIsInstance(store._get_meta('size'), int)
+                # a hash of digits is kept as is
+                store._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('hash', '0123')")
+                self.assertEqual(store._get_meta('hash'), '0123')
+            with JsonlStore(path, key=lambda r: r['url']) as store:
+                self.assertEqual(len(store), 1)
+
+    def test_manifest(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            html_file = os.path.join(tmp_dir, 'a.html')
+            md_file = html_file + '.md'
+            with Manifest(tmp_dir) as manifest:
+                self.assertFalse(manifest.done(html_file))
+                for path, text in [(html_file, '<p>a</p>'), (md_file, 'a')]:
+                    with open(path, 'w', encoding='utf-8') as f:
+                        f.write(text)
+                manifest.record(html_file)
+                manifest.record(md_file, upstream=html_file)
+                self.assertTrue(manifest.done(md_file, upstream=html_file))
+
+            with open(html_file, 'w', encoding='utf-8') as f:
+                f.write('<p>b</p>')
+            with Manifest(tmp_dir) as manifest:
+                self.assertTrue(manifest.done(md_file, upstream=html_file))
+                # the markdown is out of date once the html is rebuilt
+                manifest.record(html_file)
+                self.assertFalse(manifest.done(md_file, upstream=html_file))
+
+            # the manifest is trusted by default, the artifact deleted by hand is only built again with verify
+            with Manifest(tmp_dir) as manifest:
+                manifest.record(md_file, upstream=html_file)
+            os.remove(md_file)
+            with Manifest(tmp_dir) as manifest:
+                self.assertTrue(manifest.done(md_file, upstream=html_file))
+            with Manifest(tmp_dir, verify=True) as manifest:
+                self.assertFalse(manifest.done(md_file, upstream=html_file))
+                with open(md_file, 'w', encoding='utf-8') as f:
+                    f.write('b')
+                manifest.record(md_file, upstream=html_file)
+                self.assertTrue(manifest.done(md_file, upstream=html_file))
+
+            # index.json is not written again if it is not changed
+            index_file = os.path.join(tmp_dir, 'index.json')
+            with Manifest(tmp_dir) as manifest:
+                manifest.write_text(index_file, '{}')
+                mtime = os.stat(index_file).st_mtime_ns
+                manifest.write_text(index_file, '{}')
+                self.assertEqual(os.stat(index_file).st_mtime_ns, mtime)
+                os.remove(index_file)
+                manifest.write_text(index_file, '{}')
+                self.assertFalse(os.path.exists(index_file))
+            with Manifest(tmp_dir, verify=True) as manifest:
+                manifest.write_text(index_file, '{}')
+                self.assertTrue(os.path.exists(index_file))
+
+    def _test_table_writer(self, ext):
+        records = [
+            {'name': '张伟', 'score': 3, 'tags': ['a', 'b']},
+            {'name': 'Li Ming', 'score': None, 'email': 'lm@uni.edu', 'rate': 1},
+            {'name': 'Wang Fang', 'rate': 0.5, 'is_chinese': True},
+        ]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'out' + ext)
+            with TableWriter(path, chunk_size=2) as writer:
+                for record in records:
+                    writer.write(record)
+            df = read_table(path)
+        self.assertEqual(list(df.columns), ['name', 'score', 'tags', 'email', 'rate', 'is_chinese'])
+        self.assertEqual(df['name'].tolist(), ['张伟', 'Li Ming', 'Wang Fang'])
+        self.assertEqual(df['score'].iloc[0], 3)
+        self.assertEqual(df['tags'].iloc[0], '["a", "b"]')
+        self.assertEqual(df['rate'].iloc[2], 0.5)
+        self.assertTrue(df['email'].isna().iloc[0])
+
+    def test_table_writer_csv(self):
+        self._test_table_writer('.csv')
+
+    @skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow is not installed')
+    def test_table_writer_parquet(self):
+        self._test_table_writer('.parquet')